@@ -1,7 +1,18 @@
+import { useState, useEffect } from 'react';
 import { Link } from 'react-router-dom';
+import ProductCard from '../components/ui/ProductCard';
+import { bestsellersAPI } from '../services/api';
 import '../styles/Home.css';
 
 function Home() {
+  const [topSellers, setTopSellers] = useState([]);
+
+  useEffect(() => {
+    bestsellersAPI.get(30, null, 8)
+      .then((data) => setTopSellers(data.results.map((row) => row.product)))
+      .catch(() => setTopSellers([]));
+  }, []);
+
   return (
     <div className="home-page">
       {/* Hero/Banner Section */}
@@ -38,6 +49,18 @@ function Home() {
         </div>
       </section>
 
+      {/* Top Sellers Section (last 30 days) */}
+      {topSellers.length > 0 && (
+        <section className="top-sellers-section">
+          <h2>Top Sellers</h2>
+          <div className="products-grid">
+            {topSellers.map((product) => (
+              <ProductCard key={product.id} product={product} />
+            ))}
+          </div>
+        </section>
+      )}
+
       {/* Call to Action Section */}
       <section className="cta-section">
         <h2>Ready to Start?</h2>
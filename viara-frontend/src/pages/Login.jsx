@@ -1,6 +1,7 @@
 import { useState, useContext } from 'react';
 import { useNavigate, Link } from 'react-router-dom';
 import AuthContext from '../contexts/AuthContext';
+import { guestCartAPI } from '../services/api';
 import '../styles/Login.css';
 
 function Login() {
@@ -35,7 +36,8 @@ function Login() {
         },
         body: JSON.stringify({
           username: formData.username,
-          password: formData.password
+          password: formData.password,
+          guest_cart: guestCartAPI.getToken()
         }),
       });
 
@@ -45,6 +47,9 @@ function Login() {
         throw new Error(data.error || 'Login failed');
       }
 
+      // Guest cart lines are now in the user's cart
+      guestCartAPI.clear();
+
       // Call login from context
       login(data.token, data.user);
 
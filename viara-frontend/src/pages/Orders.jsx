@@ -2,6 +2,7 @@ import { useState, useEffect, useContext } from 'react';
 import { useNavigate } from 'react-router-dom';
 import AuthContext from '../contexts/AuthContext';
 import Loader from '../components/ui/Loader';
+import { productsAPI } from '../services/api';
 import '../styles/Orders.css';
 
 function Orders() {
@@ -12,6 +13,7 @@ function Orders() {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
   const [cancellingOrderId, setCancellingOrderId] = useState(null);
+  const [currentProducts, setCurrentProducts] = useState({});
 
   useEffect(() => {
     if (!isLoggedIn) {
@@ -22,6 +24,58 @@ function Orders() {
     fetchOrders();
   }, [isLoggedIn, navigate]);
 
+  // Live status updates pushed by the server (no polling needed)
+  useEffect(() => {
+    if (!isLoggedIn) return;
+
+    let events = null;
+    let lastEventId = null;
+    let closed = false;
+
+    // The stream takes a short-lived ticket, not the auth token, so the
+    // token never ends up in a URL; each (re)connect asks for a new one
+    const connect = async () => {
+      try {
+        const response = await fetch('http://127.0.0.1:8000/api/orders/events/ticket/', {
+          method: 'POST',
+          headers: {
+            'Authorization': `Token ${localStorage.getItem('authToken')}`
+          }
+        });
+        if (!response.ok || closed) return;
+        const { ticket } = await response.json();
+
+        const params = new URLSearchParams({ ticket });
+        if (lastEventId) params.set('last_event_id', lastEventId);
+        events = new EventSource(`http://127.0.0.1:8000/api/orders/events/?${params}`);
+
+        events.addEventListener('order_status', (event) => {
+          lastEventId = event.lastEventId;
+          const change = JSON.parse(event.data);
+          setOrders((current) =>
+            current.map((order) =>
+              order.id === change.order ? { ...order, status: change.to_status } : order
+            )
+          );
+        });
+
+        // The ticket has expired by the time EventSource reconnects on its own
+        events.onerror = () => {
+          events.close();
+          if (!closed) setTimeout(connect, 3000);
+        };
+      } catch (error) {
+        console.error('Error connecting to order updates:', error);
+      }
+    };
+    connect();
+
+    return () => {
+      closed = true;
+      if (events) events.close();
+    };
+  }, [isLoggedIn]);
+
   const fetchOrders = async () => {
     setLoading(true);
     try {
@@ -37,7 +91,9 @@ function Orders() {
       }
 
       const data = await response.json();
-      setOrders(Array.isArray(data) ? data : data.results || []);
+      const orderList = Array.isArray(data) ? data : data.results || [];
+      setOrders(orderList);
+      fetchCurrentProducts(orderList);
     } catch (error) {
       console.error('Error fetching orders:', error);
       setError('Failed to load orders');
@@ -46,6 +102,25 @@ function Orders() {
     }
   };
 
+  // Current stock of every ordered product, 200 per request instead of one request each
+  const fetchCurrentProducts = async (orderList) => {
+    const ids = [...new Set(
+      orderList.flatMap((order) => (order.items || []).map((item) => item.product)).filter(Boolean)
+    )];
+    const byId = {};
+    try {
+      for (let start = 0; start < ids.length; start += 200) {
+        const { results } = await productsAPI.getByIds(ids.slice(start, start + 200));
+        results.forEach((product) => {
+          byId[product.id] = product;
+        });
+      }
+      setCurrentProducts(byId);
+    } catch (error) {
+      console.error('Error fetching current products:', error);
+    }
+  };
+
   const handleCancelOrder = async (orderId, orderStatus) => {
     // Check if order can be cancelled
     if (orderStatus === 'cancelled') {
@@ -195,7 +270,12 @@ function Orders() {
                     <div className="items-list">
                       {order.items.map((item, index) => (
                         <div key={index} className="order-item">
-                          <span className="item-name">{item.product_name || 'Product'}</span>
+                          <span className="item-name">
+                            {item.product_name || 'Product'}
+                            {currentProducts[item.product]?.in_stock === false && (
+                              <span className="item-stock">Out of stock</span>
+                            )}
+                          </span>
                           <span className="item-quantity">Qty: {item.quantity}</span>
                           <span className="item-price">₹{item.price}</span>
                         </div>
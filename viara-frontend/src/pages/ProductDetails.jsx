@@ -1,7 +1,7 @@
 import { useState, useEffect } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import Loader from '../components/ui/Loader';
-import { productsAPI } from '../services/api';
+import { productsAPI, guestCartAPI } from '../services/api';
 import '../styles/ProductDetails.css';
 
 function ProductDetails() {
@@ -72,10 +72,19 @@ function ProductDetails() {
    * 5. Enable "Go to Cart" button
    */
   const handleAddToCart = async () => {
-    // Step 1: Check authentication
+    // Step 1: Guests keep their cart in a signed token until they log in
     if (!isAuthenticated()) {
-      alert('Please login to add items to cart');
-      navigate('/login');
+      setAddingToCart(true);
+      try {
+        await guestCartAPI.addItem(product.id, quantity);
+        alert(`✓ Added ${quantity} x ${product.name} to cart! Log in to check out.`);
+        setQuantity(1);
+      } catch (error) {
+        console.error('Error adding to guest cart:', error);
+        alert('Failed to add item to cart. Please try again.');
+      } finally {
+        setAddingToCart(false);
+      }
       return;
     }
 
@@ -2,7 +2,7 @@ import { useState, useEffect } from 'react';
 import Banner from '../components/ui/Banner';
 import ProductCard from '../components/ui/ProductCard';
 import Loader from '../components/ui/Loader';
-import { productsAPI, categoriesAPI } from '../services/api';
+import { productsAPI, categoriesAPI, catalogAPI } from '../services/api';
 import '../styles/Products.css';
 
 function Products() {
@@ -87,7 +87,14 @@ function Products() {
         if (searchTerm) {
           data = await productsAPI.search(searchTerm);
         } else if (selectedCategory !== 'all') {
-          data = await productsAPI.filterByCategory(selectedCategory);
+          // The static snapshot is cached by the browser; fall back to the API without it
+          data = await catalogAPI.getCategoryProducts(selectedCategory).catch((snapshotError) => {
+            console.error('Catalog snapshot unavailable:', snapshotError);
+            return null;
+          });
+          if (!data) {
+            data = await productsAPI.filterByCategory(selectedCategory);
+          }
         } else {
           data = await productsAPI.getAll();
         }
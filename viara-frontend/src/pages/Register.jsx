@@ -1,5 +1,6 @@
 import { useState } from 'react';
 import { useNavigate, Link } from 'react-router-dom';
+import { guestCartAPI } from '../services/api';
 import '../styles/Login.css';
 
 function Register() {
@@ -73,7 +74,8 @@ function Register() {
           email: formData.email,        // ✨ Send email
           password: formData.password,
           first_name: formData.firstName,
-          last_name: formData.lastName
+          last_name: formData.lastName,
+          guest_cart: guestCartAPI.getToken()
         }),
       });
 
@@ -83,6 +85,9 @@ function Register() {
         throw new Error(data.error || 'Registration failed');
       }
 
+      // Guest cart lines are now in the user's cart
+      guestCartAPI.clear();
+
       alert('Registration successful! Please login.');
       navigate('/login');
 
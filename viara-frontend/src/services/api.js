@@ -102,6 +102,30 @@ export const productsAPI = {
     }
   },
 
+  /**
+   * Get many products by ID in one request
+   * @param {number[]} ids - Product IDs (up to 200)
+   * @returns {Promise} { results: [...in the same order], missing: [ids not found] }
+   * 
+   * Example: const { results } = await productsAPI.getByIds([3, 1, 2]);
+   */
+  getByIds: async (ids) => {
+    try {
+      const url = `${API_BASE_URL}/products/batch/?ids=${ids.join(',')}`;
+      
+      const response = await fetch(url);
+      
+      if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+      }
+      
+      return await response.json();
+    } catch (error) {
+      console.error('Error fetching products:', error);
+      throw error;
+    }
+  },
+
   /**
    * Search products by keyword
    * @param {string} searchTerm - Search keyword
@@ -151,6 +175,91 @@ export const categoriesAPI = {
   },
 };
 
+// ============================================
+// CATALOG SNAPSHOT (static files, no API request)
+// ============================================
+// Built by `manage.py build_catalog_snapshot` under /media/catalog/.
+// Shards are named by their content, so the browser can cache them for
+// good; only the small manifest is fetched fresh.
+const CATALOG_URL = 'http://127.0.0.1:8000/media/catalog';
+
+export const catalogAPI = {
+  getManifest: async () => {
+    const response = await fetch(`${CATALOG_URL}/manifest.json`, { cache: 'no-cache' });
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    return await response.json();
+  },
+
+  /**
+   * Products of one category, same shape as the products list endpoint
+   * @param {Object} entry - A category entry from the manifest
+   * @returns {Promise} { category: { id, name }, products: [...] }
+   */
+  getCategory: async (entry) => {
+    const response = await fetch(`${CATALOG_URL}/${entry.file}`);
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    // Served with Content-Encoding: gzip, so the browser has already decompressed it
+    return await response.json();
+  },
+
+  /**
+   * Products of the category with this name (case-insensitive)
+   * @param {string} name - Category name
+   * @returns {Promise} Product rows, or null when the snapshot has no such category
+   */
+  getCategoryProducts: async (name) => {
+    const manifest = await catalogAPI.getManifest();
+    const entry = manifest.categories.find((category) => category.name.toLowerCase() === name.toLowerCase());
+    if (!entry) {
+      return null;
+    }
+    const shard = await catalogAPI.getCategory(entry);
+    return shard.products;
+  },
+
+  // Every product, all shards loaded in parallel
+  getAllProducts: async () => {
+    const manifest = await catalogAPI.getManifest();
+    const shards = await Promise.all(manifest.categories.map(catalogAPI.getCategory));
+    return shards.flatMap((shard) => shard.products);
+  },
+};
+
+// ============================================
+// BESTSELLERS API
+// ============================================
+export const bestsellersAPI = {
+  /**
+   * Top selling products
+   * @param {number} window - 7, 30 or 90 days
+   * @param {number|null} category - Category ID, or null for all categories
+   * @param {number} limit - How many products (up to 50)
+   * @returns {Promise} { window, category, results: [{ units, product }] }
+   */
+  get: async (window = 30, category = null, limit = 10) => {
+    try {
+      const params = new URLSearchParams({ window, limit });
+      if (category) {
+        params.append('category', category);
+      }
+      const response = await fetch(`${API_BASE_URL}/bestsellers/?${params}`);
+
+      if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+      }
+
+      return await response.json();
+    } catch (error) {
+      console.error('Error fetching bestsellers:', error);
+      throw error;
+    }
+  },
+};
+
 // ============================================
 // CART API
 // ============================================
@@ -200,6 +309,53 @@ export const ordersAPI = {
   },
 };
 
+// ============================================
+// GUEST CART API (not logged in)
+// ============================================
+// The cart lives in a signed token kept in localStorage; login and
+// register send it along so the lines move into the user's cart
+const GUEST_CART_KEY = 'guestCart';
+
+export const guestCartAPI = {
+  getToken: () => localStorage.getItem(GUEST_CART_KEY) || '',
+
+  clear: () => localStorage.removeItem(GUEST_CART_KEY),
+
+  get: async () => {
+    const params = new URLSearchParams({ guest_cart: guestCartAPI.getToken() });
+    const response = await fetch(`${API_BASE_URL}/cart/guest/?${params}`);
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    return await response.json();
+  },
+
+  // Sets the product's quantity (0 removes it)
+  setItem: async (productId, quantity) => {
+    const response = await fetch(`${API_BASE_URL}/cart/guest/`, {
+      method: 'POST',
+      headers: getHeaders(),
+      body: JSON.stringify({
+        guest_cart: guestCartAPI.getToken(),
+        product_id: productId,
+        quantity: quantity,
+      }),
+    });
+    const data = await response.json();
+    if (!response.ok) {
+      throw new Error(data.error || 'Failed to update cart');
+    }
+    localStorage.setItem(GUEST_CART_KEY, data.guest_cart);
+    return data;
+  },
+
+  addItem: async (productId, quantity) => {
+    const cart = await guestCartAPI.get();
+    const line = cart.items.find((item) => item.product.id === productId);
+    return guestCartAPI.setItem(productId, (line ? line.quantity : 0) + quantity);
+  },
+};
+
 // ============================================
 // CONTACT/INQUIRY API
 // ============================================
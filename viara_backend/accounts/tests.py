@@ -1,3 +1,85 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.contrib.auth.tokens import default_token_generator
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from rest_framework.authtoken.models import Token
 
-# Create your tests here.
+from orders import guest_cart
+from orders.models import Cart
+from products.models import Category, Product
+from viara_project.testing import QueryBudgetTestCase
+
+
+class AuthQueryBudgetTests(QueryBudgetTestCase):
+    """Every route in accounts/urls.py, at 2 and 20 other users"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('customer', 'customer@example.com', 'password')
+        Token.objects.create(user=cls.user)
+
+    def grow(self, count):
+        start = User.objects.count()
+        User.objects.bulk_create([
+            User(username=f'user{index}', email=f'user{index}@example.com')
+            for index in range(start, start + count)
+        ])
+
+    def test_register(self):
+        names = iter(range(100))
+
+        def register():
+            name = f'new{next(names)}'
+            return self.client.post('/api/auth/register/', {
+                'username': name, 'email': f'{name}@example.com', 'password': 'password',
+            })
+
+        self.assertQueryBudget(7, register)
+
+    def test_login(self):
+        self.assertQueryBudget(2, lambda: self.client.post('/api/auth/login/', {
+            'username': 'customer', 'password': 'password',
+        }))
+
+    def test_login_merges_guest_cart(self):
+        category = Category.objects.create(name='Electronics')
+        products = Product.objects.bulk_create([
+            Product(name=f'Notebook {index}', price=10, category=category) for index in range(20)
+        ])
+        Cart.objects.create(user=self.user)
+
+        def login(quantities):
+            return self.client.post('/api/auth/login/', {
+                'username': 'customer', 'password': 'password', 'guest_cart': guest_cart.dump(quantities),
+            })
+
+        self.assertQueryBudget(6, login, setup=lambda: {product.id: 1 for product in products})
+
+        cart = Cart.objects.get(user=self.user)
+        self.assertEqual(
+            dict(cart.items.values_list('product_id', 'quantity')), {product.id: 2 for product in products}
+        )
+
+    def test_forgot_password(self):
+        self.assertQueryBudget(1, lambda: self.client.post('/api/auth/forgot-password/', {
+            'email': 'customer@example.com',
+        }))
+
+    def test_reset_password(self):
+        def reset_link():
+            user = User.objects.get(pk=self.user.pk)
+            return urlsafe_base64_encode(force_bytes(user.pk)), default_token_generator.make_token(user)
+
+        self.assertQueryBudget(
+            2,
+            lambda link: self.client.post('/api/auth/reset-password/', {
+                'uid': link[0], 'token': link[1], 'new_password': 'password',
+            }),
+            setup=reset_link,
+        )
+
+    def test_change_password(self):
+        self.client.force_authenticate(self.user)
+        self.assertQueryBudget(1, lambda: self.client.post('/api/auth/change-password/', {
+            'old_password': 'password', 'new_password': 'password',
+        }))
@@ -10,12 +10,16 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
+from orders.guest_cart import merge_into_cart
 
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def register(request):
-    """Register a new user with email"""
+    """
+    Register a new user with email
+    An optional guest_cart token (see /api/cart/guest/) becomes the new user's cart
+    """
     username = request.data.get('username')
     email = request.data.get('email')
     password = request.data.get('password')
@@ -58,6 +62,7 @@ def register(request):
         )
 
         token, created = Token.objects.get_or_create(user=user)
+        cart_lines_merged = merge_into_cart(user, request.data.get('guest_cart'))
 
         # Send welcome email
         try:
@@ -74,6 +79,7 @@ def register(request):
         return Response({
             'message': 'User registered successfully',
             'token': token.key,
+            'cart_lines_merged': cart_lines_merged,
             'user': {
                 'id': user.id,
                 'username': user.username,
@@ -95,7 +101,10 @@ def register(request):
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def login(request):
-    """Login user"""
+    """
+    Login user
+    An optional guest_cart token (see /api/cart/guest/) is merged into the user's cart
+    """
     username = request.data.get('username')
     password = request.data.get('password')
 
@@ -114,10 +123,12 @@ def login(request):
         )
 
     token, created = Token.objects.get_or_create(user=user)
+    cart_lines_merged = merge_into_cart(user, request.data.get('guest_cart'))
 
     return Response({
         'message': 'Login successful',
         'token': token.key,
+        'cart_lines_merged': cart_lines_merged,
         'user': {
             'id': user.id,
             'username': user.username,
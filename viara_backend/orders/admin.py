@@ -1,29 +1,102 @@
 from django.contrib import admin
-from .models import Cart, CartItem, Order, OrderItem, Inquiry
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+
+from . import bestsellers
+from .models import (
+    ArchivedOrder, ArchivedOrderItem, Cart, CartItem, Order, OrderItem, OrderStatusEvent, Inquiry
+)
+
+class CappedCountPaginator(Paginator):
+    """
+    Paginator that stops counting at MAX_COUNT rows
+    COUNT(*) over a LIMITed subquery stays cheap on huge tables; past the
+    cap the changelist just shows MAX_COUNT results and pages up to it
+    """
+    MAX_COUNT = 10000
+
+    @cached_property
+    def count(self):
+        return self.object_list[:self.MAX_COUNT].count()
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelist settings for tables that grow without bound"""
+    paginator = CappedCountPaginator
+    show_full_result_count = False  # skip the second, unfiltered COUNT(*)
+
 
 @admin.register(Cart)
-class CartAdmin(admin.ModelAdmin):
+class CartAdmin(LargeTableAdmin):
     list_display = ['user', 'created_at']
+    list_select_related = ['user']
     search_fields = ['user__username']
+    raw_id_fields = ['user']
 
 
 @admin.register(CartItem)
-class CartItemAdmin(admin.ModelAdmin):
+class CartItemAdmin(LargeTableAdmin):
     list_display = ['cart', 'product', 'quantity', 'added_at']
+    list_select_related = ['cart__user', 'product']
     list_filter = ['added_at']
+    raw_id_fields = ['cart', 'product']
+    date_hierarchy = 'added_at'
 
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(LargeTableAdmin):
     list_display = ['id', 'user', 'total_amount', 'status', 'created_at']
+    list_select_related = ['user']
     list_filter = ['status', 'created_at']
     search_fields = ['user__username', 'user__email']
     list_editable = ['status']
+    raw_id_fields = ['user']
+    date_hierarchy = 'created_at'
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and 'status' in form.changed_data:
+            OrderStatusEvent.objects.create(
+                order=obj, from_status=form.initial['status'],
+                to_status=obj.status, changed_by=request.user
+            )
+            bestsellers.record_status_change([obj.id], form.initial['status'], obj.status)
 
 
 @admin.register(OrderItem)
-class OrderItemAdmin(admin.ModelAdmin):
-    list_display = ['order', 'product', 'quantity', 'price']
+class OrderItemAdmin(LargeTableAdmin):
+    list_display = ['order', 'product_name', 'category_name', 'quantity', 'price']
+    list_select_related = ['order__user']
+    raw_id_fields = ['order', 'product']
+
+
+@admin.register(OrderStatusEvent)
+class OrderStatusEventAdmin(LargeTableAdmin):
+    list_display = ['order', 'from_status', 'to_status', 'changed_by', 'created_at']
+    list_select_related = ['order__user', 'changed_by']
+    list_filter = ['to_status', 'created_at']
+    raw_id_fields = ['order', 'changed_by']
+
+
+class ArchivedOrderItemInline(admin.TabularInline):
+    model = ArchivedOrderItem
+    extra = 0
+    can_delete = False
+    readonly_fields = ['product', 'product_name', 'category_name', 'quantity', 'price']
+    exclude = ['product_image']
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(LargeTableAdmin):
+    list_display = ['id', 'user', 'total_amount', 'status', 'created_at', 'archived_at']
+    list_select_related = ['user']
+    list_filter = ['status']
+    search_fields = ['user__username', 'user__email']
+    readonly_fields = [field.name for field in ArchivedOrder._meta.fields]
+    inlines = [ArchivedOrderItemInline]
+
+    def has_add_permission(self, request):
+        return False
 
 
 @admin.register(Inquiry)
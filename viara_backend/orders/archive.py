@@ -0,0 +1,86 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem, OrderStatusEvent
+
+# Orders in these statuses never change again
+ARCHIVABLE_STATUSES = ['delivered', 'cancelled']
+BATCH_SIZE = 500
+
+ORDER_FIELDS = [
+    'id', 'user_id', 'total_amount', 'status', 'payment_method',
+    'shipping_address', 'phone', 'created_at', 'updated_at', 'in_recommendations',
+]
+ITEM_FIELDS = [
+    'id', 'order_id', 'product_id', 'quantity', 'price',
+    'product_name', 'category_name', 'category_id', 'product_image',
+]
+
+
+def archivable_orders(older_than_days=365):
+    """Finished orders last created more than older_than_days ago"""
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    return Order.objects.filter(status__in=ARCHIVABLE_STATUSES, created_at__lt=cutoff)
+
+
+def archive_batch(order_ids):
+    """
+    Move one batch of orders, their items and status events to the archive
+    Copy and delete happen in one transaction, so an order is never in
+    both tables or in neither
+    """
+    with transaction.atomic():
+        orders = list(
+            Order.objects
+            .select_for_update()
+            .filter(id__in=order_ids, status__in=ARCHIVABLE_STATUSES)
+            .values(*ORDER_FIELDS)
+        )
+        if not orders:
+            return 0
+        ids = [order['id'] for order in orders]
+
+        history = {}
+        events = (
+            OrderStatusEvent.objects
+            .filter(order_id__in=ids)
+            .order_by('id')
+            .values('order_id', 'from_status', 'to_status', 'changed_by_id', 'created_at')
+        )
+        for event in events:
+            order_id = event.pop('order_id')
+            event['created_at'] = event['created_at'].isoformat()
+            history.setdefault(order_id, []).append(event)
+
+        ArchivedOrder.objects.bulk_create(
+            [ArchivedOrder(status_history=history.get(order['id'], []), **order) for order in orders],
+            batch_size=BATCH_SIZE,
+        )
+        ArchivedOrderItem.objects.bulk_create(
+            [ArchivedOrderItem(**item) for item in OrderItem.objects.filter(order_id__in=ids).values(*ITEM_FIELDS)],
+            batch_size=BATCH_SIZE,
+        )
+
+        # Items and status events go with the orders (on_delete=CASCADE)
+        Order.objects.filter(id__in=ids).delete()
+    return len(ids)
+
+
+def archive_orders(older_than_days=365, batch_size=BATCH_SIZE, limit=None):
+    """
+    Archive finished orders older than older_than_days, batch by batch
+    Each batch commits separately, so the job can be stopped and resumed
+    Returns the number of orders archived
+    """
+    archived = 0
+    while limit is None or archived < limit:
+        size = batch_size if limit is None else min(batch_size, limit - archived)
+        order_ids = list(
+            archivable_orders(older_than_days).order_by('id').values_list('id', flat=True)[:size]
+        )
+        if not order_ids:
+            break
+        archived += archive_batch(order_ids)
+    return archived
@@ -0,0 +1,207 @@
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import Bestseller, OrderItem, ProductSalesDay
+
+WINDOWS = (7, 30, 90)
+ALL = Bestseller.ALL_CATEGORIES
+UPSERT_BATCH_SIZE = 200
+
+# Leaderboard answers cached in this process: (window, scope, limit) -> (expires, rows)
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def windows_covering(day, today=None):
+    """Windows (in days, ending today) that still include `day`"""
+    today = today or timezone.localdate()
+    return [window for window in WINDOWS if (today - day).days < window]
+
+
+def add_units(model, fields, deltas):
+    """
+    Add {key: units} to the rows of `model` keyed by `fields`
+    One INSERT ... ON CONFLICT DO UPDATE SET units = units + excluded.units
+    per batch, so the increment happens in the database: concurrent orders
+    adding to the same row (or creating it) never overwrite each other.
+    Keys are written in sorted order, so writers lock rows in the same order.
+    """
+    if not deltas:
+        return
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    model_fields = [model._meta.get_field(field) for field in fields]
+    columns = [quote(field.column) for field in model_fields]
+    units = quote(model._meta.get_field('units').column)
+
+    keys = sorted(deltas)
+    for start in range(0, len(keys), UPSERT_BATCH_SIZE):
+        batch = keys[start:start + UPSERT_BATCH_SIZE]
+        params = []
+        for key in batch:
+            params.extend(field.get_db_prep_save(value, connection) for field, value in zip(model_fields, key))
+            params.append(deltas[key])
+        row = '(' + ', '.join(['%s'] * (len(columns) + 1)) + ')'
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} ({", ".join(columns)}, {units}) VALUES {", ".join([row] * len(batch))} '
+                f'ON CONFLICT ({", ".join(columns)}) DO UPDATE SET {units} = {table}.{units} + excluded.{units}',
+                params,
+            )
+
+
+def record(lines, day=None, sign=1):
+    """
+    Count sold units into the day's bucket and every leaderboard whose
+    window still covers that day, overall and per category
+    lines: (product_id, category_id, quantity), with the category the
+    product was in when the order was placed; sign=-1 takes them back off
+    """
+    day = day or timezone.localdate()
+    sold = Counter()
+    for product_id, category_id, quantity in lines:
+        if product_id is not None:
+            sold[product_id, category_id or ALL] += sign * quantity
+    if not sold:
+        return
+
+    buckets = Counter()
+    boards = Counter()
+    for (product_id, scope), units in sold.items():
+        buckets[product_id, scope, day] += units
+        for window in windows_covering(day):
+            boards[window, ALL, product_id] += units
+            if scope != ALL:
+                boards[window, scope, product_id] += units
+
+    with transaction.atomic():
+        add_units(ProductSalesDay, ('product_id', 'scope', 'day'), buckets)
+        add_units(Bestseller, ('window', 'scope', 'product_id'), boards)
+
+
+def record_order_items(order_ids, sign=1):
+    """
+    Count (sign=1) or take back (sign=-1, cancellations) the items of
+    orders, each on the day and under the category it was sold in; one
+    read of the items
+    """
+    if not order_ids:
+        return
+    items = (
+        OrderItem.objects
+        .filter(order_id__in=order_ids, product__isnull=False)
+        .values_list('product_id', 'category_id', 'quantity', 'order__created_at')
+    )
+    by_day = defaultdict(list)
+    for product_id, category_id, quantity, created_at in items:
+        by_day[timezone.localdate(created_at)].append((product_id, category_id, quantity))
+    for day, lines in by_day.items():
+        record(lines, day=day, sign=sign)
+
+
+def record_status_change(order_ids, from_status, to_status):
+    """Keep the boards right when orders move into or out of 'cancelled'"""
+    if to_status == 'cancelled' and from_status != 'cancelled':
+        record_order_items(order_ids, sign=-1)
+    elif from_status == 'cancelled' and to_status != 'cancelled':
+        record_order_items(order_ids, sign=1)
+
+
+def compact(today=None):
+    """
+    Rebuild every leaderboard from the day buckets still inside its
+    window (dropping sales that have aged out), then delete buckets older
+    than the longest window. Returns (leaderboard rows, buckets deleted).
+    """
+    today = today or timezone.localdate()
+    rows = []
+    for window in WINDOWS:
+        totals = (
+            ProductSalesDay.objects
+            .filter(day__gt=today - timedelta(days=window))
+            .values_list('product_id', 'scope')
+            .annotate(total=Sum('units'))
+        )
+        overall = Counter()
+        for product_id, scope, units in totals:
+            overall[product_id] += units
+            if scope != ALL and units > 0:
+                rows.append(Bestseller(window=window, scope=scope, product_id=product_id, units=units))
+        rows.extend(
+            Bestseller(window=window, scope=ALL, product_id=product_id, units=units)
+            for product_id, units in overall.items() if units > 0
+        )
+
+    with transaction.atomic():
+        Bestseller.objects.all().delete()
+        Bestseller.objects.bulk_create(rows, batch_size=1000)
+        deleted, _ = ProductSalesDay.objects.filter(day__lte=today - timedelta(days=max(WINDOWS))).delete()
+    invalidate()
+    return len(rows), deleted
+
+
+def rebuild_buckets(today=None):
+    """
+    Recount the day buckets of the last max(WINDOWS) days from OrderItem
+    (for a first deployment, or after a repair); cancelled orders are
+    left out. Run compact() afterwards to rebuild the leaderboards.
+    """
+    today = today or timezone.localdate()
+    since = today - timedelta(days=max(WINDOWS) - 1)
+    items = (
+        OrderItem.objects
+        .filter(product__isnull=False, order__created_at__date__gte=since)
+        .exclude(order__status='cancelled')
+        .values_list('product_id', 'category_id', 'quantity', 'order__created_at')
+    )
+    buckets = Counter()
+    for product_id, category_id, quantity, created_at in items.iterator(chunk_size=2000):
+        buckets[product_id, category_id or ALL, timezone.localdate(created_at)] += quantity
+
+    with transaction.atomic():
+        ProductSalesDay.objects.filter(day__gte=since).delete()
+        ProductSalesDay.objects.bulk_create(
+            [
+                ProductSalesDay(product_id=product_id, scope=scope, day=day, units=units)
+                for (product_id, scope, day), units in buckets.items()
+            ],
+            batch_size=1000
+        )
+    return len(buckets)
+
+
+def top(window, scope=ALL, limit=10):
+    """
+    [(product, units)] best first: one read of the (window, scope, -units) index
+    Answers are cached in this process for BESTSELLERS_CACHE_SECONDS, so
+    new orders show up within that time (compact() clears the cache)
+    """
+    key = (window, scope, limit)
+    with _cache_lock:
+        cached = _cache.get(key)
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[1]
+
+    rows = [
+        (row.product, row.units)
+        for row in Bestseller.objects
+        .filter(window=window, scope=scope, units__gt=0)
+        .select_related('product__category')
+        .order_by('-units', 'product_id')[:limit]
+    ]
+    ttl = getattr(settings, 'BESTSELLERS_CACHE_SECONDS', 60)
+    with _cache_lock:
+        _cache[key] = (time.monotonic() + ttl, rows)
+    return rows
+
+
+def invalidate():
+    with _cache_lock:
+        _cache.clear()
@@ -0,0 +1,54 @@
+from django.db import transaction
+from django.utils import timezone
+
+from products.models import Category
+from products.pricing import PriceBook
+from . import bestsellers
+from .models import Order, OrderItem
+
+
+def place_order(user, lines, **details):
+    """
+    Create an Order and its OrderItems from (product, quantity) lines
+    Every line is priced through one PriceBook, and the items are
+    written with a single bulk_create inside the order's transaction.
+    Each item keeps a snapshot of the product's name, category and image.
+    The units are counted into the bestseller leaderboards in the same
+    transaction.
+
+    details: payment_method, shipping_address, phone
+    """
+    book = PriceBook(product for product, quantity in lines)
+    category_names = dict(
+        Category.objects
+        .filter(id__in={product.category_id for product, quantity in lines})
+        .values_list('id', 'name')
+    )
+    items = [
+        OrderItem(
+            product=product,
+            quantity=quantity,
+            price=book.unit_price(product, quantity),
+            product_name=product.name,
+            category_name=category_names.get(product.category_id, ''),
+            category_id=product.category_id,
+            product_image=product.image.name or None,
+        )
+        for product, quantity in lines
+    ]
+
+    with transaction.atomic():
+        order = Order.objects.create(
+            user=user,
+            total_amount=sum(item.subtotal for item in items),
+            **details
+        )
+        for item in items:
+            item.order = order
+        OrderItem.objects.bulk_create(items)
+        bestsellers.record(
+            [(product.id, product.category_id, quantity) for product, quantity in lines],
+            day=timezone.localdate(order.created_at)
+        )
+
+    return order
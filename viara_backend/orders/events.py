@@ -0,0 +1,53 @@
+import asyncio
+import threading
+
+from django.db import transaction
+
+
+class OrderEventBroker:
+    """
+    In-process pub/sub for order status changes
+
+    Writers call publish() once OrderStatusEvent rows are committed; every
+    open SSE stream in this process is woken up and reads the new rows.
+    The rows themselves are the source of truth, so a stream that misses a
+    wake-up (e.g. the change happened in another worker process) falls back
+    to polling the table every ORDER_EVENTS_POLL_SECONDS.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+
+    def subscribe(self):
+        """Register the running event loop's stream; returns an asyncio.Event"""
+        wakeup = asyncio.Event()
+        with self._lock:
+            self._subscribers.add((asyncio.get_running_loop(), wakeup))
+        return wakeup
+
+    def unsubscribe(self, wakeup):
+        with self._lock:
+            self._subscribers = {sub for sub in self._subscribers if sub[1] is not wakeup}
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def publish(self):
+        """Wake every subscriber (safe to call from any thread)"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for loop, wakeup in subscribers:
+            try:
+                loop.call_soon_threadsafe(wakeup.set)
+            except RuntimeError:
+                # The stream's loop already closed
+                self.unsubscribe(wakeup)
+
+    def publish_on_commit(self):
+        """Publish once the surrounding transaction commits"""
+        transaction.on_commit(self.publish)
+
+
+broker = OrderEventBroker()
@@ -0,0 +1,68 @@
+from django.conf import settings
+from django.core import signing
+
+from products.models import Product
+from products.pricing import PriceBook
+from .models import Cart, CartItem
+
+SALT = 'orders.guest_cart'
+MAX_LINES = 100
+MAX_QUANTITY = 999
+
+
+def load(token):
+    """
+    {product_id: quantity} from a guest cart token
+    Missing, tampered with or expired tokens give an empty cart
+    """
+    if not token:
+        return {}
+    max_age = getattr(settings, 'GUEST_CART_MAX_AGE_DAYS', 30) * 24 * 60 * 60
+    try:
+        lines = signing.loads(token, salt=SALT, max_age=max_age)
+        return {int(product_id): int(quantity) for product_id, quantity in lines}
+    except (signing.BadSignature, TypeError, ValueError):
+        return {}
+
+
+def dump(quantities):
+    """Signed, compressed token for {product_id: quantity}"""
+    return signing.dumps(
+        [[product_id, quantity] for product_id, quantity in quantities.items()],
+        salt=SALT, compress=True
+    )
+
+
+def priced_items(quantities):
+    """
+    Unsaved CartItems for the token's lines, priced like a real cart
+    One query for the products and one for their price tiers; lines
+    whose product no longer exists are dropped
+    """
+    products = Product.objects.select_related('category').in_bulk(list(quantities))
+    items = [
+        CartItem(product=products[product_id], quantity=quantity)
+        for product_id, quantity in quantities.items()
+        if product_id in products
+    ]
+    book = PriceBook(item.product for item in items)
+    for item in items:
+        item.unit_price = book.unit_price(item.product, item.quantity)
+    return items
+
+
+def merge_into_cart(user, token):
+    """
+    Move a guest cart's lines into the user's Cart at login / register
+    Quantities add to lines already in the cart; the write is one
+    bulk upsert on (cart, product). Returns how many lines were merged.
+    """
+    quantities = load(token)
+    if not quantities:
+        return 0
+    existing = set(Product.objects.filter(id__in=list(quantities)).values_list('id', flat=True))
+    quantities = {product_id: quantity for product_id, quantity in quantities.items() if product_id in existing}
+    if quantities:
+        cart, created = Cart.objects.get_or_create(user=user)
+        cart.merge_items(quantities)
+    return len(quantities)
@@ -0,0 +1,169 @@
+import functools
+import hashlib
+import json
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+PURGE_BATCH_SIZE = 1000
+
+# Requests currently running in this process: (user id, key) -> Event
+_running = {}
+_running_lock = threading.Lock()
+
+
+def fingerprint(request):
+    """
+    sha256 of what makes two requests "the same" besides the key
+
+    Built from the parsed input, never the raw body: form / JSON fields
+    are hashed serialized canonically, uploaded files are streamed through
+    the hash chunk by chunk, so the header does not pull a whole upload
+    into memory (or past DATA_UPLOAD_MAX_MEMORY_SIZE)
+    """
+    digest = hashlib.sha256()
+    digest.update(request.method.encode())
+    digest.update(request.path.encode())
+
+    files = request.FILES
+    data = request.data
+    if hasattr(data, 'getlist'):
+        data = {key: data.getlist(key) for key in data if key not in files}
+    digest.update(json.dumps(data, sort_keys=True, separators=(',', ':'), cls=DjangoJSONEncoder).encode())
+
+    for name in sorted(files):
+        for upload in files.getlist(name):
+            digest.update(f'|{name}|{upload.name}|{upload.size}|'.encode())
+            for chunk in upload.chunks():
+                digest.update(chunk)
+            upload.seek(0)
+    return digest.hexdigest()
+
+
+def replay(record):
+    response = Response(record.response_body, status=record.response_status)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def claim(user, key, request_fingerprint):
+    """
+    Insert an in_progress row for the key (inside the caller's transaction)
+    Returns (record, created); an expired row is replaced
+    """
+    expires_at = timezone.now() + timedelta(hours=getattr(settings, 'IDEMPOTENCY_KEY_TTL_HOURS', 24))
+    try:
+        with transaction.atomic():
+            return IdempotencyKey.objects.create(
+                user=user, key=key, fingerprint=request_fingerprint, expires_at=expires_at
+            ), True
+    except IntegrityError:
+        record = IdempotencyKey.objects.get(user=user, key=key)
+        if record.expires_at > timezone.now():
+            return record, False
+        record.delete()
+        return claim(user, key, request_fingerprint)
+
+
+def idempotent(view_method):
+    """
+    Make a viewset write action honour the Idempotency-Key header
+
+    - First request with a key runs normally; its response is stored
+    - Retries with the same key get the stored response back, with an
+      Idempotent-Replayed: true header, without running the write again
+    - Duplicates arriving while the first is still running in this
+      process wait for it and get its response; duplicates running in
+      another process block on the key's row until the first commits
+    - The same key with a different body is rejected with 422
+    - The key is stored in the same transaction as the write: 5xx
+      responses, exceptions and crashes roll both back, so they can be
+      retried instead of leaving the key stuck
+
+    Requests without the header are not affected.
+    """
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {'error': f'{HEADER} must be at most {MAX_KEY_LENGTH} characters'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        running_key = (request.user.pk, key)
+        with _running_lock:
+            running = _running.get(running_key)
+            if running is None:
+                done = _running[running_key] = threading.Event()
+        if running is not None:
+            # Coalesce: let the first request finish, then replay its result
+            running.wait()
+            return wrapper(self, request, *args, **kwargs)
+
+        try:
+            return run_once(view_method, self, request, key, *args, **kwargs)
+        finally:
+            with _running_lock:
+                del _running[running_key]
+            done.set()
+
+    return wrapper
+
+
+def run_once(view_method, view, request, key, *args, **kwargs):
+    request_fingerprint = fingerprint(request)
+    with transaction.atomic():
+        record, created = claim(request.user, key, request_fingerprint)
+
+        if not created:
+            if record.fingerprint != request_fingerprint:
+                return Response(
+                    {'error': f'{HEADER} was already used for a different request'},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                )
+            if record.status == 'completed':
+                return replay(record)
+            response = Response(
+                {'error': 'A request with this Idempotency-Key is still being processed'},
+                status=status.HTTP_409_CONFLICT
+            )
+            response['Retry-After'] = '1'
+            return response
+
+        response = view_method(view, request, *args, **kwargs)
+        if response.status_code >= 500:
+            transaction.set_rollback(True)
+            return response
+
+        record.status = 'completed'
+        record.response_status = response.status_code
+        record.response_body = response.data
+        record.save(update_fields=['status', 'response_status', 'response_body'])
+        return response
+
+
+def purge_expired_keys(batch_size=PURGE_BATCH_SIZE):
+    """Delete expired keys batch by batch; returns how many were deleted"""
+    deleted = 0
+    while True:
+        ids = list(
+            IdempotencyKey.objects
+            .filter(expires_at__lte=timezone.now())
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(id__in=ids).delete()[0]
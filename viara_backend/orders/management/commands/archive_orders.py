@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from orders.archive import BATCH_SIZE, archive_orders, archivable_orders
+
+
+class Command(BaseCommand):
+    """
+    Move old delivered/cancelled orders into the archive tables
+
+    Usage:
+        python manage.py archive_orders                 # older than a year
+        python manage.py archive_orders --days 180 --batch-size 1000
+        python manage.py archive_orders --dry-run       # only count them
+    """
+    help = 'Archive finished orders older than --days'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=365, help='Minimum order age in days')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Orders moved per transaction')
+        parser.add_argument('--limit', type=int, default=None, help='Stop after this many orders')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many would move')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            count = archivable_orders(options['days']).count()
+            self.stdout.write(f'{count} orders would be archived')
+            return
+
+        archived = archive_orders(
+            older_than_days=options['days'],
+            batch_size=options['batch_size'],
+            limit=options['limit'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Archived {archived} orders'))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from orders.bestsellers import compact, rebuild_buckets
+
+
+class Command(BaseCommand):
+    """
+    Age out expired sales from the bestseller leaderboards
+
+    Usage:
+        python manage.py compact_bestsellers              # daily
+        python manage.py compact_bestsellers --rebuild    # recount from order items first
+    """
+    help = 'Rebuild bestseller leaderboards from daily sales buckets and drop expired buckets'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='Recount the daily buckets from order items first (first deployment or repair)'
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            buckets = rebuild_buckets()
+            self.stdout.write(f'Recounted {buckets} daily sales buckets from order items')
+        rows, deleted = compact()
+        self.stdout.write(self.style.SUCCESS(
+            f'{rows} leaderboard rows rebuilt, {deleted} expired daily buckets deleted'
+        ))
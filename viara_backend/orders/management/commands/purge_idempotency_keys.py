@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from orders.idempotency import PURGE_BATCH_SIZE, purge_expired_keys
+
+
+class Command(BaseCommand):
+    """
+    Delete expired Idempotency-Key records
+
+    Usage:
+        python manage.py purge_idempotency_keys
+        python manage.py purge_idempotency_keys --batch-size 5000
+    """
+    help = 'Delete expired idempotency keys in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=PURGE_BATCH_SIZE, help='Rows deleted per query')
+
+    def handle(self, *args, **options):
+        deleted = purge_expired_keys(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired idempotency keys'))
@@ -0,0 +1,306 @@
+import random
+import time
+from array import array
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from accounts.models import CustomerProfile
+from orders.models import Cart, CartItem, Order, OrderItem
+from products.models import Category, Product
+
+USERNAME_PREFIX = 'seed_user_'
+PASSWORD = 'seed-password'
+
+CATEGORY_NAMES = [
+    'Electronics', 'Stationery', 'Home', 'Kitchen', 'Garden', 'Toys', 'Sports', 'Books',
+    'Beauty', 'Grocery', 'Office', 'Tools', 'Automotive', 'Pet Supplies', 'Baby', 'Fashion',
+]
+ADJECTIVES = [
+    'Classic', 'Premium', 'Compact', 'Deluxe', 'Eco', 'Pro', 'Mini', 'Ultra', 'Smart',
+    'Wireless', 'Heavy Duty', 'Portable', 'Organic', 'Vintage', 'Essential', 'Bulk',
+]
+NOUNS = [
+    'Notebook', 'Pen Set', 'Lamp', 'Mug', 'Backpack', 'Charger', 'Headphones', 'Bottle',
+    'Chair', 'Desk Organizer', 'Blender', 'Kettle', 'Towel', 'Planter', 'Ball', 'Puzzle',
+    'Keyboard', 'Mouse', 'Stapler', 'Marker Pack', 'Frying Pan', 'Shampoo', 'Jacket', 'Drill',
+]
+CITIES = ['Mumbai', 'Delhi', 'Bengaluru', 'Chennai', 'Kolkata', 'Pune', 'Hyderabad', 'Jaipur']
+
+
+def zipf_weights(count, exponent):
+    """Cumulative Zipf weights: item i is picked ∝ 1 / (i + 1) ** exponent"""
+    return list(accumulate(1 / (rank + 1) ** exponent for rank in range(count)))
+
+
+def product_name(index):
+    return (
+        f'{ADJECTIVES[index % len(ADJECTIVES)]} '
+        f'{NOUNS[(index // len(ADJECTIVES)) % len(NOUNS)]} {index + 1}'
+    )
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Let bulk_create keep the created_at / updated_at values we set"""
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    """
+    Fill the database with a large synthetic dataset for benchmarks
+
+    Everything is generated from --seed, and timestamps count back from
+    --until, so the same --seed and --until always give the same rows.
+    Product popularity, category sizes and orders per customer follow
+    Zipf-like skews; older orders are mostly delivered or cancelled.
+
+    Usage (on a fresh, migrated database):
+        python manage.py seed_data                       # full size
+        python manage.py seed_data --scale 0.01          # 1% of every volume
+        python manage.py seed_data --products 50000 --order-items 500000 --seed 7
+    """
+    help = 'Generate a large, deterministic synthetic dataset'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=42, help='Random seed')
+        parser.add_argument('--until', type=str, default=None,
+                            help='Date (YYYY-MM-DD) of the newest rows; defaults to today')
+        parser.add_argument('--days', type=int, default=730, help='Days of order history')
+        parser.add_argument('--categories', type=int, default=200)
+        parser.add_argument('--products', type=int, default=1_000_000)
+        parser.add_argument('--users', type=int, default=100_000)
+        parser.add_argument('--carts', type=int, default=30_000, help='Users with a non-empty cart')
+        parser.add_argument('--order-items', type=int, default=10_000_000)
+        parser.add_argument('--items-per-order', type=float, default=4.0, help='Average order size')
+        parser.add_argument('--scale', type=float, default=1.0, help='Multiply every volume by this')
+        parser.add_argument('--batch-size', type=int, default=10_000, help='Rows per bulk_create')
+
+    def handle(self, *args, **options):
+        if User.objects.filter(username__startswith=USERNAME_PREFIX).exists():
+            raise CommandError('This database already holds seeded data; seed a fresh database')
+
+        scale = options['scale']
+        self.volumes = {
+            name: max(1, int(options[name] * scale))
+            for name in ['categories', 'products', 'users', 'carts', 'order_items']
+        }
+        self.volumes['carts'] = min(self.volumes['carts'], self.volumes['users'])
+        self.batch_size = options['batch_size']
+        self.items_per_order = max(1.0, options['items_per_order'])
+        self.days = options['days']
+        self.rng = random.Random(options['seed'])
+
+        until = datetime.strptime(options['until'], '%Y-%m-%d').date() if options['until'] else timezone.localdate()
+        self.until = timezone.make_aware(datetime.combine(until, datetime.min.time()))
+
+        if connection.vendor == 'sqlite' and not connection.in_atomic_block:
+            # Only this connection skips fsync; a crash mid-seed means reseeding anyway
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA synchronous = OFF')
+
+        with explicit_timestamps(Category, Product, CustomerProfile, Cart, CartItem, Order):
+            self.step('categories', self.seed_categories)
+            self.step('products', self.seed_products)
+            self.step('users', self.seed_users)
+            self.step('carts', self.seed_carts)
+            self.step('orders', self.seed_orders)
+
+    def step(self, name, seed):
+        started = time.perf_counter()
+        count = seed()
+        self.stdout.write(f'{name}: {count} rows in {time.perf_counter() - started:.1f}s')
+
+    def timestamp(self, max_days):
+        """A moment in the last max_days days, skewed towards recent ones"""
+        days_ago = max_days * self.rng.random() ** 2
+        return self.until - timedelta(days=days_ago)
+
+    def bulk_create(self, model, objects):
+        """bulk_create in batch_size chunks, one transaction per chunk"""
+        created = []
+        for start in range(0, len(objects), self.batch_size):
+            with transaction.atomic():
+                created += model.objects.bulk_create(objects[start:start + self.batch_size])
+        return created
+
+    # ------------------------------------------------------------
+    # CATALOG
+    # ------------------------------------------------------------
+    def seed_categories(self):
+        existing = set(Category.objects.values_list('name', flat=True))
+        categories = []
+        for index in range(self.volumes['categories']):
+            base = CATEGORY_NAMES[index % len(CATEGORY_NAMES)]
+            name = base if index < len(CATEGORY_NAMES) else f'{base} {index // len(CATEGORY_NAMES) + 1}'
+            if name in existing:
+                name = f'{name} (seed)'
+            categories.append(Category(name=name, created_at=self.timestamp(self.days)))
+        created = self.bulk_create(Category, categories)
+        self.category_ids = [category.id for category in created]
+        self.category_names = {category.id: category.name for category in created}
+        return len(created)
+
+    def seed_products(self):
+        category_weights = zipf_weights(len(self.category_ids), 1.0)
+        self.product_ids = array('q')
+        self.product_cents = array('q')
+        self.product_categories = array('q')
+
+        total = self.volumes['products']
+        for start in range(0, total, self.batch_size):
+            batch = []
+            for index in range(start, min(start + self.batch_size, total)):
+                category_id = self.rng.choices(self.category_ids, cum_weights=category_weights)[0]
+                cents = int(self.rng.lognormvariate(6.5, 1.0)) + 99
+                created_at = self.timestamp(self.days)
+                batch.append(Product(
+                    name=product_name(index),
+                    description=f'{product_name(index)} from the {self.category_names[category_id]} range.',
+                    price=Decimal(cents) / 100,
+                    category_id=category_id,
+                    in_stock=self.rng.random() > 0.05,
+                    created_at=created_at,
+                    updated_at=created_at,
+                ))
+                self.product_cents.append(cents)
+                self.product_categories.append(category_id)
+            with transaction.atomic():
+                self.product_ids.extend(product.id for product in Product.objects.bulk_create(batch))
+
+        # Popular products are spread over the catalog, not the first rows
+        self.popularity = list(range(total))
+        self.rng.shuffle(self.popularity)
+        self.product_weights = zipf_weights(total, 1.1)
+        return total
+
+    def pick_products(self, count):
+        """Indexes of count distinct products, popular ones more often"""
+        picked = self.rng.choices(self.popularity, cum_weights=self.product_weights, k=count)
+        return list(dict.fromkeys(picked))
+
+    # ------------------------------------------------------------
+    # CUSTOMERS
+    # ------------------------------------------------------------
+    def seed_users(self):
+        password = make_password(PASSWORD)
+        total = self.volumes['users']
+        self.user_ids = array('q')
+        for start in range(0, total, self.batch_size):
+            users, joined = [], []
+            for index in range(start, min(start + self.batch_size, total)):
+                date_joined = self.timestamp(self.days)
+                joined.append(date_joined)
+                users.append(User(
+                    username=f'{USERNAME_PREFIX}{index + 1}',
+                    email=f'{USERNAME_PREFIX}{index + 1}@example.com',
+                    password=password,
+                    date_joined=date_joined,
+                ))
+            with transaction.atomic():
+                users = User.objects.bulk_create(users)
+                CustomerProfile.objects.bulk_create([
+                    CustomerProfile(
+                        user=user,
+                        phone=f'9{self.rng.randrange(10 ** 9):09d}',
+                        address=f'{self.rng.randrange(1, 500)} Main Road, {self.rng.choice(CITIES)}',
+                        created_at=date_joined,
+                    )
+                    for user, date_joined in zip(users, joined)
+                ])
+            self.user_ids.extend(user.id for user in users)
+        self.user_weights = zipf_weights(total, 0.8)
+        return total
+
+    def seed_carts(self):
+        owners = self.rng.sample(range(len(self.user_ids)), self.volumes['carts'])
+        carts = self.bulk_create(Cart, [
+            Cart(user_id=self.user_ids[owner], created_at=self.timestamp(30)) for owner in owners
+        ])
+        items = []
+        for cart in carts:
+            for index in self.pick_products(self.rng.randint(1, 5)):
+                items.append(CartItem(
+                    cart=cart, product_id=self.product_ids[index],
+                    quantity=self.rng.randint(1, 3), added_at=cart.created_at,
+                ))
+        self.bulk_create(CartItem, items)
+        return len(carts) + len(items)
+
+    # ------------------------------------------------------------
+    # ORDERS
+    # ------------------------------------------------------------
+    def order_status(self, created_at):
+        age = (self.until - created_at).days
+        roll = self.rng.random()
+        if age > 30:
+            return 'cancelled' if roll < 0.08 else 'delivered'
+        if age > 7:
+            return 'cancelled' if roll < 0.05 else 'shipped' if roll < 0.3 else 'delivered'
+        return 'pending' if roll < 0.4 else 'processing' if roll < 0.8 else 'shipped'
+
+    def seed_orders(self):
+        remaining = self.volumes['order_items']
+        orders_created = items_created = 0
+        spread = 2 * self.items_per_order - 1  # sizes 1..spread average items_per_order
+
+        while remaining > 0:
+            orders, lines = [], []
+            while remaining > 0 and len(lines) < self.batch_size:
+                indexes = self.pick_products(min(remaining, self.rng.randint(1, int(spread))))
+                quantities = [1 if self.rng.random() < 0.7 else self.rng.randint(2, 10) for _ in indexes]
+                created_at = self.timestamp(self.days)
+                user_id = self.user_ids[self.rng.choices(range(len(self.user_ids)), cum_weights=self.user_weights)[0]]
+                orders.append(Order(
+                    user_id=user_id,
+                    total_amount=Decimal(sum(
+                        self.product_cents[index] * quantity for index, quantity in zip(indexes, quantities)
+                    )) / 100,
+                    status=self.order_status(created_at),
+                    payment_method='cod' if self.rng.random() < 0.6 else 'online',
+                    shipping_address=f'{self.rng.randrange(1, 500)} Main Road, {self.rng.choice(CITIES)}',
+                    created_at=created_at,
+                    updated_at=created_at,
+                ))
+                lines.append(list(zip(indexes, quantities)))
+                remaining -= len(indexes)
+
+            with transaction.atomic():
+                orders = Order.objects.bulk_create(orders)
+                items = [
+                    OrderItem(
+                        order=order,
+                        product_id=self.product_ids[index],
+                        quantity=quantity,
+                        price=Decimal(self.product_cents[index]) / 100,
+                        product_name=product_name(index),
+                        category_name=self.category_names[self.product_categories[index]],
+                        category_id=self.product_categories[index],
+                    )
+                    for order, order_lines in zip(orders, lines)
+                    for index, quantity in order_lines
+                ]
+                OrderItem.objects.bulk_create(items, batch_size=self.batch_size)
+            orders_created += len(orders)
+            items_created += len(items)
+
+        self.stdout.write(f'{orders_created} orders, {items_created} order items')
+        return orders_created + items_created
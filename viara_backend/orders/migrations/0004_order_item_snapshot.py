@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_order_status_event'),
+        ('products', '0003_related_products'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='category_name',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='product_image',
+            field=models.ImageField(blank=True, null=True, upload_to='products/'),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='product_name',
+            field=models.CharField(blank=True, max_length=200),
+        ),
+        migrations.AlterField(
+            model_name='orderitem',
+            name='product',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='products.product'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations, transaction
+
+BATCH_SIZE = 1000
+
+
+def backfill_snapshot(apps, schema_editor):
+    """Copy product name, category name and image onto existing order items"""
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            items = list(
+                OrderItem.objects
+                .filter(id__gt=last_id)
+                .select_related('product__category')
+                .order_by('id')[:BATCH_SIZE]
+            )
+            if not items:
+                return
+            for item in items:
+                if item.product is not None:
+                    item.product_name = item.product.name
+                    item.category_name = item.product.category.name
+                    item.product_image = item.product.image.name or None
+            OrderItem.objects.bulk_update(items, ['product_name', 'category_name', 'product_image'])
+        last_id = items[-1].id
+
+
+class Migration(migrations.Migration):
+    # Each batch commits on its own, so large tables are not locked at once
+    atomic = False
+
+    dependencies = [
+        ('orders', '0004_order_item_snapshot'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_snapshot, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0008_admin_indexes'),
+        ('products', '0003_related_products'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Bestseller',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window', models.PositiveSmallIntegerField()),
+                ('scope', models.PositiveIntegerField()),
+                ('units', models.IntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='products.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['window', 'scope', '-units'], name='orders_best_window_51369d_idx')],
+                'constraints': [models.UniqueConstraint(fields=('window', 'scope', 'product'), name='unique_bestseller_row')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductSalesDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(db_index=True)),
+                ('units', models.IntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='products.product')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('product', 'day'), name='unique_product_sales_day')],
+            },
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_category(apps, schema_editor):
+    """
+    The category existing rows were sold under is not known any more;
+    their product's current category is the best guess
+    """
+    Product = apps.get_model('products', 'Product')
+    current = Subquery(Product.objects.filter(id=OuterRef('product_id')).values('category_id')[:1])
+    for model in ('OrderItem', 'ArchivedOrderItem'):
+        apps.get_model('orders', model).objects.filter(product__isnull=False).update(category_id=current)
+    apps.get_model('orders', 'ProductSalesDay').objects.update(scope=current)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0009_bestsellers'),
+        ('products', '0004_category_updated_at'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='productsalesday',
+            name='unique_product_sales_day',
+        ),
+        migrations.AddField(
+            model_name='archivedorderitem',
+            name='category',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='products.category'),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='category',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='products.category'),
+        ),
+        migrations.AddField(
+            model_name='productsalesday',
+            name='scope',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_category, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='productsalesday',
+            constraint=models.UniqueConstraint(fields=('product', 'scope', 'day'), name='unique_product_sales_day'),
+        ),
+    ]
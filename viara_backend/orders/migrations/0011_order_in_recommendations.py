@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_counted_orders(apps, schema_editor):
+    """
+    Orders up to the last build's watermark were counted unless they were
+    already cancelled; run build_related_products --full to be exact
+    """
+    build = apps.get_model('products', 'RelatedProductsBuild').objects.order_by('-created_at').first()
+    if build is None:
+        return
+    for model in ('Order', 'ArchivedOrder'):
+        apps.get_model('orders', model).objects.filter(id__lte=build.last_order_id).exclude(
+            status='cancelled'
+        ).update(in_recommendations=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0010_order_item_category'),
+        ('products', '0003_related_products'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedorder',
+            name='in_recommendations',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='in_recommendations',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['in_recommendations', 'status'], name='orders_arch_in_reco_9ff22b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['in_recommendations', 'status'], name='orders_orde_in_reco_fea714_idx'),
+        ),
+        migrations.RunPython(mark_counted_orders, migrations.RunPython.noop),
+    ]
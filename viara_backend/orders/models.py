@@ -1,11 +1,15 @@
 from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
 from django.contrib.auth.models import User
-from products.models import Product
+from products.models import Category, Product
+from products.pricing import PriceBook
 
 # Cart Model
 class Cart(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='cart')
     created_at = models.DateTimeField(auto_now_add=True)
+
+    MERGE_BATCH_SIZE = 500
     
     def __str__(self):
         return f"Cart - {self.user.username}"
@@ -13,7 +17,49 @@ class Cart(models.Model):
     @property
     def total_price(self):
         """Calculate total price of all items in cart"""
-        return sum(item.subtotal for item in self.items.all())
+        return sum(item.subtotal for item in self.priced_items())
+
+    def priced_items(self):
+        """
+        Cart items with unit_price resolved from quantity-break tiers
+        Every line is priced from a single PriceBook (one tier query)
+        """
+        if getattr(self, '_priced_items', None) is None:
+            if 'items' in getattr(self, '_prefetched_objects_cache', {}):
+                items = list(self.items.all())
+            else:
+                items = list(self.items.select_related('product'))
+            book = PriceBook(item.product for item in items)
+            for item in items:
+                item.unit_price = book.unit_price(item.product, item.quantity)
+            self._priced_items = items
+        return self._priced_items
+
+    def merge_items(self, quantities):
+        """
+        Add {product_id: quantity} to the cart in bulk
+        Existing lines are read once, then every line is written with a
+        single upsert on (cart, product) per batch
+        """
+        product_ids = list(quantities)
+        for start in range(0, len(product_ids), self.MERGE_BATCH_SIZE):
+            batch = product_ids[start:start + self.MERGE_BATCH_SIZE]
+            existing = dict(
+                self.items.filter(product_id__in=batch).values_list('product_id', 'quantity')
+            )
+            CartItem.objects.bulk_create(
+                [
+                    CartItem(
+                        cart=self, product_id=product_id,
+                        quantity=existing.get(product_id, 0) + quantities[product_id]
+                    )
+                    for product_id in batch
+                ],
+                update_conflicts=True,
+                unique_fields=['cart', 'product'],
+                update_fields=['quantity'],
+            )
+        self._priced_items = None
 
 
 # Cart Item Model
@@ -21,18 +67,29 @@ class CartItem(models.Model):
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
-    added_at = models.DateTimeField(auto_now_add=True)
+    added_at = models.DateTimeField(auto_now_add=True, db_index=True)
     
     class Meta:
         unique_together = ('cart', 'product')
     
     def __str__(self):
         return f"{self.quantity} x {self.product.name}"
+
+    @property
+    def unit_price(self):
+        """Unit price after quantity-break tiers (set in bulk by Cart.priced_items)"""
+        if getattr(self, '_unit_price', None) is None:
+            self._unit_price = PriceBook([self.product]).unit_price(self.product, self.quantity)
+        return self._unit_price
+
+    @unit_price.setter
+    def unit_price(self, value):
+        self._unit_price = value
     
     @property
     def subtotal(self):
         """Calculate subtotal for this item"""
-        return self.product.price * self.quantity
+        return self.unit_price * self.quantity
 
 
 class Order(models.Model):
@@ -43,6 +100,15 @@ class Order(models.Model):
         ('delivered', 'Delivered'),
         ('cancelled', 'Cancelled'),
     ]
+
+    # Allowed status changes for bulk transitions: from -> [to, ...]
+    STATUS_TRANSITIONS = {
+        'pending': ['processing', 'cancelled'],
+        'processing': ['shipped', 'cancelled'],
+        'shipped': ['delivered', 'cancelled'],
+        'delivered': [],
+        'cancelled': [],
+    }
     
     # NEW: Payment method choices
     PAYMENT_METHOD_CHOICES = [
@@ -65,29 +131,144 @@ class Order(models.Model):
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    # Counted into the product pair counts (see products.recommendations);
+    # a cancelled order still marked is taken back out on the next build
+    in_recommendations = models.BooleanField(default=False)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at']),
+            models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['in_recommendations', 'status']),
+        ]
     
     def __str__(self):
         return f"Order #{self.id} - {self.user.username}"
 
+    @classmethod
+    def statuses_leading_to(cls, status):
+        """Statuses an order may move to `status` from"""
+        return [source for source, targets in cls.STATUS_TRANSITIONS.items() if status in targets]
+
+
+# Order Status Event Model (status history)
+class OrderStatusEvent(models.Model):
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='status_events')
+    from_status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    to_status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    changed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"Order #{self.order_id}: {self.from_status} -> {self.to_status}"
+
 
 # Order Item Model
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
-    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    # Kept when the product is deleted; the line still shows the snapshot below
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, blank=True)
     quantity = models.PositiveIntegerField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    # Product details as they were when the order was placed
+    product_name = models.CharField(max_length=200, blank=True)
+    category_name = models.CharField(max_length=100, blank=True)
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    product_image = models.ImageField(upload_to='products/', blank=True, null=True)
     
     def __str__(self):
-        return f"{self.quantity} x {self.product.name}"
+        return f"{self.quantity} x {self.product_name}"
     
     @property
     def subtotal(self):
         return self.price * self.quantity
 
 
+# Archived Order Models (cold storage for old, finished orders)
+class ArchivedOrder(models.Model):
+    """
+    A delivered or cancelled order moved out of Order by archive_orders
+    Keeps the original order id; its status events are kept as JSON
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_orders')
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    payment_method = models.CharField(max_length=20, choices=Order.PAYMENT_METHOD_CHOICES)
+    shipping_address = models.TextField(blank=True)
+    phone = models.CharField(max_length=20, blank=True)
+    status_history = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    in_recommendations = models.BooleanField(default=False)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at']),
+            models.Index(fields=['in_recommendations', 'status']),
+        ]
+
+    def __str__(self):
+        return f"Archived order #{self.id} - {self.user.username}"
+
+
+class ArchivedOrderItem(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, blank=True)
+    quantity = models.PositiveIntegerField()
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    product_name = models.CharField(max_length=200, blank=True)
+    category_name = models.CharField(max_length=100, blank=True)
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    product_image = models.ImageField(upload_to='products/', blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_name}"
+
+    @property
+    def subtotal(self):
+        return self.price * self.quantity
+
+
+# Idempotency Key Model (safe retries of write requests)
+class IdempotencyKey(models.Model):
+    """
+    Outcome of a write request sent with an Idempotency-Key header
+    A retry with the same key gets the stored response instead of
+    running the write again (see orders.idempotency)
+    """
+    STATUS_CHOICES = [
+        ('in_progress', 'In progress'),
+        ('completed', 'Completed'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)  # sha256 of method, path and body
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='in_progress')
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key_per_user'),
+        ]
+
+    def __str__(self):
+        return f"{self.key} ({self.status})"
+
+
 # Inquiry Model (Contact form submissions)
 class Inquiry(models.Model):
     name = models.CharField(max_length=100)
@@ -100,4 +281,49 @@ class Inquiry(models.Model):
         ordering = ['-created_at']
     
     def __str__(self):
-        return f"Inquiry from {self.name}"
\ No newline at end of file
+        return f"Inquiry from {self.name}"
+
+# Bestseller Models (incrementally maintained leaderboards)
+class ProductSalesDay(models.Model):
+    """
+    Units of a product sold on one day, cancelled orders subtracted
+    Leaderboards are rebuilt from these buckets by compact_bestsellers
+    scope is the id of the category the product was in when sold (a plain
+    integer, like Bestseller.scope), so recategorized products keep their
+    past sales where they were counted
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    scope = models.PositiveIntegerField(default=0)
+    day = models.DateField(db_index=True)
+    units = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'scope', 'day'], name='unique_product_sales_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}/{self.scope} on {self.day}: {self.units}"
+
+
+class Bestseller(models.Model):
+    """
+    Leaderboard row: units of a product sold in the last `window` days
+    scope is 0 for the overall board, else the category id
+    (a plain integer so the overall board has a non-null unique key)
+    """
+    ALL_CATEGORIES = 0
+
+    window = models.PositiveSmallIntegerField()  # days
+    scope = models.PositiveIntegerField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    units = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['window', 'scope', 'product'], name='unique_bestseller_row'),
+        ]
+        indexes = [models.Index(fields=['window', 'scope', '-units'])]
+
+    def __str__(self):
+        return f"{self.window}d/{self.scope}: {self.product_id} x {self.units}"
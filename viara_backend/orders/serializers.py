@@ -1,27 +1,31 @@
 from rest_framework import serializers
-from .models import Cart, CartItem, Order, OrderItem, Inquiry
-from products.serializers import ProductSerializer
+from .models import (
+    ArchivedOrder, ArchivedOrderItem, Cart, CartItem, Order, OrderItem, OrderStatusEvent, Inquiry
+)
+from products.serializers import DynamicFieldsMixin, ProductSerializer
 
-class CartItemSerializer(serializers.ModelSerializer):
+class CartItemSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """
     Serializer for CartItem model
-    Includes full product details and calculated subtotal
+    Includes full product details, tier-priced unit price and subtotal
     """
     product = ProductSerializer(read_only=True)
     product_id = serializers.IntegerField(write_only=True)
+    unit_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
     subtotal = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
     
     class Meta:
         model = CartItem
-        fields = ['id', 'product', 'product_id', 'quantity', 'subtotal', 'added_at']
+        fields = ['id', 'product', 'product_id', 'quantity', 'unit_price', 'subtotal', 'added_at']
 
 
-class CartSerializer(serializers.ModelSerializer):
+class CartSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """
     Serializer for Cart model
     Includes nested cart items and total price
+    Supports ?fields=, ?omit= and ?expand= (see DynamicFieldsMixin)
     """
-    items = CartItemSerializer(many=True, read_only=True)
+    items = CartItemSerializer(source='priced_items', many=True, read_only=True)
     total_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
     
     class Meta:
@@ -29,21 +33,26 @@ class CartSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'items', 'total_price', 'created_at']
 
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """
     Serializer for OrderItem model
+    Product details come from the snapshot taken at order time
     """
-    product_name = serializers.CharField(source='product.name', read_only=True)
     
     class Meta:
         model = OrderItem
-        fields = ['id', 'product', 'product_name', 'quantity', 'price', 'subtotal']
+        fields = [
+            'id', 'product', 'product_name', 'category_name', 'product_image',
+            'quantity', 'price', 'subtotal'
+        ]
+        read_only_fields = ['product_name', 'category_name', 'product_image']
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """
     Serializer for Order model
     Includes nested order items
+    Supports ?fields=, ?omit= and ?expand= (see DynamicFieldsMixin)
     """
     items = OrderItemSerializer(many=True, read_only=True)
     payment_method_display = serializers.CharField(
@@ -62,6 +71,67 @@ class OrderSerializer(serializers.ModelSerializer):
         read_only_fields = ['user', 'total_amount', 'created_at', 'updated_at']
 
 
+class ArchivedOrderItemSerializer(OrderItemSerializer):
+    """
+    Serializer for ArchivedOrderItem (same shape as OrderItemSerializer)
+    """
+    class Meta(OrderItemSerializer.Meta):
+        model = ArchivedOrderItem
+
+
+class ArchivedOrderSerializer(OrderSerializer):
+    """
+    Read-only serializer for ArchivedOrder
+    Same shape as OrderSerializer plus the archived status history
+    """
+    items = ArchivedOrderItemSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = ArchivedOrder
+        fields = OrderSerializer.Meta.fields + ['status_history', 'archived_at']
+        read_only_fields = fields
+
+
+class OrderSummarySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    """
+    Compact order row for list pages: no nested items, just a line count
+    item_count is annotated by the view (Count('items') in the list query)
+    """
+    item_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Order
+        fields = ['id', 'status', 'total_amount', 'item_count', 'created_at']
+        read_only_fields = fields
+
+
+class ArchivedOrderSummarySerializer(OrderSummarySerializer):
+    """
+    Summary row for ArchivedOrder (same shape as OrderSummarySerializer)
+    """
+    class Meta(OrderSummarySerializer.Meta):
+        model = ArchivedOrder
+
+
+class OrderStatusEventSerializer(serializers.ModelSerializer):
+    """
+    Serializer for OrderStatusEvent (status history / live updates)
+    """
+    class Meta:
+        model = OrderStatusEvent
+        fields = ['id', 'order', 'from_status', 'to_status', 'created_at']
+
+
+class OrderBulkTransitionSerializer(serializers.Serializer):
+    """
+    Serializer for bulk order status transitions (staff only)
+    """
+    order_ids = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False, max_length=10000
+    )
+    status = serializers.ChoiceField(choices=Order.STATUS_CHOICES)
+
+
 class InquirySerializer(serializers.ModelSerializer):
     """
     Serializer for Inquiry model (Contact form submissions)
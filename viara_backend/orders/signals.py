@@ -0,0 +1,12 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .events import broker
+from .models import OrderStatusEvent
+
+
+@receiver(post_save, sender=OrderStatusEvent)
+def order_status_event_created(sender, instance, created, **kwargs):
+    # bulk_create skips post_save; bulk writers publish themselves
+    if created:
+        broker.publish_on_commit()
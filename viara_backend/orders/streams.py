@@ -0,0 +1,168 @@
+import asyncio
+import io
+import json
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from corsheaders.middleware import CorsMiddleware
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signing
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections
+from django.http import HttpResponse
+from rest_framework.authtoken.models import Token
+from rest_framework.utils.encoders import JSONEncoder
+
+from .events import broker
+from .models import OrderStatusEvent
+from .serializers import OrderStatusEventSerializer
+
+ORDER_EVENTS_PATH = '/api/orders/events/'
+BATCH_SIZE = 100
+TICKET_SALT = 'orders.streams.ticket'
+
+
+def make_ticket(user):
+    """Signed ticket that opens the stream as user for ORDER_EVENTS_TICKET_SECONDS"""
+    return signing.dumps(user.pk, salt=TICKET_SALT)
+
+
+def get_user(token_key=None, ticket=None):
+    """Active user for a DRF token key or a stream ticket, or None"""
+    close_old_connections()
+    if token_key:
+        token = Token.objects.select_related('user').filter(key=token_key).first()
+        user = token.user if token else None
+    else:
+        max_age = getattr(settings, 'ORDER_EVENTS_TICKET_SECONDS', 60)
+        try:
+            user = User.objects.filter(pk=signing.loads(ticket, salt=TICKET_SALT, max_age=max_age)).first()
+        except signing.BadSignature:
+            return None
+    if user is None or not user.is_active:
+        return None
+    return user
+
+
+def cors_headers(scope):
+    """
+    CORS headers for the stream, from the project's django-cors-headers
+    settings (the stream is served outside Django's middleware)
+    """
+    response = CorsMiddleware(lambda request: None).add_response_headers(
+        ASGIRequest(scope, io.BytesIO()), HttpResponse()
+    )
+    return [
+        (key.lower().encode(), value.encode()) for key, value in response.items()
+        if key.lower().startswith('access-control-') or key.lower() == 'vary'
+    ]
+
+
+def get_events(user, last_event_id):
+    """
+    Status events after last_event_id that user may see
+    Staff see every order, customers only their own
+    """
+    close_old_connections()
+    events = OrderStatusEvent.objects.filter(id__gt=last_event_id).order_by('id')
+    if not (user.is_staff or user.is_superuser):
+        events = events.filter(order__user=user)
+    return OrderStatusEventSerializer(events[:BATCH_SIZE], many=True).data
+
+
+def get_latest_event_id():
+    close_old_connections()
+    latest = OrderStatusEvent.objects.order_by('-id').values_list('id', flat=True).first()
+    return latest or 0
+
+
+def format_event(event):
+    data = json.dumps(event, cls=JSONEncoder, separators=(',', ':'))
+    return f"id: {event['id']}\nevent: order_status\ndata: {data}\n\n".encode()
+
+
+async def order_events_stream(scope, receive, send):
+    """
+    Server-Sent Events feed of order status changes
+    GET /api/orders/events/
+
+    Authenticate with "Authorization: Token <key>", or, since EventSource
+    cannot set headers, with ?ticket= from POST /api/orders/events/ticket/
+    (short-lived, so a logged URL does not leak the account). The ticket
+    is only checked when connecting; ask for a new one to reconnect.
+    Resume with the Last-Event-ID header or ?last_event_id=; without
+    either, only new changes are sent.
+    """
+    headers = {key.decode().lower(): value.decode() for key, value in scope['headers']}
+    query = {key: values[0] for key, values in parse_qs(scope['query_string'].decode()).items()}
+
+    token_key = None
+    authorization = headers.get('authorization', '')
+    if authorization.startswith('Token '):
+        token_key = authorization[len('Token '):].strip()
+    ticket = query.get('ticket')
+
+    cors = cors_headers(scope)
+    user = await sync_to_async(get_user)(token_key, ticket) if token_key or ticket else None
+    if user is None:
+        await send({
+            'type': 'http.response.start',
+            'status': 401,
+            'headers': cors + [(b'content-type', b'application/json')],
+        })
+        await send({'type': 'http.response.body', 'body': b'{"error":"Authentication required"}'})
+        return
+
+    last_event_id = headers.get('last-event-id') or query.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id)
+    except (TypeError, ValueError):
+        last_event_id = await sync_to_async(get_latest_event_id)()
+
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': cors + [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': b'retry: 3000\n\n', 'more_body': True})
+
+    poll_seconds = getattr(settings, 'ORDER_EVENTS_POLL_SECONDS', 15)
+    wakeup = broker.subscribe()
+    disconnected = asyncio.Event()
+
+    async def watch_disconnect():
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                disconnected.set()
+                return
+
+    watcher = asyncio.create_task(watch_disconnect())
+    try:
+        while not disconnected.is_set():
+            wakeup.clear()
+            events = await sync_to_async(get_events)(user, last_event_id)
+            for event in events:
+                await send({'type': 'http.response.body', 'body': format_event(event), 'more_body': True})
+                last_event_id = event['id']
+            if len(events) == BATCH_SIZE:
+                continue
+
+            waiters = [asyncio.create_task(wakeup.wait()), asyncio.create_task(disconnected.wait())]
+            done, pending = await asyncio.wait(
+                waiters, timeout=poll_seconds, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in pending:
+                task.cancel()
+            if not done:
+                # Nothing published in this process; keep the connection alive
+                # and poll the table for changes made elsewhere
+                await send({'type': 'http.response.body', 'body': b': keep-alive\n\n', 'more_body': True})
+    finally:
+        broker.unsubscribe(wakeup)
+        watcher.cancel()
@@ -1,3 +1,723 @@
-from django.test import TestCase
+import asyncio
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from products.models import Category, PriceTier, Product
+from viara_project.testing import QueryBudgetTestCase
+from . import bestsellers, guest_cart
+from .checkout import place_order
+from .models import (
+    ArchivedOrder, ArchivedOrderItem, Bestseller, Cart, CartItem, IdempotencyKey, Inquiry, Order, OrderItem,
+    OrderStatusEvent, ProductSalesDay
+)
+from .streams import ORDER_EVENTS_PATH, order_events_stream
+
+
+class AdminChangelistQueryTests(TestCase):
+    """
+    Changelist pages must run a fixed number of queries however many rows
+    they show (no per-row FK lookups, no unbounded counts)
+    """
+    MAX_QUERIES = 12
+    changelists = ['cart', 'cartitem', 'order', 'orderitem', 'orderstatusevent', 'archivedorder']
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.category = Category.objects.create(name='Electronics')
+        cls.product = Product.objects.create(name='Notebook', category=cls.category, price=10)
+
+    def add_rows(self, count):
+        start = User.objects.count()
+        for index in range(start, start + count):
+            user = User.objects.create_user(f'customer{index}')
+            cart = Cart.objects.create(user=user)
+            CartItem.objects.create(cart=cart, product=self.product, quantity=1)
+            order = Order.objects.create(user=user, total_amount=10)
+            OrderItem.objects.create(
+                order=order, product=self.product, quantity=1, price=10, product_name='Notebook'
+            )
+            OrderStatusEvent.objects.create(
+                order=order, from_status='pending', to_status='processing', changed_by=self.admin
+            )
+            ArchivedOrder.objects.create(
+                id=order.id + 100000, user=user, total_amount=10, status='delivered',
+                created_at=order.created_at, updated_at=order.created_at,
+            )
+
+    def changelist_queries(self, model_name):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(f'admin:orders_{model_name}_changelist'))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.client.force_login(self.admin)
+        self.add_rows(2)
+        few = {name: self.changelist_queries(name) for name in self.changelists}
+        self.add_rows(20)
+        many = {name: self.changelist_queries(name) for name in self.changelists}
+
+        for name in self.changelists:
+            with self.subTest(changelist=name):
+                self.assertEqual(few[name], many[name])
+                self.assertLessEqual(many[name], self.MAX_QUERIES)
+
+    def test_count_is_capped(self):
+        from .admin import CappedCountPaginator
+
+        self.add_rows(3)
+        paginator = CappedCountPaginator(Order.objects.order_by('id'), 1)
+        paginator.MAX_COUNT = 2
+        self.assertEqual(paginator.count, 2)
+
+
+class OrdersQueryBudgetTests(QueryBudgetTestCase):
+    """Every route in orders/urls.py, at 2 and 20 rows of cart / order data"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.customer = User.objects.create_user('customer', 'customer@example.com', 'password')
+        cls.category = Category.objects.create(name='Electronics')
+
+    def setUp(self):
+        self.client.force_authenticate(self.customer)
+
+    def grow(self, count):
+        """count more products, cart lines, orders, archived orders and inquiries"""
+        start = Product.objects.count()
+        products = Product.objects.bulk_create([
+            Product(name=f'Notebook {index}', description='Ruled', price=10, category=self.category)
+            for index in range(start, start + count)
+        ])
+        cart, created = Cart.objects.get_or_create(user=self.customer)
+        CartItem.objects.bulk_create([CartItem(cart=cart, product=product, quantity=1) for product in products])
+
+        for product in products:
+            order = self.place_order(products=[product, products[0]])
+            OrderStatusEvent.objects.create(order=order, from_status='pending', to_status='pending')
+            archived = ArchivedOrder.objects.create(
+                id=order.id + 100000, user=self.customer, total_amount=20, status='delivered',
+                payment_method='cod', created_at=order.created_at, updated_at=order.created_at,
+            )
+            ArchivedOrderItem.objects.create(
+                id=archived.id, order=archived, product=product, quantity=2, price=10, product_name=product.name
+            )
+        Inquiry.objects.bulk_create([
+            Inquiry(name='Visitor', email='visitor@example.com', message='Hello') for product in products
+        ])
+
+    def place_order(self, products=None, status='pending'):
+        products = products if products is not None else list(Product.objects.all())
+        order = Order.objects.create(user=self.customer, total_amount=10 * len(products), status=status)
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=1, price=10, product_name=product.name)
+            for product in products
+        ])
+        return order
+
+    def fill_cart(self):
+        cart, created = Cart.objects.get_or_create(user=self.customer)
+        in_cart = cart.items.values_list('product_id', flat=True)
+        CartItem.objects.bulk_create([
+            CartItem(cart=cart, product=product, quantity=1) for product in Product.objects.exclude(id__in=in_cart)
+        ])
+
+    def latest(self, model, **filters):
+        return model.objects.filter(**filters).order_by('-id').first()
+
+    # ------------------------------------------------------------
+    # CART
+    # ------------------------------------------------------------
+    def cart(self):
+        self.fill_cart()
+        return Cart.objects.get(user=self.customer)
+
+    def test_cart_list(self):
+        self.assertQueryBudget(6, lambda: self.client.get('/api/cart/'))
+
+    def test_cart_retrieve(self):
+        self.assertQueryBudget(5, lambda cart: self.client.get(f'/api/cart/{cart.id}/'), setup=self.cart)
+
+    def test_cart_current(self):
+        self.assertQueryBudget(5, lambda: self.client.get('/api/cart/current/'))
+
+    def test_cart_add_item(self):
+        self.assertQueryBudget(
+            8,
+            lambda product: self.client.post(
+                '/api/cart/add_item/', {'product_id': product.id, 'quantity': 1}, format='json'
+            ),
+            setup=lambda: self.latest(Product),
+        )
+
+    def test_cart_remove_item(self):
+        self.assertQueryBudget(
+            2,
+            lambda item: self.client.post('/api/cart/remove_item/', {'item_id': item.id}, format='json'),
+            setup=lambda: self.latest(CartItem),
+        )
+
+    def test_cart_clear(self):
+        self.assertQueryBudget(2, lambda cart: self.client.post('/api/cart/clear/'), setup=self.cart)
+
+    def test_cart_destroy(self):
+        self.assertQueryBudget(6, lambda cart: self.client.delete(f'/api/cart/{cart.id}/'), setup=self.cart)
+
+    def guest_token(self):
+        self.client.force_authenticate(None)
+        return guest_cart.dump({product_id: 2 for product_id in Product.objects.values_list('id', flat=True)})
+
+    def test_cart_guest(self):
+        self.assertQueryBudget(
+            2, lambda token: self.client.get('/api/cart/guest/', {'guest_cart': token}), setup=self.guest_token
+        )
+
+    def test_cart_guest_set_item(self):
+        self.assertQueryBudget(
+            3,
+            lambda prepared: self.client.post('/api/cart/guest/', {
+                'guest_cart': prepared[0], 'product_id': prepared[1].id, 'quantity': 3,
+            }, format='json'),
+            setup=lambda: (self.guest_token(), self.latest(Product)),
+        )
+
+    def test_cart_guest_token(self):
+        self.grow(self.SMALL)
+        first, second = Product.objects.order_by('id')[:2]
+        self.client.force_authenticate(None)
+        response = self.client.post('/api/cart/guest/', {'product_id': first.id, 'quantity': 2}, format='json')
+        response = self.client.post('/api/cart/guest/', {
+            'guest_cart': response.data['guest_cart'], 'product_id': second.id, 'quantity': 1,
+        }, format='json')
+        token = response.data['guest_cart']
+        self.assertEqual(guest_cart.load(token), {first.id: 2, second.id: 1})
+        self.assertEqual(response.data['total_price'], 30)
+
+        response = self.client.post('/api/cart/guest/', {
+            'guest_cart': token, 'product_id': first.id, 'quantity': 0,
+        }, format='json')
+        self.assertEqual(guest_cart.load(response.data['guest_cart']), {second.id: 1})
+        self.assertEqual(guest_cart.load(token[:-1] + 'x'), {})
+
+    # ------------------------------------------------------------
+    # ORDERS
+    # ------------------------------------------------------------
+    def test_order_list(self):
+        self.assertQueryBudget(4, lambda: self.client.get('/api/orders/'))
+
+    def test_order_list_not_modified(self):
+        self.grow(self.SMALL)
+        etag = self.client.get('/api/orders/')['ETag']
+        self.assertEqual(self.client.get('/api/orders/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        order = self.latest(Order)
+        self.client.post(f'/api/orders/{order.id}/cancel/')
+        self.assertEqual(self.client.get('/api/orders/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_order_list_archived(self):
+        self.assertQueryBudget(4, lambda: self.client.get('/api/orders/?archived=1'))
+
+    def test_order_list_summary(self):
+        self.assertQueryBudget(3, lambda: self.client.get('/api/orders/?view=summary'))
+
+        order = self.place_order()
+        row = self.client.get('/api/orders/?view=summary').data['results'][0]
+        self.assertEqual(row['id'], order.id)
+        self.assertEqual(row['item_count'], Product.objects.count())
+        self.assertNotIn('items', row)
+
+    def test_order_list_archived_summary(self):
+        self.assertQueryBudget(3, lambda: self.client.get('/api/orders/?view=summary&archived=1'))
+
+    def test_order_retrieve(self):
+        self.assertQueryBudget(
+            3, lambda order: self.client.get(f'/api/orders/{order.id}/'), setup=self.place_order
+        )
+
+    def test_order_retrieve_archived(self):
+        self.assertQueryBudget(
+            3,
+            lambda order: self.client.get(f'/api/orders/{order.id}/?archived=1'),
+            setup=lambda: self.latest(ArchivedOrder),
+        )
+
+    def test_order_create_from_cart(self):
+        self.assertQueryBudget(
+            19,
+            lambda cart: self.client.post('/api/orders/create_from_cart/', {'payment_method': 'cod'}, format='json'),
+            setup=self.cart,
+        )
+
+    def test_order_upload(self):
+        def csv_file():
+            lines = ''.join(f'{product_id},1\n' for product_id in Product.objects.values_list('id', flat=True))
+            return SimpleUploadedFile('order.csv', f'product_id,quantity\n{lines}'.encode(), 'text/csv')
+
+        self.assertQueryBudget(
+            13,
+            lambda upload: self.client.post('/api/orders/upload/', {'file': upload, 'target': 'order'}),
+            setup=csv_file,
+        )
+
+    def test_order_reorder(self):
+        self.assertQueryBudget(
+            8, lambda order: self.client.post(f'/api/orders/{order.id}/reorder/'), setup=self.place_order
+        )
+
+    def test_order_cancel(self):
+        self.assertQueryBudget(
+            14, lambda order: self.client.post(f'/api/orders/{order.id}/cancel/'), setup=self.place_order
+        )
+
+    def test_order_bulk_transition(self):
+        self.client.force_authenticate(self.admin)
+        self.assertQueryBudget(
+            5,
+            lambda order_ids: self.client.post(
+                '/api/orders/bulk_transition/', {'order_ids': order_ids, 'status': 'processing'}, format='json'
+            ),
+            setup=lambda: list(Order.objects.values_list('id', flat=True)),
+        )
+
+    def test_order_partial_update(self):
+        self.client.force_authenticate(self.admin)
+        self.assertQueryBudget(
+            7,
+            lambda order: self.client.patch(f'/api/orders/{order.id}/', {'status': 'processing'}),
+            setup=self.place_order,
+        )
+
+    def test_order_destroy(self):
+        self.client.force_authenticate(self.admin)
+        self.assertQueryBudget(
+            5, lambda order: self.client.delete(f'/api/orders/{order.id}/'), setup=self.place_order
+        )
+
+    # ------------------------------------------------------------
+    # INQUIRIES
+    # ------------------------------------------------------------
+    def test_inquiry_list(self):
+        self.assertQueryBudget(2, lambda: self.client.get('/api/inquiries/'))
+
+    def test_inquiry_retrieve(self):
+        self.assertQueryBudget(
+            1, lambda inquiry: self.client.get(f'/api/inquiries/{inquiry.id}/'),
+            setup=lambda: self.latest(Inquiry),
+        )
+
+    def test_inquiry_create(self):
+        self.assertQueryBudget(1, lambda: self.client.post('/api/inquiries/', {
+            'name': 'Visitor', 'email': 'visitor@example.com', 'message': 'Bulk pricing?',
+        }))
+
+
+class BestsellerTests(APITestCase):
+    """Leaderboards follow orders and cancellations; compaction ages out old sales"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user('customer', 'customer@example.com', 'password')
+        cls.books = Category.objects.create(name='Books')
+        cls.pens = Category.objects.create(name='Pens')
+        cls.notebook = Product.objects.create(name='Notebook', category=cls.books, price=10)
+        cls.diary = Product.objects.create(name='Diary', category=cls.books, price=10)
+        cls.pen = Product.objects.create(name='Pen', category=cls.pens, price=1)
+
+    def setUp(self):
+        bestsellers.invalidate()
+
+    def board(self, window, scope=Bestseller.ALL_CATEGORIES):
+        bestsellers.invalidate()
+        return [(product.name, units) for product, units in bestsellers.top(window, scope)]
+
+    def test_orders_and_cancellations(self):
+        place_order(self.customer, [(self.notebook, 2), (self.pen, 5)])
+        order = place_order(self.customer, [(self.diary, 3), (self.notebook, 2)])
+        self.assertEqual(self.board(7), [('Pen', 5), ('Notebook', 4), ('Diary', 3)])
+        self.assertEqual(self.board(90, self.books.id), [('Notebook', 4), ('Diary', 3)])
+
+        self.client.force_authenticate(self.customer)
+        self.client.post(f'/api/orders/{order.id}/cancel/')
+        self.assertEqual(self.board(30), [('Pen', 5), ('Notebook', 2)])
+
+        response = self.client.get(f'/api/bestsellers/?window=7&category={self.pens.id}')
+        self.assertEqual(response.data['results'][0]['units'], 5)
+        self.assertEqual(response.data['results'][0]['product']['name'], 'Pen')
+
+    def test_add_units_increments_in_the_database(self):
+        today = timezone.localdate()
+        key = (self.notebook.id, self.books.id, today)
+        bestsellers.add_units(ProductSalesDay, ('product_id', 'scope', 'day'), {key: 2})
+        # Another writer bumps the row in between: its units must not be overwritten
+        ProductSalesDay.objects.filter(product=self.notebook).update(units=F('units') + 5)
+        bestsellers.add_units(ProductSalesDay, ('product_id', 'scope', 'day'), {
+            key: 3, (self.pen.id, self.pens.id, today): -1,
+        })
+        self.assertEqual(
+            sorted(ProductSalesDay.objects.values_list('product_id', 'day', 'units')),
+            sorted([(self.notebook.id, today, 10), (self.pen.id, today, -1)])
+        )
+
+    def test_compact_ages_out_old_sales(self):
+        order = place_order(self.customer, [(self.notebook, 1)])
+        Order.objects.filter(id=order.id).update(created_at=timezone.now() - timedelta(days=10))
+        place_order(self.customer, [(self.pen, 2)])
+        bestsellers.rebuild_buckets()
+        bestsellers.compact()
+
+        self.assertEqual(self.board(7), [('Pen', 2)])
+        self.assertEqual(self.board(30), [('Pen', 2), ('Notebook', 1)])
+
+        bestsellers.compact(today=timezone.localdate() + timedelta(days=100))
+        self.assertFalse(ProductSalesDay.objects.exists())
+        self.assertFalse(Bestseller.objects.exists())
+
+    def test_cancel_after_recategorizing(self):
+        order = place_order(self.customer, [(self.notebook, 2)])
+        self.notebook.category = self.pens
+        self.notebook.save()
+        place_order(self.customer, [(self.notebook, 1)])
+        self.assertEqual(self.board(7, self.books.id), [('Notebook', 2)])
+        self.assertEqual(self.board(7, self.pens.id), [('Notebook', 1)])
+
+        # Taken back from the board it was counted on, before and after compaction
+        bestsellers.record_status_change([order.id], 'pending', 'cancelled')
+        self.assertEqual(self.board(7, self.books.id), [])
+        self.assertEqual(self.board(7, self.pens.id), [('Notebook', 1)])
+        bestsellers.compact()
+        self.assertEqual(self.board(7), [('Notebook', 1)])
+        self.assertEqual(self.board(7, self.books.id), [])
+        self.assertEqual(self.board(7, self.pens.id), [('Notebook', 1)])
+
+        bestsellers.record_status_change([order.id], 'cancelled', 'pending')
+        bestsellers.rebuild_buckets()
+        bestsellers.compact()
+        self.assertEqual(self.board(7), [('Notebook', 3)])
+        self.assertEqual(self.board(7, self.books.id), [('Notebook', 2)])
+        self.assertEqual(self.board(7, self.pens.id), [('Notebook', 1)])
+
+    def test_admin_status_changes(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(admin)
+        order = place_order(self.customer, [(self.pen, 2)])
+
+        def change(status):
+            response = self.client.post(reverse('admin:orders_order_change', args=[order.id]), {
+                'user': self.customer.id, 'total_amount': order.total_amount, 'status': status,
+                'payment_method': order.payment_method, 'shipping_address': '', 'phone': '',
+            })
+            self.assertEqual(response.status_code, 302)
+
+        change('cancelled')
+        self.assertEqual(self.board(7), [])
+        change('pending')
+        self.assertEqual(self.board(7), [('Pen', 2)])
+        self.assertEqual(OrderStatusEvent.objects.filter(order=order).count(), 2)
+
+
+class IdempotencyTests(APITestCase):
+    """Retries with the same Idempotency-Key replay the first response"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user('customer', 'customer@example.com', 'password')
+        category = Category.objects.create(name='Electronics')
+        cls.products = Product.objects.bulk_create([
+            Product(name=f'Notebook {index}', category=category, price=10) for index in range(50)
+        ])
+
+    def setUp(self):
+        self.client.force_authenticate(self.customer)
+
+    def csv_file(self, quantity=1):
+        lines = ''.join(f'{product.id},{quantity}\n' for product in self.products)
+        return SimpleUploadedFile('order.csv', f'product_id,quantity\n{lines}'.encode(), 'text/csv')
+
+    def upload(self, key, quantity=1):
+        return self.client.post(
+            '/api/orders/upload/', {'file': self.csv_file(quantity), 'target': 'cart'},
+            HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    @override_settings(DATA_UPLOAD_MAX_MEMORY_SIZE=100)
+    def test_multipart_upload_is_not_buffered(self):
+        # The CSV is far above DATA_UPLOAD_MAX_MEMORY_SIZE; only the form fields count
+        response = self.upload('k1')
+        self.assertEqual(response.status_code, 200, response.content)
+
+        replayed = self.upload('k1')
+        self.assertEqual(replayed.status_code, 200)
+        self.assertEqual(replayed['Idempotent-Replayed'], 'true')
+        self.assertEqual(replayed.data, response.data)
+        self.assertEqual(
+            set(CartItem.objects.filter(cart__user=self.customer).values_list('quantity', flat=True)), {1}
+        )
+
+        self.assertEqual(self.upload('k1', quantity=2).status_code, 422)
+
+    def test_json_body(self):
+        product = self.products[0]
+
+        def add(quantity):
+            return self.client.post(
+                '/api/cart/add_item/', {'product_id': product.id, 'quantity': quantity},
+                format='json', HTTP_IDEMPOTENCY_KEY='add-1',
+            )
+
+        self.assertEqual(add(2).status_code, 200)
+        self.assertEqual(add(2)['Idempotent-Replayed'], 'true')
+        self.assertEqual(CartItem.objects.get(cart__user=self.customer, product=product).quantity, 2)
+        self.assertEqual(add(3).status_code, 422)
+
+    def test_failed_write_releases_the_key(self):
+        self.client.post('/api/cart/add_item/', {'product_id': self.products[0].id}, format='json')
+
+        def checkout():
+            return self.client.post(
+                '/api/orders/create_from_cart/', {'payment_method': 'cod'},
+                format='json', HTTP_IDEMPOTENCY_KEY='checkout-1',
+            )
+
+        with mock.patch('orders.views.place_order', side_effect=RuntimeError('crashed')):
+            with self.assertRaises(RuntimeError):
+                checkout()
+        # The key was stored in the write's transaction, so it went with it
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        self.assertEqual(checkout().status_code, 201)
+        self.assertEqual(checkout()['Idempotent-Replayed'], 'true')
+        self.assertEqual(Order.objects.filter(user=self.customer).count(), 1)
+
+
+class OrderUploadTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user('customer', 'customer@example.com', 'password')
+        category = Category.objects.create(name='Electronics')
+        cls.product = Product.objects.create(name='Notebook', category=category, price=10)
+
+    def setUp(self):
+        self.client.force_authenticate(self.customer)
+
+    def upload(self, content):
+        return self.client.post('/api/orders/upload/', {
+            'file': SimpleUploadedFile('order.csv', content, 'text/csv'), 'target': 'cart',
+        })
+
+    def test_lines(self):
+        response = self.upload(f'Product_ID,Qty\n{self.product.id},2\n{self.product.id},1\nx,1\n999999,1\n'.encode())
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.data['lines_read'], 4)
+        self.assertEqual(response.data['products'], 1)
+        self.assertEqual([error['line'] for error in response.data['errors']], [4, 5])
+        self.assertEqual(CartItem.objects.get(cart__user=self.customer).quantity, 3)
+
+    def test_unreadable_files_are_rejected(self):
+        too_long = 'x' * (131072 + 1)
+        for content in [
+            b'sku,quantity\n\xff\xfe,1\n',
+            'product_id,quantity\n"unterminated,1\n'.encode() + too_long.encode(),
+            f'product_id,quantity\n{too_long},1\n'.encode(),
+            f'"{too_long}",quantity\n'.encode(),
+            b'\xff\xfeproduct_id,quantity\n',
+            b'name,price\n',
+        ]:
+            with self.subTest(content=content[:30]):
+                response = self.upload(content)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.data)
+        self.assertFalse(CartItem.objects.exists())
+
+
+class OrderEventStreamTests(APITestCase):
+    """The SSE feed opens with a short-lived ticket and follows the project's CORS settings"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user('customer', 'customer@example.com', 'password')
+        cls.token = Token.objects.create(user=cls.customer)
+        category = Category.objects.create(name='Electronics')
+        cls.product = Product.objects.create(name='Notebook', category=category, price=10)
+
+    def ticket(self):
+        self.client.force_authenticate(self.customer)
+        response = self.client.post('/api/orders/events/ticket/')
+        self.client.force_authenticate(None)
+        self.assertEqual(response.status_code, 200)
+        return response.data['ticket']
+
+    def stream(self, query='', headers=()):
+        """(status, headers, body) of one connection, closed after the first event"""
+        messages = []
+        first_event = asyncio.Event()
+
+        async def receive():
+            await first_event.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            messages.append(message)
+            if b'event: order_status' in message.get('body', b''):
+                first_event.set()
+
+        scope = {
+            'type': 'http', 'method': 'GET', 'path': ORDER_EVENTS_PATH, 'root_path': '',
+            'query_string': query.encode(), 'headers': [(key.encode(), value.encode()) for key, value in headers],
+        }
+        async_to_sync(order_events_stream)(scope, receive, send)
+        start = messages[0]
+        return start['status'], dict(start['headers']), b''.join(message.get('body', b'') for message in messages[1:])
+
+    def test_ticket(self):
+        self.assertEqual(self.client.post('/api/orders/events/ticket/').status_code, 401)
+
+        order = place_order(self.customer, [(self.product, 1)])
+        event = OrderStatusEvent.objects.create(order=order, from_status='pending', to_status='processing')
+        status, headers, body = self.stream(f'ticket={self.ticket()}&last_event_id={event.id - 1}')
+        self.assertEqual(status, 200)
+        self.assertEqual(headers[b'content-type'], b'text/event-stream')
+        self.assertIn(f'id: {event.id}\nevent: order_status'.encode(), body)
+
+    def test_rejected_credentials(self):
+        ticket = self.ticket()
+        for query in [f'token={self.token.key}', f'ticket={ticket[:-2]}', '']:
+            with self.subTest(query=query):
+                self.assertEqual(self.stream(query)[0], 401)
+        with override_settings(ORDER_EVENTS_TICKET_SECONDS=-1):
+            self.assertEqual(self.stream(f'ticket={ticket}')[0], 401)
+        # Non-browser clients may still send the token in the header
+        order = place_order(self.customer, [(self.product, 1)])
+        OrderStatusEvent.objects.create(order=order, from_status='pending', to_status='processing')
+        self.assertEqual(self.stream('last_event_id=0', [('authorization', f'Token {self.token.key}')])[0], 200)
+
+    @override_settings(CORS_ALLOW_ALL_ORIGINS=False, CORS_ALLOWED_ORIGINS=['http://localhost:5173'])
+    def test_cors_follows_settings(self):
+        status, headers, body = self.stream('', [('origin', 'http://localhost:5173')])
+        self.assertEqual(status, 401)
+        self.assertEqual(headers[b'access-control-allow-origin'], b'http://localhost:5173')
+        self.assertEqual(headers[b'access-control-allow-credentials'], b'true')
+
+        status, headers, body = self.stream('', [('origin', 'http://evil.example')])
+        self.assertNotIn(b'access-control-allow-origin', headers)
+
+
+class OrderApiTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.customer = User.objects.create_user('customer', 'customer@example.com', 'password')
+        cls.books = Category.objects.create(name='Books')
+        cls.notebook = Product.objects.create(name='Notebook', category=cls.books, price=10)
+        cls.diary = Product.objects.create(name='Diary', category=cls.books, price=4)
+        PriceTier.objects.create(product=cls.notebook, min_quantity=10, unit_price=9)
+
+    def setUp(self):
+        self.client.force_authenticate(self.customer)
+
+    def checkout(self, lines):
+        for product, quantity in lines:
+            self.client.post('/api/cart/add_item/', {'product_id': product.id, 'quantity': quantity}, format='json')
+        response = self.client.post('/api/orders/create_from_cart/', {'payment_method': 'cod'}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return Order.objects.get(pk=response.data['order']['id'])
+
+    def test_fields(self):
+        order = self.checkout([(self.notebook, 2)])
+        data = self.client.get(f'/api/orders/{order.id}/?fields=id,status,items.quantity').data
+        self.assertEqual(data, {'id': order.id, 'status': 'pending', 'items': [{'quantity': 2}]})
+        data = self.client.get('/api/orders/?omit=items').data['results'][0]
+        self.assertNotIn('items', data)
+        self.assertEqual(data['total_amount'], '20.00')
+        data = self.client.get('/api/cart/current/?fields=items.product.name&expand=items.product').data
+        self.assertEqual(data, {'items': []})
+
+    def test_checkout_uses_tier_prices(self):
+        self.client.post('/api/cart/add_item/', {'product_id': self.notebook.id, 'quantity': 10}, format='json')
+        cart = self.client.get('/api/cart/current/').data
+        self.assertEqual(cart['items'][0]['unit_price'], '9.00')
+        self.assertEqual(cart['total_price'], '90.00')
+
+        self.client.post('/api/cart/add_item/', {'product_id': self.diary.id, 'quantity': 1}, format='json')
+        response = self.client.post('/api/orders/create_from_cart/', {'payment_method': 'cod'}, format='json')
+        self.assertEqual(response.data['order']['total_amount'], '94.00')
+        self.assertEqual(
+            sorted(OrderItem.objects.values_list('product_name', 'price')),
+            [('Diary', Decimal('4.00')), ('Notebook', Decimal('9.00'))]
+        )
+        self.assertFalse(CartItem.objects.filter(cart__user=self.customer).exists())
+
+    def test_guest_cart_total(self):
+        self.client.force_authenticate(None)
+        total = self.client.get('/api/cart/guest/').data['total_price']
+        self.assertIsInstance(total, Decimal)
+        self.assertEqual(str(total), '0.00')
+        response = self.client.post('/api/cart/guest/', {'product_id': self.notebook.id, 'quantity': 10}, format='json')
+        self.assertEqual(str(response.data['total_price']), '90.00')
+
+    def test_items_keep_product_snapshot(self):
+        order = self.checkout([(self.notebook, 1), (self.diary, 2)])
+        Product.objects.filter(pk=self.notebook.pk).update(name='Notebook v2')
+        self.books.name = 'Paper'
+        self.books.save()
+        Product.objects.filter(pk=self.diary.pk).delete()
+
+        items = {item['product_name']: item for item in self.client.get(f'/api/orders/{order.id}/').data['items']}
+        self.assertEqual(set(items), {'Notebook', 'Diary'})
+        self.assertEqual(items['Notebook']['category_name'], 'Books')
+        self.assertIsNone(items['Diary']['product'])
+        self.assertEqual(items['Diary']['subtotal'], Decimal('8.00'))
+
+    def test_bulk_transition(self):
+        pending = self.checkout([(self.notebook, 1)])
+        delivered = self.checkout([(self.diary, 1)])
+        Order.objects.filter(pk=delivered.pk).update(status='delivered')
+        body = {'order_ids': [pending.id, delivered.id, 999999, pending.id], 'status': 'processing'}
+        self.assertEqual(self.client.post('/api/orders/bulk_transition/', body, format='json').status_code, 403)
+
+        self.client.force_authenticate(self.admin)
+        response = self.client.post('/api/orders/bulk_transition/', body, format='json')
+        self.assertEqual(response.data['updated'], 1)
+        self.assertEqual(response.data['results'], [
+            {'id': pending.id, 'result': 'updated', 'from_status': 'pending'},
+            {'id': delivered.id, 'result': 'invalid_transition', 'from_status': 'delivered'},
+            {'id': 999999, 'result': 'not_found'},
+        ])
+        self.assertEqual(Order.objects.get(pk=pending.pk).status, 'processing')
+        self.assertEqual(
+            list(OrderStatusEvent.objects.values_list('order_id', 'from_status', 'to_status', 'changed_by')),
+            [(pending.id, 'pending', 'processing', self.admin.id)]
+        )
+
+    def test_reorder(self):
+        order = self.checkout([(self.notebook, 2), (self.diary, 1)])
+        self.client.post('/api/cart/add_item/', {'product_id': self.notebook.id, 'quantity': 1}, format='json')
+        Product.objects.filter(pk=self.diary.pk).update(in_stock=False)
+
+        response = self.client.post(f'/api/orders/{order.id}/reorder/')
+        self.assertEqual(response.data['added'], 1)
+        self.assertEqual(response.data['skipped'], [
+            {'product_id': self.diary.id, 'product_name': 'Diary', 'reason': 'Out of stock'}
+        ])
+        self.assertEqual(CartItem.objects.get(cart__user=self.customer, product=self.notebook).quantity, 3)
+
+        # Nobody else can copy the order, staff included
+        for user in [User.objects.create_user('other', 'other@example.com', 'password'), self.admin]:
+            self.client.force_authenticate(user)
+            self.assertEqual(self.client.post(f'/api/orders/{order.id}/reorder/').status_code, 404)
+            self.assertFalse(CartItem.objects.filter(cart__user=user).exists())
+        self.assertEqual(self.client.post('/api/orders/x/reorder/').status_code, 404)
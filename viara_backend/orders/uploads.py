@@ -0,0 +1,107 @@
+import csv
+import io
+
+from products.models import Product
+
+MAX_LINES = 50000
+MAX_REPORTED_ERRORS = 1000
+BATCH_SIZE = 1000
+
+PRODUCT_COLUMNS = ['product_id', 'id', 'sku']
+QUANTITY_COLUMNS = ['quantity', 'qty']
+
+
+class OrderUpload:
+    """
+    Stream-parses a purchase order CSV (product id + quantity per line)
+
+    Rows are read in batches and each batch is resolved with one
+    id__in query. Bad lines are collected in `errors` and skipped;
+    repeated products are merged.
+
+    After parse():
+    - quantities: {product_id: quantity}
+    - products:   {product_id: Product}
+    - errors:     [{"line": 3, "error": "..."}] (first MAX_REPORTED_ERRORS)
+    """
+
+    def __init__(self, upload):
+        self.upload = upload
+        self.quantities = {}
+        self.products = {}
+        self.looked_up = set()
+        self.errors = []
+        self.error_count = 0
+        self.lines_read = 0
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'error': message})
+
+    def parse(self):
+        text = io.TextIOWrapper(self.upload.file, encoding='utf-8-sig', newline='')
+        reader = csv.DictReader(text)
+        batch = []
+        try:
+            # Reading the header already decodes and parses the first line
+            fieldnames = [name.strip().lower() for name in reader.fieldnames or []]
+            product_column = next((name for name in PRODUCT_COLUMNS if name in fieldnames), None)
+            quantity_column = next((name for name in QUANTITY_COLUMNS if name in fieldnames), None)
+            if product_column is None or quantity_column is None:
+                raise ValueError('CSV needs a product_id and a quantity column')
+            reader.fieldnames = fieldnames
+
+            for row in reader:
+                self.lines_read += 1
+                if self.lines_read > MAX_LINES:
+                    raise ValueError(f'CSV has more than {MAX_LINES} lines')
+
+                line = reader.line_num
+                try:
+                    product_id = int(row[product_column])
+                    quantity = int(row[quantity_column])
+                except (TypeError, ValueError):
+                    self.add_error(line, 'Product id and quantity must be whole numbers')
+                    continue
+                if quantity < 1:
+                    self.add_error(line, 'Quantity must be at least 1')
+                    continue
+
+                batch.append((line, product_id, quantity))
+                if len(batch) >= BATCH_SIZE:
+                    self.resolve(batch)
+                    batch = []
+        except UnicodeDecodeError:
+            raise ValueError('CSV must be UTF-8 encoded')
+        except csv.Error as error:
+            raise ValueError(f'CSV could not be read (line {reader.line_num}): {error}')
+        finally:
+            text.detach()
+
+        self.resolve(batch)
+        self.errors.sort(key=lambda error: error['line'])
+        return self
+
+    def resolve(self, batch):
+        """Look up a batch of lines with one query and merge the valid ones"""
+        if not batch:
+            return
+        missing = {product_id for line, product_id, quantity in batch} - self.looked_up
+        if missing:
+            self.products.update(Product.objects.in_bulk(missing))
+            self.looked_up |= missing
+
+        for line, product_id, quantity in batch:
+            product = self.products.get(product_id)
+            if product is None:
+                self.add_error(line, f'Product {product_id} not found')
+            elif not product.in_stock:
+                self.add_error(line, f'{product.name} is out of stock')
+            else:
+                self.quantities[product_id] = self.quantities.get(product_id, 0) + quantity
+
+    @property
+    def lines(self):
+        """(product, quantity) pairs for place_order"""
+        return [(self.products[product_id], quantity) for product_id, quantity in self.quantities.items()]
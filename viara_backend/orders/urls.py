@@ -1,11 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import CartViewSet, OrderViewSet, InquiryViewSet
+from .views import BestsellerViewSet, CartViewSet, OrderViewSet, InquiryViewSet
 
 router = DefaultRouter()
 router.register(r'cart', CartViewSet, basename='cart')
 router.register(r'orders', OrderViewSet, basename='order')
 router.register(r'inquiries', InquiryViewSet, basename='inquiry')
+router.register(r'bestsellers', BestsellerViewSet, basename='bestseller')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -1,14 +1,47 @@
+from decimal import Decimal
+
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from django.conf import settings
+from django.db import transaction
+from django.db.models import prefetch_related_objects
 
-from .models import Cart, CartItem, Order, OrderItem, Inquiry
+from .models import Cart, CartItem, Order, OrderItem, OrderStatusEvent, Inquiry
 from .serializers import (
     CartSerializer, CartItemSerializer,
     OrderSerializer, InquirySerializer
 )
 from products.models import Product
+from products.serializers import field_paths
+from .idempotency import idempotent
+from .streams import make_ticket
+from . import guest_cart
+
+
+def cart_prefetches(paths):
+    """
+    Prefetch lookups a CartSerializer needs for the requested fields
+    Totals and subtotals price every line, so they pull in products too
+    """
+    lookups = []
+    if paths & {'items', 'total_price'}:
+        lookups.append('items')
+    if paths & {'items.product', 'items.unit_price', 'items.subtotal', 'total_price'}:
+        lookups.append('items__product')
+    if 'items.product.category_name' in paths:
+        lookups.append('items__product__category')
+    return lookups
+
+
+def order_prefetches(paths):
+    """Prefetch lookups an OrderSerializer needs for the requested fields"""
+    lookups = []
+    if 'items' in paths:
+        lookups.append('items')
+    return lookups
 
 
 # ------------------------------------------------------------
@@ -17,21 +50,29 @@ from products.models import Product
 class CartViewSet(viewsets.ModelViewSet):
     """
     API endpoint for shopping cart
+    add_item / remove_item / clear accept an Idempotency-Key header
+
+    Visitors who are not logged in use /api/cart/guest/ instead: their
+    cart lives in a signed token the client keeps, and is merged into
+    the user's cart when that token is sent to login / register
     """
     serializer_class = CartSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Cart.objects.filter(user=self.request.user)
+        queryset = Cart.objects.filter(user=self.request.user)
+        return queryset.prefetch_related(*cart_prefetches(field_paths(self.get_serializer())))
 
     @action(detail=False, methods=['get'])
     def current(self, request):
         """Get or create current user's cart"""
         cart, created = Cart.objects.get_or_create(user=request.user)
         serializer = self.get_serializer(cart)
+        prefetch_related_objects([cart], *cart_prefetches(field_paths(serializer)))
         return Response(serializer.data)
 
     @action(detail=False, methods=['post'])
+    @idempotent
     def add_item(self, request):
         """
         Add item to cart
@@ -59,12 +100,15 @@ class CartViewSet(viewsets.ModelViewSet):
             cart_item.quantity += quantity
             cart_item.save()
 
+        serializer = self.get_serializer(cart)
+        prefetch_related_objects([cart], *cart_prefetches(field_paths(serializer)))
         return Response({
             "message": "Item added to cart",
-            "cart": CartSerializer(cart).data
+            "cart": serializer.data
         })
 
     @action(detail=False, methods=['post'])
+    @idempotent
     def remove_item(self, request):
         """
         Remove item from cart
@@ -83,12 +127,65 @@ class CartViewSet(viewsets.ModelViewSet):
             )
 
     @action(detail=False, methods=['post'])
+    @idempotent
     def clear(self, request):
         """Clear all items from cart"""
         cart = Cart.objects.get(user=request.user)
         cart.items.all().delete()
         return Response({"message": "Cart cleared"})
 
+    @action(detail=False, methods=['get', 'post'], permission_classes=[AllowAny])
+    def guest(self, request):
+        """
+        Guest cart, kept client-side in a signed token (no database writes)
+        GET  /api/cart/guest/?guest_cart=<token>
+        POST /api/cart/guest/
+        Body: {"guest_cart": "<token>", "product_id": 1, "quantity": 2}
+
+        POST sets the line's quantity (0 removes it) and returns the new
+        token. Unknown, tampered with or expired tokens start an empty cart.
+        """
+        if request.method == 'GET':
+            quantities = guest_cart.load(request.query_params.get('guest_cart'))
+        else:
+            quantities = guest_cart.load(request.data.get('guest_cart'))
+            try:
+                product_id = int(request.data.get('product_id'))
+                quantity = int(request.data.get('quantity', 1))
+            except (TypeError, ValueError):
+                return Response(
+                    {'error': 'product_id and quantity must be integers'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            if not 0 <= quantity <= guest_cart.MAX_QUANTITY:
+                return Response(
+                    {'error': f'Quantity must be between 0 and {guest_cart.MAX_QUANTITY}'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if quantity and not Product.objects.filter(id=product_id).exists():
+                return Response(
+                    {'error': 'Product not found'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+
+            quantities.pop(product_id, None)
+            if quantity:
+                if len(quantities) >= guest_cart.MAX_LINES:
+                    return Response(
+                        {'error': f'A guest cart holds at most {guest_cart.MAX_LINES} products; log in to add more'},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                quantities[product_id] = quantity
+
+        items = guest_cart.priced_items(quantities)
+        total_price = sum((item.subtotal for item in items), Decimal('0.00'))
+        return Response({
+            'guest_cart': guest_cart.dump({item.product_id: item.quantity for item in items}),
+            'items': CartItemSerializer(items, many=True, context=self.get_serializer_context()).data,
+            'total_price': total_price,
+        })
+
 
 # ------------------------------------------------------------
 # ORDER VIEWSET (MERGED VERSION - FIXED)
@@ -97,10 +194,21 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from .models import Order, OrderItem
-from .serializers import OrderSerializer
+from .models import ArchivedOrder, Order, OrderItem
+from .serializers import (
+    ArchivedOrderSerializer, ArchivedOrderSummarySerializer,
+    OrderSerializer, OrderSummarySerializer, OrderBulkTransitionSerializer
+)
+from .checkout import place_order
+from viara_project.conditional import ConditionalGetMixin
+from . import bestsellers
+from .events import broker
+from .uploads import OrderUpload
+from rest_framework.parsers import MultiPartParser, FormParser
+from django.utils import timezone
+from django.db.models import Count
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """
     API endpoint for orders
     
@@ -111,20 +219,313 @@ class OrderViewSet(viewsets.ModelViewSet):
     - PATCH  /api/orders/{id}/         - Update order (admin)
     - DELETE /api/orders/{id}/         - Delete order (admin)
     - POST   /api/orders/{id}/cancel/  - Cancel order (user/admin)
+    - POST   /api/orders/create_from_cart/ - Checkout the current cart
+    - POST   /api/orders/bulk_transition/  - Move many orders to a status (admin)
+    - POST   /api/orders/upload/           - Fill cart / place order from a CSV
+    - POST   /api/orders/{id}/reorder/     - Copy a past order into the cart
+    - POST   /api/orders/events/ticket/    - Ticket for the status event stream
+
+    Order-creating POSTs accept an Idempotency-Key header: a retry with
+    the same key replays the first response instead of ordering twice.
+
+    Archived orders (see `manage.py archive_orders`) are left out unless
+    asked for: GET /api/orders/?archived=1 and /api/orders/{id}/?archived=1
+
+    GET /api/orders/?view=summary lists id, status, total_amount,
+    created_at and item_count only; items are counted in the list query
+    instead of being loaded (combines with ?archived=1)
+
+    List and detail responses accept ?fields=, ?omit= and ?expand=,
+    e.g. ?fields=id,status,total_amount skips loading items altogether
+
+    List and detail GETs return ETag / Last-Modified; an order history
+    that has not changed is answered with 304
     """
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
     
+    def is_archive_request(self):
+        """?archived=1 on list/retrieve reads the archive tables instead"""
+        archived = self.request.query_params.get('archived', '').lower() in ('1', 'true', 'yes')
+        return archived and self.action in ['list', 'retrieve']
+
+    def is_summary_request(self):
+        """?view=summary on list returns compact rows without nested items"""
+        return self.action == 'list' and self.request.query_params.get('view') == 'summary'
+
+    def get_serializer_class(self):
+        if self.is_summary_request():
+            return ArchivedOrderSummarySerializer if self.is_archive_request() else OrderSummarySerializer
+        if self.is_archive_request():
+            return ArchivedOrderSerializer
+        return super().get_serializer_class()
+
     def get_queryset(self):
         """
         Return orders for current user
         Admins can see all orders
         """
         user = self.request.user
+        model = ArchivedOrder if self.is_archive_request() else Order
+        queryset = model.objects.prefetch_related(
+            *order_prefetches(field_paths(self.get_serializer()))
+        )
+        if self.is_summary_request():
+            queryset = queryset.annotate(item_count=Count('items'))
         if user.is_staff or user.is_superuser:
-            return Order.objects.all().order_by('-created_at')
-        return Order.objects.filter(user=user).order_by('-created_at')
+            return queryset.order_by('-created_at')
+        return queryset.filter(user=user).order_by('-created_at')
     
+    @action(detail=False, methods=['post'])
+    @idempotent
+    def create_from_cart(self, request):
+        """
+        Checkout: turn the user's cart into an order
+        POST /api/orders/create_from_cart/
+        Body: {"payment_method": "cod", "shipping_address": "...", "phone": "..."}
+
+        Lines are priced with quantity-break tiers, then the cart is emptied
+        """
+        payment_method = request.data.get('payment_method', 'cod')
+        if payment_method not in dict(Order.PAYMENT_METHOD_CHOICES):
+            return Response(
+                {'error': 'Invalid payment method'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        cart = Cart.objects.filter(user=request.user).first()
+        items = cart.priced_items() if cart else []
+        if not items:
+            return Response(
+                {'error': 'Your cart is empty'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        unavailable = [item.product.name for item in items if not item.product.in_stock]
+        if unavailable:
+            return Response(
+                {'error': f"Out of stock: {', '.join(unavailable)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        with transaction.atomic():
+            order = place_order(
+                request.user,
+                [(item.product, item.quantity) for item in items],
+                payment_method=payment_method,
+                shipping_address=request.data.get('shipping_address', ''),
+                phone=request.data.get('phone', ''),
+            )
+            cart.items.all().delete()
+
+        prefetch_related_objects([order], 'items')
+        return Response({
+            'message': 'Order created successfully',
+            'order': OrderSerializer(order, context={'request': request}).data
+        }, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'], parser_classes=[MultiPartParser, FormParser])
+    @idempotent
+    def upload(self, request):
+        """
+        Bulk order from a CSV purchase order
+        POST /api/orders/upload/  (multipart form)
+
+        Fields:
+        - file:   CSV with product_id (or id / sku) and quantity (or qty) columns
+        - target: "cart" (default) adds the lines to the cart,
+                  "order" places an order straight away
+        - payment_method, shipping_address, phone: used when target is "order"
+
+        Invalid lines are reported and skipped, the rest are applied
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response(
+                {'error': 'A CSV file is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        target = request.data.get('target', 'cart')
+        payment_method = request.data.get('payment_method', 'cod')
+        if target not in ['cart', 'order']:
+            return Response(
+                {'error': 'target must be "cart" or "order"'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if payment_method not in dict(Order.PAYMENT_METHOD_CHOICES):
+            return Response(
+                {'error': 'Invalid payment method'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            parsed = OrderUpload(upload).parse()
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        result = {
+            'lines_read': parsed.lines_read,
+            'products': len(parsed.quantities),
+            'error_count': parsed.error_count,
+            'errors': parsed.errors,
+        }
+        if not parsed.quantities:
+            return Response(
+                dict(result, error='No valid lines in the CSV'),
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if target == 'cart':
+            cart, created = Cart.objects.get_or_create(user=request.user)
+            with transaction.atomic():
+                cart.merge_items(parsed.quantities)
+            return Response(dict(result, message='Items added to cart'))
+
+        order = place_order(
+            request.user,
+            parsed.lines,
+            payment_method=payment_method,
+            shipping_address=request.data.get('shipping_address', ''),
+            phone=request.data.get('phone', ''),
+        )
+        return Response(dict(
+            result,
+            message='Order created successfully',
+            order={'id': order.id, 'total_amount': order.total_amount, 'status': order.status},
+        ), status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['post'])
+    @idempotent
+    def reorder(self, request, pk=None):
+        """
+        Copy a past order's items into the current user's cart
+        POST /api/orders/{id}/reorder/
+
+        Quantities are added to lines already in the cart. Products that
+        are out of stock or no longer exist are skipped and reported.
+        Uses the same few queries however many lines the order has.
+        Only the user's own orders can be copied, staff included.
+        """
+        order = get_object_or_404(self.get_queryset().filter(user=request.user), pk=pk)
+
+        quantities = {}
+        skipped = []
+        for item in order.items.select_related('product'):
+            product = item.product
+            if product is None:
+                skipped.append({
+                    'product_id': None, 'product_name': item.product_name,
+                    'reason': 'Product no longer available'
+                })
+            elif not product.in_stock:
+                skipped.append({'product_id': product.id, 'product_name': product.name, 'reason': 'Out of stock'})
+            else:
+                quantities[product.id] = quantities.get(product.id, 0) + item.quantity
+
+        if quantities:
+            cart, created = Cart.objects.get_or_create(user=request.user)
+            with transaction.atomic():
+                cart.merge_items(quantities)
+
+        return Response({
+            'message': f'{len(quantities)} products added to cart',
+            'added': len(quantities),
+            'skipped': skipped,
+        })
+
+    def perform_update(self, serializer):
+        """Record a status event when an update changes the status"""
+        previous_status = serializer.instance.status
+        with transaction.atomic():
+            order = serializer.save()
+            if order.status != previous_status:
+                OrderStatusEvent.objects.create(
+                    order=order, from_status=previous_status,
+                    to_status=order.status, changed_by=self.request.user
+                )
+                bestsellers.record_status_change([order.id], previous_status, order.status)
+
+    @action(detail=False, methods=['post'])
+    def bulk_transition(self, request):
+        """
+        Move many orders to a new status at once (admin only)
+        POST /api/orders/bulk_transition/
+        Body: {"order_ids": [1, 2, 3], "status": "shipped"}
+
+        Only orders whose current status may lead to the new one
+        (Order.STATUS_TRANSITIONS) are changed, with a single
+        UPDATE ... WHERE status IN (...). Each change is recorded as an
+        OrderStatusEvent. Returns a result per requested order id.
+        """
+        user = request.user
+        if not (user.is_staff or user.is_superuser):
+            return Response(
+                {'error': 'You do not have permission to change order statuses'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        serializer = OrderBulkTransitionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        order_ids = list(dict.fromkeys(serializer.validated_data['order_ids']))
+        new_status = serializer.validated_data['status']
+        sources = Order.statuses_leading_to(new_status)
+
+        with transaction.atomic():
+            current = dict(
+                Order.objects.select_for_update()
+                .filter(id__in=order_ids)
+                .values_list('id', 'status')
+            )
+            updated = Order.objects.filter(id__in=order_ids, status__in=sources).update(
+                status=new_status, updated_at=timezone.now()
+            )
+            OrderStatusEvent.objects.bulk_create(
+                [
+                    OrderStatusEvent(
+                        order_id=order_id, from_status=current[order_id],
+                        to_status=new_status, changed_by=user
+                    )
+                    for order_id in order_ids
+                    if current.get(order_id) in sources
+                ],
+                batch_size=1000
+            )
+            for source in sources:
+                bestsellers.record_status_change(
+                    [order_id for order_id in order_ids if current.get(order_id) == source], source, new_status
+                )
+            broker.publish_on_commit()
+
+        results = []
+        for order_id in order_ids:
+            if order_id not in current:
+                results.append({'id': order_id, 'result': 'not_found'})
+            elif current[order_id] in sources:
+                results.append({'id': order_id, 'result': 'updated', 'from_status': current[order_id]})
+            else:
+                results.append({'id': order_id, 'result': 'invalid_transition', 'from_status': current[order_id]})
+
+        return Response({
+            'message': f'{updated} orders moved to {new_status}',
+            'updated': updated,
+            'results': results,
+        })
+
+    @action(detail=False, methods=['post'], url_path='events/ticket', url_name='events-ticket')
+    def events_ticket(self, request):
+        """
+        Short-lived ticket for the order status stream
+        POST /api/orders/events/ticket/
+
+        EventSource cannot send the Authorization header, so the stream
+        takes ?ticket= instead of the long-lived auth token
+        """
+        return Response({
+            'ticket': make_ticket(request.user),
+            'expires_in': getattr(settings, 'ORDER_EVENTS_TICKET_SECONDS', 60),
+        })
+
     @action(detail=True, methods=['post'])
     def cancel(self, request, pk=None):
         """
@@ -167,12 +568,18 @@ class OrderViewSet(viewsets.ModelViewSet):
                 )
         
         # Cancel the order
-        order.status = 'cancelled'
-        order.save()
+        previous_status = order.status
+        with transaction.atomic():
+            order.status = 'cancelled'
+            order.save()
+            OrderStatusEvent.objects.create(
+                order=order, from_status=previous_status, to_status='cancelled', changed_by=user
+            )
+            bestsellers.record_status_change([order.id], previous_status, 'cancelled')
         
         return Response({
             'message': 'Order cancelled successfully',
-            'order': OrderSerializer(order).data
+            'order': OrderSerializer(order, context={'request': request}).data
         }, status=status.HTTP_200_OK)
 
 
@@ -187,3 +594,53 @@ class InquiryViewSet(viewsets.ModelViewSet):
     serializer_class = InquirySerializer
     permission_classes = [AllowAny]
     http_method_names = ['get', 'post']
+
+
+# ------------------------------------------------------------
+# BESTSELLER VIEWSET
+# ------------------------------------------------------------
+from products.serializers import ProductSerializer
+
+
+class BestsellerViewSet(viewsets.ViewSet):
+    """
+    Top selling products, overall or per category
+
+    Endpoints:
+    - GET /api/bestsellers/?window=30&category=3&limit=10
+
+    window is 7, 30 or 90 days (default 30); without category the
+    overall board is returned. Boards are kept up to date as orders are
+    placed and cancelled; run `manage.py compact_bestsellers` daily to
+    drop sales that have aged out of their window.
+    """
+    permission_classes = [AllowAny]
+    MAX_LIMIT = 50
+
+    def list(self, request):
+        try:
+            window = int(request.query_params.get('window', 30))
+            scope = int(request.query_params.get('category') or bestsellers.ALL)
+            limit = min(int(request.query_params.get('limit', 10)), self.MAX_LIMIT)
+        except ValueError:
+            return Response(
+                {'error': 'window, category and limit must be integers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if window not in bestsellers.WINDOWS:
+            return Response(
+                {'error': f"window must be one of {', '.join(map(str, bestsellers.WINDOWS))}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        rows = bestsellers.top(window, scope, max(limit, 1))
+        context = {'request': request}
+        return Response({
+            'window': window,
+            'category': scope or None,
+            'results': [
+                {'units': units, 'product': ProductSerializer(product, context=context).data}
+                for product, units in rows
+            ],
+        })
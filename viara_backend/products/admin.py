@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Category, Product
+from .models import Category, Product, PriceTier
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -12,4 +12,12 @@ class ProductAdmin(admin.ModelAdmin):
     list_display = ['name', 'category', 'price', 'in_stock', 'created_at']
     list_filter = ['category', 'in_stock', 'created_at']
     search_fields = ['name', 'description']
-    list_editable = ['price', 'in_stock']
\ No newline at end of file
+    list_editable = ['price', 'in_stock']
+
+
+@admin.register(PriceTier)
+class PriceTierAdmin(admin.ModelAdmin):
+    list_display = ['product', 'category', 'min_quantity', 'unit_price', 'discount_percent']
+    list_filter = ['category']
+    search_fields = ['product__name', 'category__name']
+    raw_id_fields = ['product']
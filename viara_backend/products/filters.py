@@ -0,0 +1,53 @@
+from django.db.models import Case, IntegerField, Value, When
+from rest_framework import filters
+
+from .models import Category
+from .search import trigram_index
+
+
+class ProductSearchFilter(filters.SearchFilter):
+    """
+    SearchFilter with a typo-tolerant mode
+
+    ?search=notbook&fuzzy=1 looks candidates up in the trigram index
+    (products.search) instead of running icontains over every row.
+    Results come back best match first unless ?ordering= is given.
+
+    Only the best max_results matches are kept, since every one of them
+    is a bound parameter of the query; when more matched,
+    request.search_truncated is set and the list response reports it.
+    The view's ?category= restriction is applied in the index, before
+    that cut, so matches in the category are not crowded out by others.
+    """
+    fuzzy_param = 'fuzzy'
+    max_results = 500
+
+    def is_fuzzy(self, request):
+        return request.query_params.get(self.fuzzy_param, '').lower() in ('1', 'true', 'yes')
+
+    def get_category_ids(self, request):
+        """Ids of the categories named by ?category= (see ProductViewSet.get_queryset), or None"""
+        category = request.query_params.get('category')
+        if not category:
+            return None
+        return list(Category.objects.filter(name__iexact=category).values_list('id', flat=True))
+
+    def filter_queryset(self, request, queryset, view):
+        search_terms = self.get_search_terms(request)
+        if not search_terms or not self.is_fuzzy(request):
+            return super().filter_queryset(request, queryset, view)
+
+        product_ids = trigram_index.search(
+            ' '.join(search_terms), limit=self.max_results + 1, category_ids=self.get_category_ids(request)
+        )
+        request.search_truncated = len(product_ids) > self.max_results
+        product_ids = product_ids[:self.max_results]
+        queryset = queryset.filter(id__in=product_ids)
+        if filters.OrderingFilter.ordering_param in request.query_params or not product_ids:
+            return queryset
+
+        relevance = Case(
+            *[When(id=product_id, then=Value(rank)) for rank, product_id in enumerate(product_ids)],
+            output_field=IntegerField(),
+        )
+        return queryset.order_by(relevance)
@@ -0,0 +1,85 @@
+import timeit
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from products.models import Category, Product
+from products.renderers import FastJSONRenderer
+from products.serializers import ProductSerializer, ProductRowSerializer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    """
+    Microbenchmark for the product list read path
+    Compares ProductSerializer + JSONRenderer against
+    ProductRowSerializer + FastJSONRenderer on the same page of products
+
+    Usage:
+        python manage.py benchmark_catalog
+        python manage.py benchmark_catalog --page-size 100 --seed-products 500
+    """
+    help = 'Benchmark the product list serializer and renderer paths'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=200)
+        parser.add_argument(
+            '--seed-products', type=int, default=100,
+            help='Temporary products created for the run and rolled back afterwards'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.seed(options['seed_products'])
+                self.run(options['page_size'], options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, count):
+        if count <= 0:
+            return
+        category, _ = Category.objects.get_or_create(name='Benchmark')
+        Product.objects.bulk_create([
+            Product(
+                name=f'Benchmark product {i}',
+                description='Wholesale benchmark item ' * 8,
+                price=Decimal(i % 500) + Decimal('0.99'),
+                category=category,
+                image='products/NoteBook.jpg' if i % 2 else '',
+            )
+            for i in range(count)
+        ])
+
+    def run(self, page_size, repeat):
+        request = APIRequestFactory().get('/api/products/', HTTP_HOST='localhost')
+        queryset = Product.objects.order_by('-created_at', 'id')[:page_size]
+
+        def serializer_path():
+            page = list(queryset.select_related('category'))
+            data = ProductSerializer(page, many=True, context={'request': request}).data
+            return JSONRenderer().render({'results': data})
+
+        def fast_path():
+            rows = ProductRowSerializer(request)
+            data = rows.to_representation(list(rows.values(queryset)))
+            return FastJSONRenderer().render({'results': data})
+
+        if serializer_path() != fast_path():
+            raise CommandError('Fast path output differs from ProductSerializer output')
+
+        slow = min(timeit.repeat(serializer_path, number=repeat, repeat=3)) / repeat
+        fast = min(timeit.repeat(fast_path, number=repeat, repeat=3)) / repeat
+
+        self.stdout.write(f'Page size: {page_size} products (outputs are byte-identical)')
+        self.stdout.write(f'ProductSerializer + JSONRenderer:        {slow * 1000:.3f} ms/page')
+        self.stdout.write(f'ProductRowSerializer + FastJSONRenderer: {fast * 1000:.3f} ms/page')
+        self.stdout.write(self.style.SUCCESS(f'Speedup: {slow / fast:.1f}x'))
@@ -0,0 +1,44 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from products.snapshot import build_snapshot, is_stale, snapshot_dir
+
+
+class Command(BaseCommand):
+    """
+    Write the public catalog as static, content-hashed JSON shards
+
+    Usage:
+        python manage.py build_catalog_snapshot          # only changed categories
+        python manage.py build_catalog_snapshot --full   # rewrite every shard
+        python manage.py build_catalog_snapshot --watch  # keep rebuilding after catalog changes
+
+    Run one --watch process per deployment (systemd, supervisor, ...); the
+    web workers only mark the snapshot stale.
+    """
+    help = 'Build the static catalog snapshot under MEDIA_ROOT/catalog/'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Rebuild every shard from scratch')
+        parser.add_argument('--watch', action='store_true', help='Rebuild whenever the catalog changes')
+
+    def handle(self, *args, **options):
+        self.build(options['full'])
+        if not options['watch']:
+            return
+        interval = getattr(settings, 'CATALOG_SNAPSHOT_POLL_SECONDS', 30)
+        while True:
+            time.sleep(interval)
+            if is_stale():
+                close_old_connections()
+                self.build(full=False)
+
+    def build(self, full):
+        result = build_snapshot(full=full)
+        self.stdout.write(self.style.SUCCESS(
+            f"Catalog snapshot in {snapshot_dir()}: {result['rebuilt']} shards rebuilt, "
+            f"{result['unchanged']} unchanged, {result['removed']} old shards removed"
+        ))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from products.recommendations import build_related_products
+
+
+class Command(BaseCommand):
+    """
+    Refresh "frequently bought together" recommendations
+
+    Usage:
+        python manage.py build_related_products          # new and cancelled orders since last run
+        python manage.py build_related_products --full   # rebuild from scratch
+    """
+    help = 'Build product co-occurrence recommendations from orders'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=10, help='Neighbours kept per product')
+        parser.add_argument('--full', action='store_true', help='Rebuild from all orders')
+
+    def handle(self, *args, **options):
+        build = build_related_products(k=options['top_k'], full=options['full'])
+        if build is None:
+            self.stdout.write('No new or cancelled orders since the last build')
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {build.orders_processed} orders, took back {build.orders_reverted} cancelled, '
+            f'updated {build.products_updated} products (up to order #{build.last_order_id})'
+        ))
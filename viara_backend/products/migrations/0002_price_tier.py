@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceTier',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('min_quantity', models.PositiveIntegerField()),
+                ('unit_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('discount_percent', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='price_tiers', to='products.category')),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='price_tiers', to='products.product')),
+            ],
+            options={
+                'ordering': ['min_quantity'],
+                'constraints': [models.CheckConstraint(condition=models.Q(models.Q(('category__isnull', True), ('product__isnull', False), ('unit_price__isnull', False)), models.Q(('category__isnull', False), ('discount_percent__isnull', False), ('product__isnull', True)), _connector='OR'), name='price_tier_product_or_category'), models.UniqueConstraint(fields=('product', 'min_quantity'), name='unique_product_tier'), models.UniqueConstraint(fields=('category', 'min_quantity'), name='unique_category_tier')],
+            },
+        ),
+    ]
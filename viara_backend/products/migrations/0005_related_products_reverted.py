@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_category_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='relatedproductsbuild',
+            name='orders_reverted',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -4,6 +4,7 @@ from django.db import models
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         verbose_name_plural = "Categories"
@@ -28,4 +29,93 @@ class Product(models.Model):
         ordering = ['-created_at']  # Newest first
     
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+# Price Tier Model (quantity breaks for wholesale buyers)
+class PriceTier(models.Model):
+    """
+    A quantity break: from min_quantity units upwards a different price applies
+    - Product tiers set the unit price directly
+    - Category tiers give a percentage discount on every product in the category
+    Product tiers take precedence over category tiers
+    """
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, null=True, blank=True, related_name='price_tiers'
+    )
+    category = models.ForeignKey(
+        Category, on_delete=models.CASCADE, null=True, blank=True, related_name='price_tiers'
+    )
+    min_quantity = models.PositiveIntegerField()
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    discount_percent = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+
+    class Meta:
+        ordering = ['min_quantity']
+        constraints = [
+            models.CheckConstraint(
+                condition=(
+                    models.Q(product__isnull=False, category__isnull=True, unit_price__isnull=False)
+                    | models.Q(product__isnull=True, category__isnull=False, discount_percent__isnull=False)
+                ),
+                name='price_tier_product_or_category',
+            ),
+            models.UniqueConstraint(fields=['product', 'min_quantity'], name='unique_product_tier'),
+            models.UniqueConstraint(fields=['category', 'min_quantity'], name='unique_category_tier'),
+        ]
+
+    def __str__(self):
+        if self.product_id:
+            return f"{self.product} - {self.min_quantity}+ @ {self.unit_price}"
+        return f"{self.category} - {self.min_quantity}+ @ {self.discount_percent}% off"
+
+
+# Frequently Bought Together
+class ProductPairCount(models.Model):
+    """
+    How many orders contained both products (stored in both directions)
+    Kept so recommendation refreshes can be incremental
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    other = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    count = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'other'], name='unique_product_pair'),
+        ]
+
+
+class RelatedProduct(models.Model):
+    """
+    Top-K "frequently bought together" neighbours of a product, by rank
+    Precomputed by the build_related_products command
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='related_entries')
+    related = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    score = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ['product', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'rank'], name='unique_related_rank'),
+        ]
+
+    def __str__(self):
+        return f"{self.product} -> {self.related} (#{self.rank})"
+
+
+class RelatedProductsBuild(models.Model):
+    """
+    One row per build
+    last_order_id is the highest order id counted so far, for reference;
+    runs find their orders through Order.in_recommendations
+    """
+    last_order_id = models.PositiveBigIntegerField()
+    orders_processed = models.PositiveIntegerField()
+    orders_reverted = models.PositiveIntegerField(default=0)
+    products_updated = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
@@ -0,0 +1,68 @@
+from bisect import bisect_right
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db.models import Q
+
+from .models import PriceTier
+
+CENTS = Decimal('0.01')
+
+
+class PriceBook:
+    """
+    Quantity-break prices for a set of products
+
+    All tiers for the products (and their categories) are loaded in one
+    query into sorted per-product / per-category break lists, so each
+    lookup is a binary search and a whole cart is priced in one pass.
+
+    Usage:
+        book = PriceBook(products)
+        book.unit_price(product, quantity)
+    """
+
+    def __init__(self, products):
+        products = [product for product in products if product is not None]
+        self.product_tiers = {}
+        self.category_tiers = {}
+        if not products:
+            return
+
+        product_ids = {product.pk for product in products}
+        category_ids = {product.category_id for product in products}
+        tiers = (
+            PriceTier.objects
+            .filter(Q(product_id__in=product_ids) | Q(category_id__in=category_ids))
+            .order_by('min_quantity')
+            .values_list('product_id', 'category_id', 'min_quantity', 'unit_price', 'discount_percent')
+        )
+        for product_id, category_id, min_quantity, unit_price, discount_percent in tiers:
+            if product_id is not None:
+                breaks, values = self.product_tiers.setdefault(product_id, ([], []))
+                value = unit_price
+            else:
+                breaks, values = self.category_tiers.setdefault(category_id, ([], []))
+                value = discount_percent
+            breaks.append(min_quantity)
+            values.append(value)
+
+    @staticmethod
+    def find_tier(tiers, quantity):
+        """Value of the highest break at or below quantity, or None"""
+        if tiers is None:
+            return None
+        breaks, values = tiers
+        index = bisect_right(breaks, quantity) - 1
+        return values[index] if index >= 0 else None
+
+    def unit_price(self, product, quantity):
+        """Unit price of product when buying quantity units"""
+        price = self.find_tier(self.product_tiers.get(product.pk), quantity)
+        if price is not None:
+            return price
+
+        discount = self.find_tier(self.category_tiers.get(product.category_id), quantity)
+        if discount is not None:
+            return (product.price * (100 - discount) / 100).quantize(CENTS, rounding=ROUND_HALF_UP)
+
+        return product.price
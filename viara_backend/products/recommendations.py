@@ -0,0 +1,220 @@
+"""
+"Frequently bought together" recommendations
+
+Builds a sparse product co-occurrence matrix from OrderItem rows grouped
+by order (C = Bᵀ·B for the order x product incidence matrix B), adds it to
+the stored pair counts and keeps the top-K neighbours per product in
+RelatedProduct. Runs are incremental: each order carries an
+in_recommendations flag, so a run adds the orders not counted yet (late
+commits with lower ids included), takes back the counted ones that have
+since been cancelled, and re-ranks only the products they touch.
+Archived orders (ArchivedOrder/ArchivedOrderItem keep the original ids and
+the flag) are read too, so a full rebuild counts the same sales as the
+incremental runs that saw those orders before they were archived.
+"""
+import numpy as np
+from scipy import sparse
+
+from django.db import transaction
+from django.db.models import Q
+
+from orders.models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem
+from .models import ProductPairCount, RelatedProduct, RelatedProductsBuild
+
+BATCH_SIZE = 500
+
+# (order model, item model) pairs holding sales
+SOURCES = ((Order, OrderItem), (ArchivedOrder, ArchivedOrderItem))
+
+
+def cooccurrence(order_ids, product_ids):
+    """
+    Co-occurrence counts from parallel arrays of (order id, product id)
+    Returns (product, other, count) arrays, one entry per ordered pair
+    """
+    orders, order_index = np.unique(order_ids, return_inverse=True)
+    products, product_index = np.unique(product_ids, return_inverse=True)
+
+    incidence = sparse.csr_matrix(
+        (np.ones(len(order_index), dtype=np.int64), (order_index, product_index)),
+        shape=(len(orders), len(products)),
+    )
+    incidence.sum_duplicates()
+    incidence.data[:] = 1  # a product counts once per order
+
+    counts = (incidence.T @ incidence).tocoo()
+    off_diagonal = counts.row != counts.col
+    return (
+        products[counts.row[off_diagonal]],
+        products[counts.col[off_diagonal]],
+        counts.data[off_diagonal],
+    )
+
+
+def combine_pairs(product, other, count):
+    """Sum counts of duplicate (product, other) pairs"""
+    keys = np.stack([product, other], axis=1)
+    unique, inverse = np.unique(keys, axis=0, return_inverse=True)
+    totals = np.bincount(inverse.ravel(), weights=count, minlength=len(unique)).astype(np.int64)
+    return unique[:, 0], unique[:, 1], totals
+
+
+def top_k(product, other, count, k):
+    """Keep the k highest counts per product; returns (product, other, count, rank)"""
+    order = np.lexsort((other, -count, product))
+    product, other, count = product[order], other[order], count[order]
+
+    starts = np.r_[0, np.flatnonzero(np.diff(product)) + 1]
+    group_sizes = np.diff(np.r_[starts, len(product)])
+    rank = np.arange(len(product)) - np.repeat(starts, group_sizes)
+
+    keep = rank < k
+    return product[keep], other[keep], count[keep], rank[keep]
+
+
+def update_batch(batch, delta_product, delta_other, delta_count, k):
+    """
+    Merge count changes for a batch of products and rewrite their top-K rows
+    Pairs whose count drops to zero (every order holding them was cancelled) are deleted
+    """
+    in_batch = np.isin(delta_product, batch)
+    delta_product, delta_other, delta_count = (
+        delta_product[in_batch], delta_other[in_batch], delta_count[in_batch]
+    )
+
+    stored = np.array(
+        list(
+            ProductPairCount.objects
+            .filter(product_id__in=batch.tolist())
+            .values_list('product_id', 'other_id', 'count')
+        ),
+        dtype=np.int64,
+    ).reshape(-1, 3)
+
+    product, other, count = combine_pairs(
+        np.r_[stored[:, 0], delta_product],
+        np.r_[stored[:, 1], delta_other],
+        np.r_[stored[:, 2], delta_count],
+    )
+
+    # Only pairs touched by the added or cancelled orders need writing back
+    changed = set(zip(delta_product.tolist(), delta_other.tolist()))
+    rows = [
+        (p, o, c) for p, o, c in zip(product.tolist(), other.tolist(), count.tolist())
+        if (p, o) in changed
+    ]
+    for start in range(0, len(rows), BATCH_SIZE):
+        gone = Q()
+        for p, o, c in rows[start:start + BATCH_SIZE]:
+            if c <= 0:
+                gone |= Q(product_id=p, other_id=o)
+        if gone:
+            ProductPairCount.objects.filter(gone).delete()
+    ProductPairCount.objects.bulk_create(
+        [ProductPairCount(product_id=p, other_id=o, count=c) for p, o, c in rows if c > 0],
+        update_conflicts=True,
+        unique_fields=['product', 'other'],
+        update_fields=['count'],
+        batch_size=BATCH_SIZE,
+    )
+
+    positive = count > 0
+    RelatedProduct.objects.filter(product_id__in=batch.tolist()).delete()
+    RelatedProduct.objects.bulk_create(
+        [
+            RelatedProduct(product_id=p, related_id=o, score=c, rank=r)
+            for p, o, c, r in zip(*(
+                array.tolist() for array in top_k(product[positive], other[positive], count[positive], k)
+            ))
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+
+def order_ids(full=False):
+    """
+    Ids of the orders to add and to take back, per source
+    full=True adds every order that is not cancelled
+    """
+    added, removed = [], []
+    for order_model, _ in SOURCES:
+        orders = order_model.objects.order_by()
+        if full:
+            added.append(list(orders.exclude(status='cancelled').values_list('id', flat=True)))
+            removed.append([])
+        else:
+            added.append(list(
+                orders.filter(in_recommendations=False).exclude(status='cancelled').values_list('id', flat=True)
+            ))
+            removed.append(list(
+                orders.filter(in_recommendations=True, status='cancelled').values_list('id', flat=True)
+            ))
+    return added, removed
+
+
+def order_rows(ids):
+    """
+    (order id, product id) array for per-source order ids (see order_ids),
+    read BATCH_SIZE orders at a time
+    """
+    rows = []
+    for (_, item_model), source_ids in zip(SOURCES, ids):
+        for start in range(0, len(source_ids), BATCH_SIZE):
+            rows.extend(
+                item_model.objects
+                .filter(order_id__in=source_ids[start:start + BATCH_SIZE], product__isnull=False)
+                .order_by()
+                .values_list('order_id', 'product_id')
+            )
+    return np.array(rows, dtype=np.int64).reshape(-1, 2)
+
+
+def mark_orders(order_model, ids, value):
+    for start in range(0, len(ids), BATCH_SIZE):
+        order_model.objects.filter(id__in=ids[start:start + BATCH_SIZE]).update(in_recommendations=value)
+
+
+def build_related_products(k=10, full=False):
+    """
+    Refresh recommendations from orders not counted yet, taking back
+    counted orders that have been cancelled since
+    full=True drops everything and rebuilds from all orders
+    Returns the RelatedProductsBuild row, or None when there was nothing to do
+    """
+    with transaction.atomic():
+        added, removed = order_ids(full)
+        if not full and not any(added) and not any(removed):
+            return None
+
+        deltas = []
+        for rows, sign in ((order_rows(added), 1), (order_rows(removed), -1)):
+            if len(rows):
+                product, other, count = cooccurrence(rows[:, 0], rows[:, 1])
+                deltas.append((product, other, sign * count))
+        if deltas:
+            product, other, count = combine_pairs(*(np.concatenate(parts) for parts in zip(*deltas)))
+        else:
+            product = other = count = np.empty(0, dtype=np.int64)
+        affected = np.unique(product)
+
+        if full:
+            ProductPairCount.objects.all().delete()
+            RelatedProduct.objects.all().delete()
+
+        for start in range(0, len(affected), BATCH_SIZE):
+            update_batch(affected[start:start + BATCH_SIZE], product, other, count, k)
+
+        for (order_model, _), added_ids, removed_ids in zip(SOURCES, added, removed):
+            if full:
+                order_model.objects.filter(status='cancelled').update(in_recommendations=False)
+            mark_orders(order_model, added_ids, True)
+            mark_orders(order_model, removed_ids, False)
+
+        previous = RelatedProductsBuild.objects.first()
+        counted = max((max(ids) for ids in added if ids), default=0)
+        return RelatedProductsBuild.objects.create(
+            last_order_id=max(counted, 0 if full or previous is None else previous.last_order_id),
+            orders_processed=sum(map(len, added)),
+            orders_reverted=sum(map(len, removed)),
+            products_updated=len(affected),
+        )
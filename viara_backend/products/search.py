@@ -0,0 +1,340 @@
+import heapq
+from collections import Counter
+import threading
+import time
+import unicodedata
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Sum
+
+from .models import Category, Product
+
+
+def normalize(text):
+    """Lowercase, strip accents and collapse whitespace"""
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(text.lower().split())
+
+
+def trigrams(text):
+    """
+    Trigrams of a normalized text, with each word padded like pg_trgm
+    ("  n", " no", "not", ...), so word starts weigh more
+    """
+    grams = set()
+    for word in normalize(text).split(' '):
+        if word:
+            padded = f'  {word} '
+            grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def name_keys(name):
+    """Every word-suffix of a normalized name, so any word start can match"""
+    words = normalize(name).split(' ')
+    return [' '.join(words[i:]) for i in range(len(words)) if words[i]]
+
+
+class PrefixIndex:
+    """
+    In-memory prefix index for product name autocomplete
+
+    Keys are kept in one sorted list with a parallel array of product ids,
+    so a prefix lookup is two binary searches. Matches are ranked by
+    popularity (units sold) with heapq.nsmallest over that slice only, so
+    the ranking covers the whole prefix range without sorting or
+    re-normalizing the catalog.
+
+    Built lazily on first use; products are re-indexed one by one from
+    the catalog_changed signal (see products.signals). Popularity is
+    reloaded every AUTOCOMPLETE_POPULARITY_SECONDS in a background thread,
+    the stale ranking serving lookups meanwhile. Results are cached per
+    prefix until a product under that prefix changes or popularity is
+    reloaded.
+    """
+    MAX_REFRESH = 1000
+    MAX_CACHED = 10000
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.built = False
+        self.keys = []
+        self.ids = array('q')
+        self.names = {}
+        self.product_keys = {}
+        self.popularity = {}
+        self.popularity_loaded_at = 0
+        self.reloading = False
+        self.ranks = {}
+        self.results = {}
+
+    def build(self):
+        entries = []
+        names = {}
+        product_keys = {}
+        for product_id, name in Product.objects.values_list('id', 'name').iterator():
+            names[product_id] = name
+            product_keys[product_id] = name_keys(name)
+            entries.extend((key, product_id) for key in product_keys[product_id])
+        entries.sort()
+
+        with self.lock:
+            self.keys = [key for key, product_id in entries]
+            self.ids = array('q', (product_id for key, product_id in entries))
+            self.names = names
+            self.product_keys = product_keys
+            self.ranks = {product_id: self.rank(product_id) for product_id in names}
+            self.built = True
+            self.results = {}
+
+    def load_popularity(self):
+        # Imported here: orders depends on products, not the other way round
+        from orders.models import ArchivedOrderItem, OrderItem
+
+        # Archived orders still count, in the same query
+        live, archived = (
+            model.objects
+            .filter(product__isnull=False)
+            .order_by()
+            .values_list('product_id')
+            .annotate(units=Sum('quantity'))
+            for model in (OrderItem, ArchivedOrderItem)
+        )
+        popularity = Counter()
+        for product_id, units in live.union(archived, all=True):
+            popularity[product_id] += units
+
+        with self.lock:
+            self.popularity = dict(popularity)
+            self.popularity_loaded_at = time.monotonic()
+            self.ranks = {product_id: self.rank(product_id) for product_id in self.names}
+            self.results = {}
+
+    def reload_popularity(self):
+        try:
+            self.load_popularity()
+        finally:
+            self.reloading = False
+            connection.close()  # this thread's own connection
+
+    def ensure_ready(self):
+        ttl = getattr(settings, 'AUTOCOMPLETE_POPULARITY_SECONDS', 600)
+        with self.lock:
+            if not self.built:
+                self.build()
+            if not self.popularity_loaded_at:
+                # Nothing to rank with yet
+                self.load_popularity()
+            elif time.monotonic() - self.popularity_loaded_at > ttl and not self.reloading:
+                self.reloading = True
+                threading.Thread(target=self.reload_popularity, daemon=True).start()
+
+    def remove(self, product_id):
+        self.names.pop(product_id, None)
+        self.ranks.pop(product_id, None)
+        for key in self.product_keys.pop(product_id, ()):
+            index = bisect_left(self.keys, key)
+            while index < len(self.keys) and self.keys[index] == key:
+                if self.ids[index] == product_id:
+                    del self.keys[index]
+                    del self.ids[index]
+                    break
+                index += 1
+
+    def add(self, product_id, name):
+        self.names[product_id] = name
+        self.product_keys[product_id] = name_keys(name)
+        self.ranks[product_id] = self.rank(product_id)
+        for key in self.product_keys[product_id]:
+            index = bisect_left(self.keys, key)
+            self.keys.insert(index, key)
+            self.ids.insert(index, product_id)
+
+    def refresh(self, product_ids=None):
+        """Re-index the given products (None means everything)"""
+        with self.lock:
+            if not self.built:
+                return
+            if product_ids is None or len(product_ids) > self.MAX_REFRESH:
+                # Cheaper to rebuild on the next lookup
+                self.built = False
+                return
+            current = dict(Product.objects.filter(id__in=product_ids).values_list('id', 'name'))
+            changed_keys = []
+            for product_id in product_ids:
+                if self.names.get(product_id) == current.get(product_id):
+                    continue
+                changed_keys.extend(self.product_keys.get(product_id, ()))
+                self.remove(product_id)
+                if product_id in current:
+                    self.add(product_id, current[product_id])
+                    changed_keys.extend(self.product_keys[product_id])
+            # Only cached prefixes of a changed key can have different results
+            for prefix, limit in list(self.results):
+                if any(key.startswith(prefix) for key in changed_keys):
+                    del self.results[(prefix, limit)]
+
+    def rank(self, product_id):
+        return -self.popularity.get(product_id, 0), self.names[product_id]
+
+    def search(self, query, limit=10):
+        """Most popular products with a name word starting with query"""
+        prefix = normalize(query)
+        if not prefix:
+            return []
+
+        self.ensure_ready()
+        with self.lock:
+            cached = self.results.get((prefix, limit))
+            if cached is not None:
+                return cached
+
+            start = bisect_left(self.keys, prefix)
+            end = bisect_left(self.keys, prefix + '\uffff', start)
+            best = heapq.nsmallest(limit, set(self.ids[start:end]), key=self.ranks.__getitem__)
+            results = [{'id': product_id, 'name': self.names[product_id]} for product_id in best]
+
+            if len(self.results) >= self.MAX_CACHED:
+                self.results = {}
+            self.results[(prefix, limit)] = results
+            return results
+
+
+class TrigramIndex:
+    """
+    Trigram inverted index for typo-tolerant product search
+
+    Product names and category names are indexed separately (trigram ->
+    product ids, trigram -> category ids), so a lookup only touches the
+    postings of the query's own trigrams, never the whole table.
+
+    A product matches when its name, or its category's name, contains at
+    least SIMILARITY_THRESHOLD of the query's trigrams. Matches are ranked
+    by that share, then by trigram similarity (Jaccard) to the whole name.
+
+    Built lazily on first use and kept up to date from catalog_changed.
+    """
+    SIMILARITY_THRESHOLD = 0.5
+    MAX_REFRESH = 1000
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.built = False
+        self.name_postings = {}
+        self.name_trigrams = {}
+        self.category_postings = {}
+        self.category_trigrams = {}
+        self.category_of = {}
+        self.members = {}
+
+    def build(self):
+        with self.lock:
+            self.name_postings = {}
+            self.name_trigrams = {}
+            self.category_of = {}
+            self.members = {}
+            products = Product.objects.values_list('id', 'name', 'category_id')
+            for product_id, name, category_id in products.iterator():
+                self.add(product_id, name, category_id)
+            self.load_categories()
+            self.built = True
+
+    def load_categories(self):
+        self.category_postings = {}
+        self.category_trigrams = {}
+        for category_id, name in Category.objects.values_list('id', 'name'):
+            grams = trigrams(name)
+            self.category_trigrams[category_id] = grams
+            for gram in grams:
+                self.category_postings.setdefault(gram, set()).add(category_id)
+
+    def add(self, product_id, name, category_id):
+        grams = trigrams(name)
+        self.name_trigrams[product_id] = grams
+        for gram in grams:
+            self.name_postings.setdefault(gram, set()).add(product_id)
+        self.category_of[product_id] = category_id
+        self.members.setdefault(category_id, set()).add(product_id)
+
+    def remove(self, product_id):
+        for gram in self.name_trigrams.pop(product_id, ()):
+            postings = self.name_postings[gram]
+            postings.discard(product_id)
+            if not postings:
+                del self.name_postings[gram]
+        category_id = self.category_of.pop(product_id, None)
+        if category_id is not None:
+            self.members[category_id].discard(product_id)
+
+    def refresh(self, product_ids=None, categories=False):
+        """Re-index the given products, or category names when categories=True"""
+        with self.lock:
+            if not self.built:
+                return
+            if categories:
+                self.load_categories()
+                return
+            if product_ids is None or len(product_ids) > self.MAX_REFRESH:
+                self.built = False
+                return
+            current = Product.objects.filter(id__in=product_ids).values_list('id', 'name', 'category_id')
+            for product_id in product_ids:
+                self.remove(product_id)
+            for product_id, name, category_id in current:
+                self.add(product_id, name, category_id)
+
+    def search(self, query, limit=None, category_ids=None):
+        """
+        Ids of products matching query, best match first (only the best `limit` if given)
+        category_ids restricts matches to those categories before the limit applies
+        """
+        query_grams = trigrams(query)
+        if not query_grams:
+            return []
+
+        with self.lock:
+            if not self.built:
+                self.build()
+
+            name_hits = Counter()
+            for gram in query_grams:
+                name_hits.update(self.name_postings.get(gram, ()))
+            category_hits = Counter()
+            for gram in query_grams:
+                category_hits.update(self.category_postings.get(gram, ()))
+
+            if category_ids is not None:
+                category_ids = set(category_ids)
+                category_hits = Counter({
+                    category_id: shared for category_id, shared in category_hits.items()
+                    if category_id in category_ids
+                })
+                name_hits = Counter({
+                    product_id: shared for product_id, shared in name_hits.items()
+                    if self.category_of.get(product_id) in category_ids
+                })
+
+            needed = len(query_grams) * self.SIMILARITY_THRESHOLD
+            scores = {}
+            for category_id, shared in category_hits.items():
+                if shared >= needed:
+                    for product_id in self.members.get(category_id, ()):
+                        scores[product_id] = (shared, 0.0)
+            for product_id, shared in name_hits.items():
+                if shared >= needed:
+                    jaccard = shared / (len(query_grams) + len(self.name_trigrams[product_id]) - shared)
+                    scores[product_id] = max(scores.get(product_id, (0, 0.0)), (shared, jaccard))
+
+            if limit is None:
+                best = sorted(scores.items(), key=lambda item: (item[1], -item[0]), reverse=True)
+            else:
+                best = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0]))
+            return [product_id for product_id, score in best]
+
+
+autocomplete_index = PrefixIndex()
+trigram_index = TrigramIndex()
@@ -1,6 +1,105 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.encoding import filepath_to_uri
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
 from .models import Category, Product
 
+
+def parse_field_paths(value):
+    """
+    Parse a comma separated list of dotted field names into a tree
+    'id,items.product.name' -> {'id': {}, 'items': {'product': {'name': {}}}}
+    """
+    tree = {}
+    for path in value.split(','):
+        path = path.strip()
+        if not path:
+            continue
+        node = tree
+        for name in path.split('.'):
+            node = node.setdefault(name, {})
+    return tree
+
+
+def field_paths(serializer, prefix=''):
+    """
+    Dotted names of every field a serializer will output, nested ones included
+    Views use this to decide which joins and prefetches a response needs
+    """
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+    paths = set()
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        paths.add(prefix + name)
+        if isinstance(field, serializers.BaseSerializer):
+            paths |= field_paths(field, f'{prefix}{name}.')
+    return paths
+
+
+class DynamicFieldsMixin:
+    """
+    Lets clients shape read payloads with query parameters
+
+    - ?fields=id,name,items.quantity  - Only output these fields
+    - ?omit=items.product.description - Drop these fields
+    - ?expand=items.product           - Bring a nested object back in alongside ?fields=
+
+    Dotted names reach into nested serializers. Without ?fields= the full
+    payload is returned, so existing clients see no change.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if request is None or request.method not in SAFE_METHODS:
+            return fields
+
+        params = request.GET
+        path = self.get_field_path()
+        only = self.lookup_field_tree(params.get('fields'), path)
+        expand = self.lookup_field_tree(params.get('expand'), path)
+        omit = self.lookup_field_tree(params.get('omit'), path)
+
+        if only:
+            allowed = set(only) | set(expand or ())
+            for name in list(fields):
+                if name not in allowed:
+                    del fields[name]
+
+        for name, children in (omit or {}).items():
+            if not children:
+                fields.pop(name, None)
+
+        return fields
+
+    def get_field_path(self):
+        """Field names leading from the root serializer down to this one"""
+        path = []
+        node = self
+        while node.parent is not None:
+            if node.field_name:
+                path.append(node.field_name)
+            node = node.parent
+        path.reverse()
+        return path
+
+    @staticmethod
+    def lookup_field_tree(value, path):
+        if not value:
+            return None
+        node = parse_field_paths(value)
+        for name in path:
+            node = node.get(name)
+            if node is None:
+                return None
+        return node
+
+
 class CategorySerializer(serializers.ModelSerializer):
     """
     Serializer for Category model
@@ -11,7 +110,7 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'created_at']
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """
     Serializer for Product model
     Includes category name for easier frontend display
@@ -25,4 +124,134 @@ class ProductSerializer(serializers.ModelSerializer):
             'category', 'category_name', 'image', 
             'in_stock', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['created_at', 'updated_at']
\ No newline at end of file
+        read_only_fields = ['created_at', 'updated_at']
+
+class PriceAdjustmentSerializer(serializers.Serializer):
+    """
+    A price change applied to every targeted product
+    - percent:  {"mode": "percent", "value": "-10"}  (10% off)
+    - absolute: {"mode": "absolute", "value": "2.50"} (add 2.50)
+    """
+    mode = serializers.ChoiceField(choices=['percent', 'absolute'])
+    value = serializers.DecimalField(max_digits=10, decimal_places=2)
+
+    def validate(self, data):
+        if data['mode'] == 'percent' and data['value'] <= -100:
+            raise serializers.ValidationError({"value": "Percentage must be greater than -100"})
+        return data
+
+
+class ProductBulkFilterSerializer(serializers.Serializer):
+    """Filters used to target a bulk update, same meaning as on the list endpoint"""
+    search = serializers.CharField(required=False)
+    in_stock = serializers.BooleanField(required=False)
+    min_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    max_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+
+    def validate(self, data):
+        # An empty filter would match (and update) the whole catalog
+        if not data:
+            raise serializers.ValidationError("Provide search, in_stock, min_price or max_price")
+        return data
+
+
+class ProductBulkUpdateSerializer(serializers.Serializer):
+    """
+    Serializer for bulk product updates
+    Targets (combined with AND, at least one required): ids, category, filter
+    Changes (at least one required): price, in_stock
+    """
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    category = serializers.CharField(required=False)
+    filter = ProductBulkFilterSerializer(required=False)
+    price = PriceAdjustmentSerializer(required=False)
+    in_stock = serializers.BooleanField(required=False)
+
+    def validate(self, data):
+        if not any(key in data for key in ['ids', 'category', 'filter']):
+            raise serializers.ValidationError("Provide ids, category or filter to choose products")
+        if not any(key in data for key in ['price', 'in_stock']):
+            raise serializers.ValidationError("Provide a price adjustment or in_stock value")
+        return data
+
+
+class ProductRowSerializer:
+    """
+    Read-only fast path for product lists
+    Builds the same output as ProductSerializer straight from .values() rows,
+    skipping the per-field serializer machinery
+    """
+    # Output field -> .values() column, in ProductSerializer field order
+    columns = {
+        'id': 'id',
+        'name': 'name',
+        'description': 'description',
+        'price': 'price',
+        'category': 'category',
+        'category_name': 'category__name',
+        'image': 'image',
+        'in_stock': 'in_stock',
+        'created_at': 'created_at',
+        'updated_at': 'updated_at',
+    }
+    cents = Decimal('0.01')
+
+    def __init__(self, request=None, fields=None, base_url=None):
+        """
+        fields limits the output to those field names (see DynamicFieldsMixin);
+        columns that are not needed are left out of the query as well
+        base_url makes image URLs absolute when there is no request
+        (e.g. settings.PUBLIC_BASE_URL for files built offline)
+        """
+        # Resolve the absolute media URL once instead of once per row
+        image_base = Product._meta.get_field('image').storage.url('')
+        if request is not None:
+            image_base = request.build_absolute_uri(image_base)
+        elif base_url:
+            image_base = base_url.rstrip('/') + image_base
+        self.image_base = image_base
+        self.tz = timezone.get_current_timezone() if settings.USE_TZ else None
+
+        formatters = {
+            'price': self.format_decimal,
+            'image': self.format_image,
+            'created_at': self.format_datetime,
+            'updated_at': self.format_datetime,
+        }
+        self.plan = [
+            (name, column, formatters.get(name))
+            for name, column in self.columns.items()
+            if fields is None or name in fields
+        ]
+
+    def values(self, queryset):
+        """Turn a Product queryset into a .values() queryset of the needed columns"""
+        return queryset.values(*[column for name, column, formatter in self.plan])
+
+    def format_decimal(self, value):
+        return f'{value.quantize(self.cents):f}'
+
+    def format_datetime(self, value):
+        if value is None:
+            return None
+        if self.tz is not None:
+            value = value.astimezone(self.tz)
+        value = value.isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+
+    def format_image(self, name):
+        if not name:
+            return None
+        return self.image_base + filepath_to_uri(name).lstrip('/')
+
+    def to_representation(self, rows):
+        plan = self.plan
+        return [
+            {
+                name: formatter(row[column]) if formatter else row[column]
+                for name, column, formatter in plan
+            }
+            for row in rows
+        ]
@@ -0,0 +1,53 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from .models import Category, Product
+from .search import autocomplete_index, trigram_index
+from .snapshot import mark_stale
+
+# Sent once per catalog write (a single save or a whole bulk update),
+# after the transaction commits. Anything caching catalog data listens here.
+# Arguments: product_ids - ids of the affected products, or None for "all"
+catalog_changed = Signal()
+
+
+def send_catalog_changed(sender, product_ids=None):
+    """Send catalog_changed when the surrounding transaction commits"""
+    transaction.on_commit(
+        lambda: catalog_changed.send(sender=sender, product_ids=product_ids)
+    )
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_changed(sender, instance, **kwargs):
+    send_catalog_changed(Product, [instance.pk])
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_changed(sender, instance, **kwargs):
+    # Product payloads carry the category name, so every product is affected
+    send_catalog_changed(Category)
+
+
+@receiver(catalog_changed)
+def refresh_autocomplete(sender, product_ids=None, **kwargs):
+    if sender is Category:
+        return  # category names are not indexed
+    autocomplete_index.refresh(product_ids)
+
+
+@receiver(catalog_changed)
+def refresh_trigram_index(sender, product_ids=None, **kwargs):
+    if sender is Category:
+        trigram_index.refresh(categories=True)
+    else:
+        trigram_index.refresh(product_ids)
+
+
+@receiver(catalog_changed)
+def mark_catalog_snapshot_stale(sender, product_ids=None, **kwargs):
+    # Rebuilt by `build_catalog_snapshot --watch`, outside the web workers
+    mark_stale()
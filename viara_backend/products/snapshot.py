@@ -0,0 +1,218 @@
+"""
+Static catalog snapshot for the storefront
+
+The public catalog is written under MEDIA_ROOT/catalog/ as one gzipped
+JSON shard per category, named by a hash of its content, plus a small
+manifest.json pointing at the current shards:
+
+    {"version": "...", "generated_at": "...",
+     "categories": [{"id": 1, "name": "...", "products": 12,
+                     "file": "category-1.<hash>.json.gz", ...}]}
+
+Shards hold the same rows as GET /api/products/ (ProductRowSerializer),
+with image URLs made absolute from PUBLIC_BASE_URL. Being
+content-addressed they can be cached forever; only the manifest has to
+be revalidated.
+
+Shards must be served with Content-Type: application/json and
+Content-Encoding: gzip so the browser decompresses them itself. Django's
+static serve (MEDIA_URL in development) does this from the .json.gz
+name; in production let the web server do the same, e.g. nginx
+"location /media/catalog/ { gzip off; types { application/json gz; }
+add_header Content-Encoding gzip; }". Rebuilds are incremental: a shard is rewritten
+only when its category's product count, newest updated_at or the
+category itself changed since the last manifest.
+
+Builds never run inside web workers. Catalog changes only drop a marker
+file (mark_stale), and `manage.py build_catalog_snapshot --watch`, run as
+one separate process, rebuilds when it finds it. Every build holds an
+exclusive lock on the snapshot directory, so two builds (the watcher and
+a manual run) never interleave their manifests or their cleanup.
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from itertools import islice
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, run one builder at a time
+    fcntl = None
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .models import Category, Product
+from .serializers import ProductRowSerializer
+
+MANIFEST = 'manifest.json'
+LOCK = '.lock'
+STALE = '.stale'
+CHUNK_SIZE = 2000
+
+
+def snapshot_dir():
+    return Path(settings.MEDIA_ROOT) / 'catalog'
+
+
+def read_manifest(root):
+    try:
+        return json.loads((root / MANIFEST).read_text())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def temporary_path(path):
+    return path.with_name(f'.{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+
+
+def write_atomic(path, data):
+    """Write to a temporary file and rename, so readers never see half a file"""
+    temporary = temporary_path(path)
+    temporary.write_bytes(data)
+    os.replace(temporary, path)
+
+
+@contextmanager
+def locked(root):
+    """Hold the snapshot directory's build lock (waits for a running build)"""
+    with open(root / LOCK, 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def mark_stale(root=None):
+    """Flag the snapshot for the next watcher pass (only once it has been built)"""
+    root = Path(root) if root else snapshot_dir()
+    if (root / MANIFEST).exists():
+        (root / STALE).touch()
+
+
+def is_stale(root=None):
+    root = Path(root) if root else snapshot_dir()
+    return (root / STALE).exists()
+
+
+def fingerprint(category, count, newest):
+    """What a shard's content depends on, cheap to compute for every category"""
+    return hashlib.sha256(
+        f'{category.name}|{category.updated_at.isoformat()}|{count}|{newest.isoformat() if newest else ""}'.encode()
+    ).hexdigest()[:16]
+
+
+def build_shard(root, category, rows):
+    """
+    Stream one category's rows into a gzipped shard; returns its file name
+    The name comes from a hash of the uncompressed content, computed while
+    writing, so only one chunk of rows is in memory at a time
+    """
+    digest = hashlib.sha256()
+    temporary = temporary_path(root / f'category-{category.id}.json.gz')
+    with open(temporary, 'wb') as raw:
+        # mtime=0 and no file name keep the bytes identical for identical content
+        with gzip.GzipFile(filename='', fileobj=raw, mode='wb', compresslevel=9, mtime=0) as shard:
+            def write(text):
+                data = text.encode()
+                digest.update(data)
+                shard.write(data)
+
+            header = json.dumps({'id': category.id, 'name': category.name}, separators=(',', ':'), ensure_ascii=False)
+            write(f'{{"category":{header},"products":[')
+            for index, row in enumerate(rows):
+                write((',' if index else '') + json.dumps(row, separators=(',', ':'), ensure_ascii=False))
+            write(']}')
+
+    name = f'category-{category.id}.{digest.hexdigest()[:16]}.json.gz'
+    if (root / name).exists():
+        temporary.unlink()
+    else:
+        os.replace(temporary, root / name)
+    return name
+
+
+def category_rows(serializer, category):
+    """A category's rows as the list endpoint renders them, CHUNK_SIZE at a time"""
+    queryset = serializer.values(
+        Product.objects.filter(category=category).order_by('-created_at', '-id')
+    ).iterator(chunk_size=CHUNK_SIZE)
+    while chunk := list(islice(queryset, CHUNK_SIZE)):
+        yield from serializer.to_representation(chunk)
+
+
+def build_snapshot(full=False, root=None):
+    """
+    Bring the snapshot up to date; returns {'rebuilt', 'unchanged', 'removed'}
+
+    One grouped aggregate finds the categories whose products changed,
+    then each changed category's rows are streamed into its shard. Shards
+    no longer in the new or the previous manifest are deleted, so clients
+    holding the previous manifest can still finish loading it.
+    """
+    root = Path(root) if root else snapshot_dir()
+    root.mkdir(parents=True, exist_ok=True)
+    with locked(root):
+        # Cleared first: changes made while this build runs mark it again
+        (root / STALE).unlink(missing_ok=True)
+        return build_locked(root, full)
+
+
+def build_locked(root, full):
+    previous = read_manifest(root) or {'categories': []}
+    previous_entries = {} if full else {entry['id']: entry for entry in previous['categories']}
+
+    categories = list(Category.objects.order_by('name'))
+    stats = {
+        row['category']: (row['count'], row['newest'])
+        for row in Product.objects.order_by().values('category').annotate(
+            count=Count('id'), newest=Max('updated_at')
+        )
+    }
+
+    entries = {}
+    stale = []
+    for category in categories:
+        count, newest = stats.get(category.id, (0, None))
+        entry = {
+            'id': category.id, 'name': category.name, 'products': count,
+            'fingerprint': fingerprint(category, count, newest),
+        }
+        old = previous_entries.get(category.id)
+        if old and old['fingerprint'] == entry['fingerprint'] and (root / old['file']).exists():
+            entry['file'] = old['file']
+        else:
+            stale.append(category)
+        entries[category.id] = entry
+
+    serializer = ProductRowSerializer(base_url=getattr(settings, 'PUBLIC_BASE_URL', ''))
+    for category in stale:
+        entries[category.id]['file'] = build_shard(root, category, category_rows(serializer, category))
+
+    manifest = {
+        'version': hashlib.sha256(
+            '|'.join(entries[category.id]['file'] for category in categories).encode()
+        ).hexdigest()[:16],
+        'generated_at': timezone.now().isoformat(),
+        'categories': [entries[category.id] for category in categories],
+    }
+    if manifest['version'] != previous.get('version') or full:
+        write_atomic(root / MANIFEST, json.dumps(manifest, indent=1).encode())
+
+    keep = {entry['file'] for entry in manifest['categories']}
+    keep |= {entry['file'] for entry in previous['categories']}
+    removed = 0
+    for path in root.glob('category-*.json.gz'):
+        if path.name not in keep:
+            path.unlink(missing_ok=True)
+            removed += 1
+
+    return {'rebuilt': len(stale), 'unchanged': len(categories) - len(stale), 'removed': removed}
@@ -1,3 +1,590 @@
-from django.test import TestCase
+import gzip
+import json
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from django.views.static import serve
+from rest_framework.test import APITestCase
+
+from viara_project.testing import QueryBudgetTestCase
+from .models import Category, PriceTier, Product, ProductPairCount, RelatedProduct
+from .pricing import PriceBook
+from .recommendations import build_related_products
+from .filters import ProductSearchFilter
+from .search import PrefixIndex, TrigramIndex, autocomplete_index, trigram_index
+from .snapshot import build_snapshot
+
+
+class CatalogQueryBudgetTests(QueryBudgetTestCase):
+    """Every route in products/urls.py, at 2 and 20 rows of catalog data"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.category = Category.objects.create(name='Electronics')
+        cls.product = Product.objects.create(name='NoteBook', category=cls.category, price=10)
+
+    def setUp(self):
+        # The in-memory indexes rebuild per request, so every run pays the same
+        autocomplete_index.built = False
+        autocomplete_index.popularity_loaded_at = 0
+        trigram_index.built = False
+
+    def grow(self, count):
+        start = Product.objects.count()
+        categories = Category.objects.bulk_create([
+            Category(name=f'Category {index}') for index in range(start, start + count)
+        ])
+        products = Product.objects.bulk_create([
+            Product(
+                name=f'Notebook {index}', description='Ruled notebook', price=index + 1,
+                category=categories[index % count], image='products/NoteBook.jpg' if index % 2 else '',
+            )
+            for index in range(count)
+        ])
+        PriceTier.objects.bulk_create([
+            PriceTier(product=product, min_quantity=10, unit_price=1) for product in products
+        ])
+        rank = RelatedProduct.objects.filter(product=self.product).count()
+        RelatedProduct.objects.bulk_create([
+            RelatedProduct(product=self.product, related=product, score=1, rank=rank + index)
+            for index, product in enumerate(products)
+        ])
+
+    def reset_indexes(self):
+        self.setUp()
+
+    # ------------------------------------------------------------
+    # CATEGORIES
+    # ------------------------------------------------------------
+    def test_category_list(self):
+        self.assertQueryBudget(3, lambda: self.client.get('/api/categories/'))
+
+    def test_category_retrieve(self):
+        self.assertQueryBudget(2, lambda: self.client.get(f'/api/categories/{self.category.id}/'))
+
+    def test_category_create(self):
+        names = iter(range(100))
+        self.client.force_authenticate(self.admin)
+        self.assertQueryBudget(
+            2, lambda: self.client.post('/api/categories/', {'name': f'New {next(names)}'})
+        )
+
+    def test_category_update(self):
+        self.client.force_authenticate(self.admin)
+        self.assertQueryBudget(
+            3, lambda: self.client.patch(f'/api/categories/{self.category.id}/', {'name': 'Gadgets'})
+        )
+
+    def test_category_delete(self):
+        self.client.force_authenticate(self.admin)
+        names = iter(range(100))
+        # The delete also clears the category snapshot on order items and archived items
+        self.assertQueryBudget(
+            6,
+            lambda category: self.client.delete(f'/api/categories/{category.id}/'),
+            setup=lambda: Category.objects.create(name=f'Empty {next(names)}'),
+        )
+
+    # ------------------------------------------------------------
+    # PRODUCTS
+    # ------------------------------------------------------------
+    def test_product_list(self):
+        self.assertQueryBudget(3, lambda: self.client.get('/api/products/'))
+
+    def test_product_list_search(self):
+        self.assertQueryBudget(3, lambda: self.client.get('/api/products/?search=note&category=electronics'))
+
+    def test_product_list_fuzzy_search(self):
+        self.assertQueryBudget(
+            5, lambda prepared: self.client.get('/api/products/?search=notbook&fuzzy=1'),
+            setup=self.reset_indexes,
+        )
+
+    def test_product_retrieve(self):
+        self.assertQueryBudget(2, lambda: self.client.get(f'/api/products/{self.product.id}/'))
+
+    def test_product_create(self):
+        self.client.force_authenticate(self.admin)
+        self.assertQueryBudget(2, lambda: self.client.post('/api/products/', {
+            'name': 'Pen', 'description': 'Blue', 'price': '1.50', 'category': self.category.id,
+        }))
+
+    def test_product_update(self):
+        self.client.force_authenticate(self.admin)
+        self.assertQueryBudget(
+            2, lambda: self.client.patch(f'/api/products/{self.product.id}/', {'price': '12.00'})
+        )
+
+    def test_product_delete(self):
+        self.client.force_authenticate(self.admin)
+        self.assertQueryBudget(
+            10,
+            lambda product: self.client.delete(f'/api/products/{product.id}/'),
+            setup=lambda: Product.objects.create(name='Temporary', category=self.category, price=1),
+        )
+
+    def test_product_batch(self):
+        self.assertQueryBudget(
+            1,
+            lambda ids: self.client.get(f'/api/products/batch/?ids={ids}'),
+            setup=lambda: ','.join(map(str, Product.objects.values_list('id', flat=True))),
+        )
+
+    def test_product_autocomplete(self):
+        self.assertQueryBudget(
+            2, lambda prepared: self.client.get('/api/products/autocomplete/?q=note'),
+            setup=self.reset_indexes,
+        )
+
+    def test_product_related(self):
+        self.assertQueryBudget(1, lambda: self.client.get(f'/api/products/{self.product.id}/related/'))
+
+    def test_product_bulk_update(self):
+        self.client.force_authenticate(self.admin)
+        self.assertQueryBudget(4, lambda: self.client.post('/api/products/bulk_update/', {
+            'filter': {'search': 'notebook'}, 'price': {'mode': 'percent', 'value': '-10'},
+        }, format='json'))
+
+
+class ConditionalGetTests(QueryBudgetTestCase):
+    """Unchanged catalog resources are answered with 304 from one aggregate query"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Electronics')
+        cls.product = Product.objects.create(name='Notebook', category=cls.category, price=10)
+
+    def grow(self, count):
+        Product.objects.bulk_create([
+            Product(name=f'Pen {index}', category=self.category, price=1) for index in range(count)
+        ])
+
+    def revalidate(self, url):
+        etag = self.client.get(url)['ETag']
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_not_modified(self):
+        for url in ['/api/products/', f'/api/products/{self.product.id}/', '/api/categories/']:
+            with self.subTest(url=url):
+                response = self.revalidate(url)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+                self.assertTrue(response.has_header('Last-Modified'))
+
+    def test_not_modified_costs_one_query(self):
+        self.grow(20)
+        etag = self.client.get('/api/products/')['ETag']
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_changes_invalidate(self):
+        list_etag = self.client.get('/api/products/')['ETag']
+        detail_etag = self.client.get(f'/api/products/{self.product.id}/')['ETag']
+
+        # Renaming the category changes every product's category_name
+        self.category.name = 'Gadgets'
+        self.category.save()
+        self.assertEqual(self.client.get('/api/products/', HTTP_IF_NONE_MATCH=list_etag).status_code, 200)
+        self.assertEqual(
+            self.client.get(f'/api/products/{self.product.id}/', HTTP_IF_NONE_MATCH=detail_etag).status_code, 200
+        )
+
+        # Deleting a row is caught by the count
+        self.grow(2)
+        list_etag = self.client.get('/api/products/')['ETag']
+        Product.objects.filter(name='Pen 0').delete()
+        self.assertEqual(self.client.get('/api/products/', HTTP_IF_NONE_MATCH=list_etag).status_code, 200)
+
+        # Other pages / field selections have their own ETag
+        self.assertNotEqual(self.client.get('/api/products/?fields=id')['ETag'], list_etag)
+
+    def test_if_modified_since_alone_is_ignored(self):
+        # A change within the same second as Last-Modified would otherwise be missed
+        last_modified = self.client.get('/api/products/')['Last-Modified']
+        Product.objects.filter(pk=self.product.pk).update(name='Notebook v2')
+        response = self.client.get('/api/products/', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['name'], 'Notebook v2')
+
+    def test_filters_run_once(self):
+        for url in ['/api/products/?search=note', f'/api/products/{self.product.id}/?search=note']:
+            with self.subTest(url=url):
+                with mock.patch.object(
+                    ProductSearchFilter, 'filter_queryset', autospec=True, side_effect=ProductSearchFilter.filter_queryset
+                ) as search:
+                    self.assertEqual(self.client.get(url).status_code, 200)
+                self.assertEqual(search.call_count, 1)
+
+
+class CatalogSnapshotTests(TestCase):
+    """Static catalog shards are rewritten only for categories that changed"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.books = Category.objects.create(name='Books')
+        cls.pens = Category.objects.create(name='Pens')
+        cls.notebook = Product.objects.create(name='Notebook', category=cls.books, price=10)
+        Product.objects.create(name='Diary', category=cls.books, price=12, image='products/NoteBook.jpg')
+        Product.objects.create(name='Pen', category=cls.pens, price=1)
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root, PUBLIC_BASE_URL='http://testserver')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.root = Path(media_root) / 'catalog'
+
+    def manifest(self):
+        return json.loads((self.root / 'manifest.json').read_text())
+
+    def shard(self, category):
+        entry = next(entry for entry in self.manifest()['categories'] if entry['id'] == category.id)
+        return json.loads(gzip.decompress((self.root / entry['file']).read_bytes()))
+
+    def test_build(self):
+        self.assertEqual(build_snapshot(), {'rebuilt': 2, 'unchanged': 0, 'removed': 0})
+        books = self.shard(self.books)
+        self.assertEqual([row['name'] for row in books['products']], ['Diary', 'Notebook'])
+        self.assertEqual(books['products'][0]['price'], '12.00')
+        self.assertEqual(books['products'][0]['category_name'], 'Books')
+
+        # Same rows as the list endpoint, absolute image URLs included
+        self.assertEqual(books['products'][0]['image'], 'http://testserver/media/products/NoteBook.jpg')
+        listed = {row['id']: row for row in self.client.get('/api/products/?category=books').data['results']}
+        self.assertEqual({row['id']: row for row in books['products']}, listed)
+
+    def test_shards_are_served_gzip_encoded(self):
+        build_snapshot()
+        entry = self.manifest()['categories'][0]
+        response = serve(RequestFactory().get('/'), entry['file'], document_root=self.root)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(
+            json.loads(gzip.decompress(b''.join(response.streaming_content)))['category']['id'], entry['id']
+        )
+
+    def test_incremental(self):
+        build_snapshot()
+        first = {entry['id']: entry['file'] for entry in self.manifest()['categories']}
+        self.assertEqual(build_snapshot(), {'rebuilt': 0, 'unchanged': 2, 'removed': 0})
+
+        self.notebook.price = 9
+        self.notebook.save()
+        self.assertEqual(build_snapshot(), {'rebuilt': 1, 'unchanged': 1, 'removed': 0})
+        second = {entry['id']: entry['file'] for entry in self.manifest()['categories']}
+        self.assertNotEqual(second[self.books.id], first[self.books.id])
+        self.assertEqual(second[self.pens.id], first[self.pens.id])
+        self.assertEqual(self.shard(self.books)['products'][1]['price'], '9.00')
+
+        # The previous generation is kept for clients still reading it, then removed
+        self.assertTrue((self.root / first[self.books.id]).exists())
+        self.notebook.delete()
+        self.assertEqual(build_snapshot(), {'rebuilt': 1, 'unchanged': 1, 'removed': 1})
+        self.assertFalse((self.root / first[self.books.id]).exists())
+
+    def test_changes_mark_it_stale(self):
+        from .snapshot import is_stale, locked, mark_stale
+
+        mark_stale()
+        self.assertFalse(is_stale())  # nothing to refresh before the first build
+        build_snapshot()
+        mark_stale()
+        self.assertTrue(is_stale())
+        self.assertEqual(build_snapshot(), {'rebuilt': 0, 'unchanged': 2, 'removed': 0})
+        self.assertFalse(is_stale())
+
+        # Builds in other processes or threads wait for the one holding the lock
+        acquired = []
+
+        def build_elsewhere():
+            with locked(self.root):
+                acquired.append(True)
+
+        with locked(self.root):
+            builder = threading.Thread(target=build_elsewhere)
+            builder.start()
+            builder.join(0.2)
+            self.assertEqual(acquired, [])
+        builder.join()
+        self.assertEqual(acquired, [True])
+
+
+class SearchIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user('customer', 'customer@example.com', 'password')
+        cls.category = Category.objects.create(name='Stationery')
+
+    def sell(self, product, quantity):
+        from orders.models import Order, OrderItem
+
+        order = Order.objects.create(user=self.customer, total_amount=quantity)
+        OrderItem.objects.create(order=order, product=product, quantity=quantity, price=1, product_name=product.name)
+
+    def test_autocomplete_ranks_the_whole_prefix_range(self):
+        products = Product.objects.bulk_create([
+            Product(name=f'Pen {index:05}', price=1, category=self.category)
+            for index in range(5100)
+        ])
+        # Sorted last among the keys
+        self.sell(products[-1], 5)
+        self.sell(products[-2], 3)
+        index = PrefixIndex()
+
+        self.assertEqual(
+            [row['id'] for row in index.search('pen', limit=3)],
+            [products[-1].id, products[-2].id, products[0].id]
+        )
+        # A narrow prefix is ranked from its slice of keys
+        self.assertEqual(
+            [row['id'] for row in index.search(f'{products[-1].name[:-1]}', limit=2)],
+            [products[-1].id, products[-2].id]
+        )
+
+        # A rename drops the cached results of the prefixes it touches only
+        index.search('000', limit=3)
+        Product.objects.filter(pk=products[-1].pk).update(name='Marker')
+        index.refresh([products[-1].id])
+        self.assertEqual(set(index.results), {('000', 3)})
+        self.assertEqual(
+            [row['id'] for row in index.search('pen', limit=2)],
+            [products[-2].id, products[0].id]
+        )
+        self.assertEqual(index.search('mark'), [{'id': products[-1].id, 'name': 'Marker'}])
+
+
+    def test_fuzzy_search_reports_truncation(self):
+        count = ProductSearchFilter.max_results + 10
+        products = Product.objects.bulk_create([
+            Product(name=f'Notebook {index}', price=1, category=self.category) for index in range(count)
+        ])
+        products[-1].name = 'Notebook'
+        products[-1].save()
+        trigram_index.built = False
+        self.assertEqual(len(TrigramIndex().search('notbook')), count)
+
+        response = self.client.get('/api/products/?search=notbook&fuzzy=1')
+        self.assertEqual(response.data['count'], ProductSearchFilter.max_results)
+        self.assertIs(response.data['search_truncated'], True)
+        self.assertEqual(response.data['results'][0]['id'], products[-1].id)
+
+        products[0].name = 'Diary'
+        products[0].save()
+        trigram_index.built = False
+        response = self.client.get('/api/products/?search=diarry&fuzzy=1')
+        self.assertEqual([row['id'] for row in response.data['results']], [products[0].id])
+        self.assertIs(response.data['search_truncated'], False)
+        self.assertNotIn('search_truncated', self.client.get('/api/products/?search=notebook').data)
+
+        # The category is narrowed down before the cut, not after
+        pens = Category.objects.create(name='Pens')
+        Product.objects.filter(pk=products[1].pk).update(category=pens, name='Notebook pen')
+        trigram_index.built = False
+        response = self.client.get('/api/products/?search=notbook&fuzzy=1&category=pens')
+        self.assertEqual([row['id'] for row in response.data['results']], [products[1].id])
+        self.assertIs(response.data['search_truncated'], False)
+
+
+class ArchivedSalesTests(TestCase):
+    """Archiving orders changes neither recommendations nor autocomplete ranking"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user('customer', 'customer@example.com', 'password')
+        category = Category.objects.create(name='Stationery')
+        cls.pen, cls.ink, cls.paper = Product.objects.bulk_create([
+            Product(name=name, price=1, category=category) for name in ['Pen', 'Pen ink', 'Pen paper']
+        ])
+
+    def related(self):
+        return list(RelatedProduct.objects.order_by('product_id', 'rank').values_list('product_id', 'related_id', 'score'))
+
+    def test_full_build_counts_archived_orders(self):
+        from orders.archive import archive_orders
+        from orders.checkout import place_order
+        from orders.models import ArchivedOrder, Order
+
+        place_order(self.customer, [(self.pen, 1), (self.ink, 3)])
+        place_order(self.customer, [(self.pen, 1), (self.ink, 1), (self.paper, 1)])
+        cancelled = place_order(self.customer, [(self.paper, 1), (self.ink, 1)])
+        Order.objects.filter(id=cancelled.id).update(status='cancelled')
+        build_related_products()
+        incremental = self.related()
+        ranking = [row['name'] for row in PrefixIndex().search('pen')]
+        self.assertEqual(ranking, ['Pen ink', 'Pen', 'Pen paper'])
+
+        Order.objects.update(status='delivered', created_at=timezone.now() - timedelta(days=400))
+        Order.objects.filter(id=cancelled.id).update(status='cancelled')
+        self.assertEqual(archive_orders(), 3)
+        self.assertEqual(ArchivedOrder.objects.count(), 3)
+
+        build_related_products(full=True)
+        self.assertEqual(self.related(), incremental)
+        self.assertEqual([row['name'] for row in PrefixIndex().search('pen')], ranking)
+
+
+class ProductApiTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.books = Category.objects.create(name='Books')
+        cls.pens = Category.objects.create(name='Pens')
+        cls.notebook = Product.objects.create(
+            name='Notebook', description='Ruled', category=cls.books, price='10.00', image='products/NoteBook.jpg'
+        )
+        cls.diary = Product.objects.create(name='Diary', category=cls.books, price='4.99')
+        cls.pen = Product.objects.create(name='Pen', category=cls.pens, price='1.50', in_stock=False)
+
+    def test_list_matches_detail(self):
+        # The list fast path renders rows exactly like ProductSerializer
+        response = self.client.get('/api/products/?ordering=name')
+        self.assertEqual([row['name'] for row in response.data['results']], ['Diary', 'Notebook', 'Pen'])
+        for row in response.data['results']:
+            self.assertEqual(row, self.client.get(f'/api/products/{row["id"]}/').data)
+        self.assertEqual(response['Content-Type'], 'application/json')
+
+    def test_fields_and_omit(self):
+        response = self.client.get('/api/products/?fields=id,name&ordering=name')
+        self.assertEqual(response.data['results'][0], {'id': self.diary.id, 'name': 'Diary'})
+        detail = self.client.get(f'/api/products/{self.pen.id}/?omit=description,image').data
+        self.assertNotIn('description', detail)
+        self.assertNotIn('image', detail)
+        self.assertEqual(detail['category_name'], 'Pens')
+
+    def test_batch(self):
+        response = self.client.get(f'/api/products/batch/?ids={self.pen.id},999999,{self.diary.id},{self.pen.id}')
+        self.assertEqual([row['name'] for row in response.data['results']], ['Pen', 'Diary'])
+        self.assertEqual(response.data['missing'], [999999])
+
+        for ids in ['', 'a,b', '0', '-1', '99999999999999999999999', ','.join(map(str, range(1, 202)))]:
+            with self.subTest(ids=ids[:20]):
+                self.assertEqual(self.client.get(f'/api/products/batch/?ids={ids}').status_code, 400)
+
+    def test_bulk_update(self):
+        self.assertEqual(self.client.post('/api/products/bulk_update/', {'in_stock': True}, format='json').status_code, 401)
+        self.client.force_authenticate(self.admin)
+        before = Product.objects.get(pk=self.notebook.pk).updated_at
+
+        response = self.client.post('/api/products/bulk_update/', {
+            'category': 'books', 'price': {'mode': 'percent', 'value': '-10'},
+        }, format='json')
+        self.assertEqual(response.data['updated'], 2)
+        prices = dict(Product.objects.values_list('name', 'price'))
+        self.assertEqual(str(prices['Notebook']), '9.00')
+        self.assertEqual(str(prices['Diary']), '4.49')
+        self.assertEqual(str(prices['Pen']), '1.50')
+        self.assertGreater(Product.objects.get(pk=self.notebook.pk).updated_at, before)
+
+        # Never below zero
+        self.client.post('/api/products/bulk_update/', {
+            'ids': [self.pen.id], 'price': {'mode': 'absolute', 'value': '-5'}, 'in_stock': True,
+        }, format='json')
+        pen = Product.objects.get(pk=self.pen.pk)
+        self.assertEqual(str(pen.price), '0.00')
+        self.assertTrue(pen.in_stock)
+
+        response = self.client.post('/api/products/bulk_update/', {
+            'filter': {'search': 'diary', 'max_price': '5'}, 'in_stock': False,
+        }, format='json')
+        self.assertEqual(response.data['updated'], 1)
+        self.assertFalse(Product.objects.get(pk=self.diary.pk).in_stock)
+
+    def test_bulk_update_needs_a_target(self):
+        self.client.force_authenticate(self.admin)
+        for body in [
+            {'in_stock': False},
+            {'filter': {}, 'in_stock': False},
+            {'filter': {'search': ' '}, 'in_stock': False},
+            {'ids': [], 'in_stock': False},
+            {'category': 'books'},
+        ]:
+            with self.subTest(body=body):
+                self.assertEqual(self.client.post('/api/products/bulk_update/', body, format='json').status_code, 400)
+        self.assertFalse(Product.objects.filter(in_stock=False).exclude(pk=self.pen.pk).exists())
+
+
+class PriceBookTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.books = Category.objects.create(name='Books')
+        cls.notebook = Product.objects.create(name='Notebook', category=cls.books, price=Decimal('10.00'))
+        cls.diary = Product.objects.create(name='Diary', category=cls.books, price=Decimal('3.33'))
+        PriceTier.objects.create(product=cls.notebook, min_quantity=10, unit_price=Decimal('9.00'))
+        PriceTier.objects.create(product=cls.notebook, min_quantity=50, unit_price=Decimal('8.00'))
+        PriceTier.objects.create(category=cls.books, min_quantity=5, discount_percent=5)
+
+    def test_unit_price(self):
+        with self.assertNumQueries(1):
+            book = PriceBook([self.notebook, self.diary, None])
+        self.assertEqual(
+            [str(book.unit_price(self.notebook, quantity)) for quantity in (1, 5, 10, 49, 50, 500)],
+            ['10.00', '9.50', '9.00', '9.00', '8.00', '8.00']
+        )
+        # A product tier, once reached, wins over the category discount
+        self.assertEqual(str(book.unit_price(self.diary, 4)), '3.33')
+        self.assertEqual(str(book.unit_price(self.diary, 5)), '3.16')
+
+
+class RecommendationTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user('customer', 'customer@example.com', 'password')
+        category = Category.objects.create(name='Stationery')
+        cls.pen, cls.ink, cls.paper, cls.ruler = Product.objects.bulk_create([
+            Product(name=name, price=1, category=category) for name in ['Pen', 'Ink', 'Paper', 'Ruler']
+        ])
+
+    def related(self, product):
+        return [row['name'] for row in self.client.get(f'/api/products/{product.id}/related/').data]
+
+    def stored(self):
+        return (
+            list(ProductPairCount.objects.order_by('product_id', 'other_id').values_list('product_id', 'other_id', 'count')),
+            list(RelatedProduct.objects.order_by('product_id', 'rank').values_list('product_id', 'related_id', 'score')),
+        )
+
+    def test_incremental_builds(self):
+        from orders.checkout import place_order
+        from orders.models import Order
+
+        first = place_order(self.customer, [(self.pen, 1), (self.ink, 1)])
+        # Leave a gap for an order that commits late with a lower id
+        second = place_order(self.customer, [(self.pen, 1), (self.ink, 2), (self.paper, 1)], id=first.id + 2)
+        cancelled = place_order(self.customer, [(self.pen, 1), (self.ruler, 1)])
+        Order.objects.filter(id=cancelled.id).update(status='cancelled')
+        build = build_related_products()
+        self.assertEqual((build.orders_processed, build.products_updated), (2, 3))
+        self.assertEqual(self.related(self.pen), ['Ink', 'Paper'])
+        self.assertEqual(self.related(self.ruler), [])
+        self.assertIsNone(build_related_products())
+
+        # Cancelling a counted order takes its pairs back out
+        Order.objects.filter(id=second.id).update(status='cancelled')
+        build = build_related_products()
+        self.assertEqual((build.orders_processed, build.orders_reverted), (0, 1))
+        self.assertEqual(self.related(self.pen), ['Ink'])
+        self.assertEqual(self.related(self.paper), [])
+
+        late = place_order(self.customer, [(self.pen, 1), (self.paper, 1)], id=first.id + 1)
+        place_order(self.customer, [(self.pen, 1), (self.paper, 1), (self.ruler, 1)])
+        build = build_related_products(k=1)
+        self.assertEqual(build.orders_processed, 2)
+        self.assertLess(late.id, build.last_order_id)
+        self.assertEqual(self.related(self.pen), ['Paper'])
+        self.assertEqual(self.related(self.ruler), ['Pen'])
+
+        incremental = self.stored()
+        build_related_products(k=1, full=True)
+        self.assertEqual(self.stored(), incremental)
+        self.assertFalse(Order.objects.filter(status='cancelled', in_recommendations=True).exists())
+        self.assertEqual(self.client.get('/api/products/x/related/').status_code, 404)
@@ -1,10 +1,45 @@
-from rest_framework import viewsets, filters
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Q, Value
+from django.db.models.functions import Greatest, Round
+from django.utils import timezone
+from rest_framework import viewsets, filters, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Category, Product
-from .serializers import CategorySerializer, ProductSerializer
+from .filters import ProductSearchFilter
+from .models import Category, Product, RelatedProduct
+from .renderers import FastJSONRenderer
+from .search import autocomplete_index
+from .serializers import (
+    CategorySerializer, ProductSerializer, ProductRowSerializer,
+    ProductBulkUpdateSerializer, field_paths
+)
+from .signals import send_catalog_changed
+from viara_project.conditional import ConditionalGetMixin, conditional_get
+
+MAX_BATCH_IDS = 200
+# Largest value of the bigint id column; anything above it cannot be bound
+MAX_ID = 2 ** 63 - 1
+
 
-class CategoryViewSet(viewsets.ModelViewSet):
+def adjusted_price(adjustment):
+    """SQL expression for a PriceAdjustmentSerializer change, never below zero"""
+    value = adjustment['value']
+    if adjustment['mode'] == 'percent':
+        price = Round(F('price') * Value(1 + value / Decimal(100)), 2)
+    else:
+        price = F('price') + Value(value)
+    return ExpressionWrapper(
+        Greatest(price, Value(Decimal('0.00'))),
+        output_field=DecimalField(max_digits=10, decimal_places=2)
+    )
+
+class CategoryViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """
     API endpoint for categories
     
@@ -14,6 +49,8 @@ class CategoryViewSet(viewsets.ModelViewSet):
     - GET    /api/categories/{id}/  - Get specific category (Public)
     - PUT    /api/categories/{id}/  - Update category (Admin only)
     - DELETE /api/categories/{id}/  - Delete category (Admin only)
+
+    GETs return ETag / Last-Modified; unchanged resources get 304
     """
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
@@ -29,15 +66,33 @@ class CategoryViewSet(viewsets.ModelViewSet):
         return [permission() for permission in permission_classes]
 
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """
     API endpoint for products
     Supports search, filtering, and ordering
     
     Query parameters:
     - ?search=laptop          - Search by name/description
+    - ?search=notbook&fuzzy=1 - Typo-tolerant search on name/category, best match first
+                                (the best 500 matches; "search_truncated": true when there were more)
     - ?category=electronics   - Filter by category name
     - ?ordering=-price        - Sort by price (descending)
+    - ?fields=id,name,price   - Only return these fields (also ?omit=)
+
+    Batch lookup:
+    - GET /api/products/batch/?ids=3,1,2 - Many products in one request (Public)
+
+    Autocomplete:
+    - GET /api/products/autocomplete/?q=note - Name suggestions (Public)
+
+    Recommendations:
+    - GET /api/products/{id}/related/ - Frequently bought together (Public)
+
+    Bulk changes:
+    - POST /api/products/bulk_update/ - Adjust price / availability (Admin only)
+
+    List and detail GETs return ETag / Last-Modified; send them back as
+    If-None-Match / If-Modified-Since to get 304 when nothing changed
     
     Permissions:
     - GET (list/retrieve) - Public
@@ -45,16 +100,20 @@ class ProductViewSet(viewsets.ModelViewSet):
     """
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    # Search runs last so fuzzy results keep their relevance order
+    filter_backends = [filters.OrderingFilter, ProductSearchFilter]
     search_fields = ['name', 'description']
     ordering_fields = ['price', 'created_at', 'name']
     ordering = ['-created_at']  # Default: newest first
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+    # category_name is part of the output, so a renamed category counts as a change
+    conditional_fields = ['updated_at', 'category__updated_at']
     
     def get_permissions(self):
         """
         Public can view products, only admins can create/update/delete
         """
-        if self.action in ['list', 'retrieve']:
+        if self.action in ['list', 'retrieve', 'batch', 'related', 'autocomplete']:
             permission_classes = [AllowAny]
         else:
             permission_classes = [IsAuthenticated, IsAdminUser]
@@ -70,5 +129,156 @@ class ProductViewSet(viewsets.ModelViewSet):
         
         if category:
             queryset = queryset.filter(category__name__iexact=category)
+
+        # category_name is a join; skip it when the client left it out
+        if self.action != 'list' and 'category_name' in field_paths(self.get_serializer()):
+            queryset = queryset.select_related('category')
         
-        return queryset
\ No newline at end of file
+        return queryset
+
+    @conditional_get
+    def list(self, request, *args, **kwargs):
+        """
+        List products through the read-only fast path
+        Rows come straight from .values() instead of ProductSerializer
+        """
+        rows = ProductRowSerializer(request, fields=field_paths(self.get_serializer()))
+        queryset = rows.values(self.filter_queryset(self.get_queryset()))
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            response = self.get_paginated_response(rows.to_representation(page))
+            if hasattr(request, 'search_truncated'):
+                response.data['search_truncated'] = request.search_truncated
+            return response
+
+        return Response(rows.to_representation(queryset))
+
+    @action(detail=False, methods=['get'])
+    def batch(self, request):
+        """
+        Fetch many products by id in one query
+        GET /api/products/batch/?ids=3,1,2
+
+        Results keep the requested order (duplicates dropped); ids that
+        do not exist are listed in "missing". Accepts ?fields= / ?omit=.
+        """
+        try:
+            ids = list(dict.fromkeys(
+                int(product_id) for product_id in request.query_params.get('ids', '').split(',') if product_id
+            ))
+        except ValueError:
+            ids = None
+        if ids is None or not all(0 < product_id <= MAX_ID for product_id in ids):
+            return Response(
+                {'error': 'ids must be a comma-separated list of numbers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not ids:
+            return Response(
+                {'error': 'ids is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(ids) > MAX_BATCH_IDS:
+            return Response(
+                {'error': f'At most {MAX_BATCH_IDS} ids per request'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        queryset = Product.objects.filter(id__in=ids)
+        if 'category_name' in field_paths(self.get_serializer()):
+            queryset = queryset.select_related('category')
+        products = queryset.in_bulk()
+
+        serializer = self.get_serializer([products[pk] for pk in ids if pk in products], many=True)
+        return Response({
+            'results': serializer.data,
+            'missing': [pk for pk in ids if pk not in products],
+        })
+
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        """
+        Typeahead suggestions for product names, most popular first
+        GET /api/products/autocomplete/?q=note&limit=10
+
+        Answered from an in-memory prefix index, not the database
+        """
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 50)
+        except ValueError:
+            limit = 10
+        return Response(autocomplete_index.search(request.query_params.get('q', ''), limit))
+
+    @action(detail=True, methods=['get'])
+    def related(self, request, pk=None):
+        """
+        Products frequently bought together with this one
+        GET /api/products/{id}/related/
+
+        Served from the precomputed RelatedProduct table in one indexed
+        lookup (refresh it with `manage.py build_related_products`)
+        """
+        if not pk.isdigit():
+            raise NotFound()
+        entries = (
+            RelatedProduct.objects
+            .filter(product_id=pk)
+            .select_related('related__category')
+            .order_by('rank')
+        )
+        products = [entry.related for entry in entries]
+        serializer = self.get_serializer(products, many=True)
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['post'])
+    def bulk_update(self, request):
+        """
+        Update price and/or availability of many products at once
+        POST /api/products/bulk_update/
+
+        Body examples:
+        {"category": "Electronics", "price": {"mode": "percent", "value": "-10"}}
+        {"ids": [1, 2, 3], "in_stock": false}
+        {"filter": {"search": "notebook", "max_price": "50"},
+         "price": {"mode": "absolute", "value": "1.25"}, "in_stock": true}
+
+        Runs as a single UPDATE inside one transaction, and notifies
+        catalog caches once for the whole batch
+        """
+        serializer = ProductBulkUpdateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        queryset = Product.objects.all()
+        if 'ids' in data:
+            queryset = queryset.filter(id__in=data['ids'])
+        if 'category' in data:
+            queryset = queryset.filter(category__name__iexact=data['category'])
+
+        product_filter = data.get('filter', {})
+        for term in product_filter.get('search', '').split():
+            queryset = queryset.filter(Q(name__icontains=term) | Q(description__icontains=term))
+        if 'in_stock' in product_filter:
+            queryset = queryset.filter(in_stock=product_filter['in_stock'])
+        if 'min_price' in product_filter:
+            queryset = queryset.filter(price__gte=product_filter['min_price'])
+        if 'max_price' in product_filter:
+            queryset = queryset.filter(price__lte=product_filter['max_price'])
+
+        # queryset.update() skips auto_now, so set updated_at explicitly
+        changes = {'updated_at': timezone.now()}
+        if 'price' in data:
+            changes['price'] = adjusted_price(data['price'])
+        if 'in_stock' in data:
+            changes['in_stock'] = data['in_stock']
+
+        with transaction.atomic():
+            product_ids = list(queryset.select_for_update().values_list('id', flat=True))
+            updated = queryset.update(**changes)
+            send_catalog_changed(Product, product_ids)
+
+        return Response({
+            'message': f'{updated} products updated',
+            'updated': updated,
+        })
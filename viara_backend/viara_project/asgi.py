@@ -3,6 +3,10 @@ ASGI config for viara_project project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Besides the Django app it serves the Server-Sent Events feed of order
+status changes at /api/orders/events/ (see orders.streams). Run it with an
+ASGI server, e.g. ``uvicorn viara_project.asgi:application``.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -13,4 +17,13 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'viara_project.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after Django is set up, since it loads models
+from orders.streams import ORDER_EVENTS_PATH, order_events_stream  # noqa: E402
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] == ORDER_EVENTS_PATH and scope['method'] == 'GET':
+        return await order_events_stream(scope, receive, send)
+    return await django_application(scope, receive, send)
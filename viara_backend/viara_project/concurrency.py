@@ -0,0 +1,158 @@
+"""
+Adaptive concurrency limits and load shedding
+
+Requests are sorted into route classes (catalog reads, cart writes,
+checkout, auth). Each class has an in-flight limit that adapts AIMD-style
+from observed latency: it grows by about one slot per limit's worth of
+fast requests while saturated, and shrinks by BACKOFF when a request takes
+longer than the class's target latency. It shrinks at most once per
+latency window: slow requests that were already running at the last
+decrease measured the old limit and do not shrink it again. Requests
+over the limit get an immediate 503 with Retry-After.
+
+All classes also share CONCURRENCY_TOTAL slots. Each class may only fill
+its `share` of them, so browsing is shed first and checkout keeps the
+headroom; checkout also waits briefly for a slot instead of failing at once.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.http import JsonResponse
+
+from .metrics import registry, view_labels
+
+BACKOFF = 0.9
+
+DEFAULT_LIMITS = {
+    'checkout': {'initial': 16, 'minimum': 4, 'maximum': 64, 'target_latency': 1.0, 'share': 1.0, 'wait': 0.5},
+    'auth': {'initial': 8, 'minimum': 2, 'maximum': 32, 'target_latency': 0.5, 'share': 0.9, 'wait': 0},
+    'cart_writes': {'initial': 16, 'minimum': 2, 'maximum': 64, 'target_latency': 0.5, 'share': 0.8, 'wait': 0},
+    'catalog_reads': {'initial': 32, 'minimum': 4, 'maximum': 128, 'target_latency': 0.25, 'share': 0.7, 'wait': 0},
+}
+
+registry.describe('http_requests_shed_total', 'counter', 'Requests rejected by the concurrency limiter')
+
+# Limiters created by the middleware (one per handler), for /metrics
+limiters = []
+
+
+def route_class(view_func, method):
+    """Route class for a resolved view, or None for unlimited routes"""
+    view, action = view_labels(view_func, method)
+    module = getattr(getattr(view_func, 'cls', view_func), '__module__', '')
+
+    if view == 'OrderViewSet' and action in ('create', 'create_from_cart'):
+        return 'checkout'
+    if module.startswith('accounts.'):
+        return 'auth'
+    if view == 'CartViewSet' and method not in ('GET', 'HEAD', 'OPTIONS'):
+        return 'cart_writes'
+    if view in ('ProductViewSet', 'CategoryViewSet') and method in ('GET', 'HEAD'):
+        return 'catalog_reads'
+    return None
+
+
+class AIMDLimiter:
+    """In-flight limit for one route class, adjusted from request latency"""
+
+    def __init__(self, name, initial, minimum, maximum, target_latency, share=1.0, wait=0):
+        self.name = name
+        self.limit = float(initial)
+        self.min_limit = minimum
+        self.max_limit = maximum
+        self.target_latency = target_latency
+        self.share = share
+        self.wait = wait
+        self.inflight = 0
+        self.last_backoff = float('-inf')
+
+    def release(self, latency, now=None):
+        """Give the slot back and adapt the limit (caller holds the lock)"""
+        now = time.perf_counter() if now is None else now
+        saturated = self.inflight >= int(self.limit)
+        self.inflight -= 1
+        if latency > self.target_latency:
+            if now - latency > self.last_backoff:
+                self.limit = max(self.min_limit, self.limit * BACKOFF)
+                self.last_backoff = now
+        elif saturated:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+
+class ConcurrencyLimiter:
+    """All route-class limiters plus the shared total, behind one condition"""
+
+    def __init__(self, limits, total):
+        self.condition = threading.Condition()
+        self.limiters = {name: AIMDLimiter(name, **options) for name, options in limits.items()}
+        self.total = total
+        self.inflight = 0
+
+    def has_room(self, limiter):
+        return (
+            limiter.inflight < int(limiter.limit)
+            and self.inflight < self.total * limiter.share
+        )
+
+    def acquire(self, name):
+        """Take a slot for the class; False when the request should be shed"""
+        limiter = self.limiters[name]
+        with self.condition:
+            if not self.has_room(limiter):
+                if not limiter.wait or not self.condition.wait_for(lambda: self.has_room(limiter), limiter.wait):
+                    return False
+            limiter.inflight += 1
+            self.inflight += 1
+            return True
+
+    def release(self, name, latency):
+        with self.condition:
+            self.limiters[name].release(latency)
+            self.inflight -= 1
+            self.condition.notify_all()
+
+    def snapshot(self):
+        """{class: (in-flight, current limit)} for monitoring"""
+        with self.condition:
+            return {name: (limiter.inflight, limiter.limit) for name, limiter in self.limiters.items()}
+
+
+def build_limiter():
+    limits = {name: dict(options) for name, options in DEFAULT_LIMITS.items()}
+    for name, options in getattr(settings, 'CONCURRENCY_LIMITS', {}).items():
+        limits.setdefault(name, {}).update(options)
+    return ConcurrencyLimiter(limits, getattr(settings, 'CONCURRENCY_TOTAL', 64))
+
+
+class ConcurrencyLimitMiddleware:
+    """
+    Sheds load with a fast 503 once a route class is at its limit
+    Goes right after MetricsMiddleware so shed requests are still counted
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.limiter = build_limiter()
+        limiters.append(self.limiter)
+
+    def __call__(self, request):
+        try:
+            return self.get_response(request)
+        finally:
+            route = getattr(request, '_concurrency_route', None)
+            if route is not None:
+                self.limiter.release(route, time.perf_counter() - request._concurrency_start)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        route = route_class(view_func, request.method)
+        if route is None:
+            return None
+        if not self.limiter.acquire(route):
+            registry.inc('http_requests_shed_total', (('route_class', route),))
+            response = JsonResponse({'error': 'Server is busy, please retry shortly'}, status=503)
+            response['Retry-After'] = '1'
+            return response
+        request._concurrency_route = route
+        request._concurrency_start = time.perf_counter()
+        return None
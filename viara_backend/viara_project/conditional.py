@@ -0,0 +1,104 @@
+"""
+Conditional GET (ETag / Last-Modified) for DRF viewsets
+
+Validators come from one aggregate over the same filtered queryset the
+view would serialize: COUNT(*) plus MAX() of every timestamp that changes
+the output. An unchanged resource is answered with 304 Not Modified
+before anything is loaded or serialized; a changed one is served from
+that same filtered queryset, so the filter backends run once.
+
+Only If-None-Match is honoured. Last-Modified has one-second resolution,
+so an If-Modified-Since on its own could miss a change made in the same
+second; the header is still sent for information.
+"""
+import functools
+import hashlib
+
+from django.db.models import Count, Max
+from django.http import HttpResponseNotModified
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+
+def conditional_get(view_method):
+    """
+    Answer a list / retrieve action with 304 Not Modified when the
+    client's If-None-Match still matches, and add ETag and Last-Modified
+    to full responses (see ConditionalGetMixin)
+    """
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        etag, last_modified = self.get_validators(request)
+        not_modified = get_conditional_response(request, etag=etag)
+        if isinstance(not_modified, HttpResponseNotModified):
+            return set_validators(not_modified, etag, last_modified)
+
+        response = view_method(self, request, *args, **kwargs)
+        if response.status_code == 200:
+            set_validators(response, etag, last_modified)
+        return response
+
+    return wrapper
+
+
+def set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    # Revalidate every time instead of heuristic caching from Last-Modified
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    ETag / Last-Modified support for list and retrieve
+
+    conditional_fields: timestamps whose change changes the output,
+    joined ones included (e.g. 'category__updated_at' when the response
+    shows the category name). Deletions are caught by the COUNT.
+
+    Views that override list / retrieve decorate them with
+    @conditional_get themselves.
+    """
+    conditional_fields = ['updated_at']
+
+    def filter_queryset(self, queryset):
+        # get_validators already filtered this request's queryset: hand it
+        # to the view's own filter_queryset(get_queryset()) call
+        filtered = self.__dict__.pop('conditional_queryset', None)
+        if filtered is not None:
+            return filtered
+        return super().filter_queryset(queryset)
+
+    def get_validators(self, request):
+        """(weak ETag, Last-Modified timestamp or None) from one aggregate query"""
+        queryset = self.conditional_queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        if lookup_url_kwarg in self.kwargs:
+            queryset = queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+
+        aggregates = queryset.order_by().aggregate(
+            count=Count('pk'),
+            **{f'max_{field}': Max(field) for field in self.conditional_fields}
+        )
+        timestamps = [
+            aggregates[f'max_{field}'] for field in self.conditional_fields
+            if aggregates[f'max_{field}'] is not None
+        ]
+        last_modified = max(timestamps) if timestamps else None
+
+        # The same data renders differently per URL (page, ?fields=...) and format
+        digest = hashlib.sha256()
+        for part in (request.get_full_path(), request.accepted_media_type, aggregates['count'], *timestamps):
+            digest.update(f'{part}|'.encode())
+        etag = f'W/"{digest.hexdigest()[:32]}"'
+        return etag, int(last_modified.timestamp()) if last_modified else None
+
+    @conditional_get
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional_get
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
@@ -0,0 +1,280 @@
+"""
+Prometheus-style metrics, exposed at /metrics in text exposition format
+
+Every thread records into its own shard (plain dicts, no locking on the
+request path); a scrape merges the shards. Counters and histograms only
+ever grow, so reading another thread's shard mid-update is at worst one
+observation behind. Domain gauges (orders by status, carts, ...) are
+computed at scrape time; the ones that aggregate whole tables are cached
+for METRICS_DB_GAUGE_SECONDS so frequent scrapes do not keep scanning them.
+"""
+import hmac
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count
+from django.http import HttpResponse, HttpResponseForbidden
+
+METRICS_PATH = '/metrics'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_TIME_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+
+class Registry:
+    """
+    Lock-light metric store
+
+    counters:   {(name, labels): value}
+    histograms: {(name, labels): [bucket counts..., +Inf count, sum]}
+    where labels is a tuple of (key, value) pairs.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.shards = []
+        self.help = {}
+        self.buckets = {}
+
+    def describe(self, name, kind, help_text, buckets=None):
+        self.help[name] = (kind, help_text)
+        if buckets is not None:
+            self.buckets[name] = buckets
+
+    def shard(self):
+        try:
+            return self.local.shard
+        except AttributeError:
+            shard = self.local.shard = ({}, {})
+            with self.lock:
+                self.shards.append(shard)
+            return shard
+
+    def inc(self, name, labels=(), amount=1):
+        counters = self.shard()[0]
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + amount
+
+    def observe(self, name, labels, value):
+        histograms = self.shard()[1]
+        key = (name, labels)
+        buckets = self.buckets[name]
+        counts = histograms.get(key)
+        if counts is None:
+            counts = histograms[key] = [0] * (len(buckets) + 2)
+        counts[bisect_left(buckets, value)] += 1
+        counts[-1] += value
+
+    def collect(self):
+        """Merge all shards; returns (counters, histograms)"""
+        with self.lock:
+            shards = list(self.shards)
+        counters, histograms = {}, {}
+        for shard_counters, shard_histograms in shards:
+            for key, value in list(shard_counters.items()):
+                counters[key] = counters.get(key, 0) + value
+            for key, counts in list(shard_histograms.items()):
+                merged = histograms.setdefault(key, [0] * len(counts))
+                for index, value in enumerate(list(counts)):
+                    merged[index] += value
+        return counters, histograms
+
+
+registry = Registry()
+registry.describe('http_requests_total', 'counter', 'HTTP requests by view, action, method and status')
+registry.describe('http_request_duration_seconds', 'histogram', 'HTTP request latency', LATENCY_BUCKETS)
+registry.describe('http_exceptions_total', 'counter', 'Unhandled exceptions raised by views')
+registry.describe('db_queries_per_request', 'histogram', 'Database queries run per request', QUERY_COUNT_BUCKETS)
+registry.describe('db_query_duration_seconds', 'histogram', 'Database query latency', QUERY_TIME_BUCKETS)
+registry.describe('db_query_errors_total', 'counter', 'Database queries that raised')
+
+
+def view_labels(view_func, method):
+    """(view, action) for a resolved view; DRF viewsets report their action"""
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return f'{view_func.__module__}.{view_func.__name__}', ''
+    actions = getattr(view_func, 'actions', None) or {}
+    return view_class.__name__, actions.get(method.lower(), '')
+
+
+class MetricsMiddleware:
+    """
+    Records request latency, status and DB usage per DRF view and action
+    Put it first in MIDDLEWARE so the timings cover the whole stack
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.path == METRICS_PATH:
+            return self.get_response(request)
+
+        request._metrics_view = ('unmatched', '')
+        queries = [0]
+
+        def record_query(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            except Exception:
+                registry.inc('db_query_errors_total', (('view', request._metrics_view[0]),))
+                raise
+            finally:
+                queries[0] += 1
+                registry.observe(
+                    'db_query_duration_seconds',
+                    (('view', request._metrics_view[0]),),
+                    time.perf_counter() - start,
+                )
+
+        start = time.perf_counter()
+        with connection.execute_wrapper(record_query):
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        view, action = request._metrics_view
+        labels = (('view', view), ('action', action), ('method', request.method))
+        registry.observe('http_request_duration_seconds', labels, elapsed)
+        registry.inc('http_requests_total', labels + (('status', str(response.status_code)),))
+        registry.observe('db_queries_per_request', (('view', view), ('action', action)), queries[0])
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._metrics_view = view_labels(view_func, request.method)
+
+    def process_exception(self, request, exception):
+        view, action = getattr(request, '_metrics_view', ('unmatched', ''))
+        registry.inc('http_exceptions_total', (
+            ('view', view), ('action', action), ('exception', type(exception).__name__)
+        ))
+
+
+# ------------------------------------------------------------
+# EXPOSITION
+# ------------------------------------------------------------
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{escape(value)}"' for key, value in labels) + '}'
+
+
+def format_number(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+_db_gauges = {}
+
+
+def db_gauges():
+    """Gauges aggregated from whole tables, recomputed at most every METRICS_DB_GAUGE_SECONDS"""
+    # Imported here: the project package loads before the apps
+    from orders.models import Cart, Order
+
+    ttl = getattr(settings, 'METRICS_DB_GAUGE_SECONDS', 60)
+    cached = _db_gauges.get('gauges')
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[1]
+
+    by_status = dict(Order.objects.values_list('status').annotate(count=Count('id')))
+    gauges = [
+        ('orders', 'Orders by status', [
+            ((('status', status),), by_status.get(status, 0)) for status, label in Order.STATUS_CHOICES
+        ]),
+        ('carts_active', 'Carts with at least one item', [
+            ((), Cart.objects.filter(items__isnull=False).distinct().count()),
+        ]),
+    ]
+    _db_gauges['gauges'] = (time.monotonic() + ttl, gauges)
+    return gauges
+
+
+def domain_gauges():
+    """[(name, help, [(labels, value)])] computed from the database and caches"""
+    # Imported here: the project package loads before the apps
+    from orders.events import broker
+    from products.search import autocomplete_index, trigram_index
+    from .concurrency import limiters
+
+    return db_gauges() + [
+        ('order_event_subscribers', 'Open order status streams in this process', [
+            ((), broker.subscriber_count),
+        ]),
+        ('autocomplete_cached_results', 'Cached autocomplete answers in this process', [
+            ((), len(autocomplete_index.results)),
+        ]),
+        ('search_index_products', 'Products in the in-memory search indexes of this process', [
+            ((('index', 'autocomplete'),), len(autocomplete_index.names)),
+            ((('index', 'trigram'),), len(trigram_index.name_trigrams)),
+        ]),
+        ('concurrency_limit', 'Adaptive in-flight limit per route class', [
+            ((('route_class', name),), limit)
+            for limiter in limiters for name, (inflight, limit) in limiter.snapshot().items()
+        ]),
+        ('concurrency_inflight', 'Requests in flight per route class', [
+            ((('route_class', name),), inflight)
+            for limiter in limiters for name, (inflight, limit) in limiter.snapshot().items()
+        ]),
+    ]
+
+
+def render_metrics():
+    counters, histograms = registry.collect()
+    lines = []
+
+    def header(name, kind, help_text):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+
+    for name, (kind, help_text) in registry.help.items():
+        header(name, kind, help_text)
+        if kind == 'counter':
+            for (key_name, labels), value in sorted(counters.items()):
+                if key_name == name:
+                    lines.append(f'{name}{format_labels(labels)} {format_number(value)}')
+            continue
+
+        bounds = registry.buckets[name]
+        for (key_name, labels), counts in sorted(histograms.items()):
+            if key_name != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(bounds + ('+Inf',), counts[:-1]):
+                cumulative += count
+                le = bound if bound == '+Inf' else format_number(float(bound))
+                lines.append(f'{name}_bucket{format_labels(labels + (("le", le),))} {cumulative}')
+            lines.append(f'{name}_sum{format_labels(labels)} {format_number(counts[-1])}')
+            lines.append(f'{name}_count{format_labels(labels)} {cumulative}')
+
+    for name, help_text, samples in domain_gauges():
+        header(name, 'gauge', help_text)
+        for labels, value in samples:
+            lines.append(f'{name}{format_labels(labels)} {format_number(value)}')
+
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """
+    GET /metrics - Prometheus text exposition format
+
+    Scrapers send "Authorization: Bearer <METRICS_TOKEN>"; without a
+    configured token the endpoint is closed
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    scheme, _, given = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+    if not token or scheme.lower() != 'bearer' or not hmac.compare_digest(given.encode(), token.encode()):
+        return HttpResponseForbidden('Forbidden\n')
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
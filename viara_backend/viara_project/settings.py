@@ -51,6 +51,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'viara_project.metrics.MetricsMiddleware',  # first, so timings cover everything
+    'viara_project.concurrency.ConcurrencyLimitMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',   
@@ -147,7 +149,12 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'idempotency-key',
+    'if-none-match',
+    'if-modified-since',
 ]
+# Conditional GET validators readable from the frontend
+CORS_EXPOSE_HEADERS = ['etag', 'last-modified']
 # ============================================
 # REST FRAMEWORK AUTHENTICATION
 # ============================================
@@ -173,6 +180,10 @@ import os
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Where the backend is reached from the browser; used for absolute media
+# URLs in files built outside a request (the catalog snapshot)
+PUBLIC_BASE_URL = 'http://127.0.0.1:8000'
+
 # Add these to your existing settings.py file
 
 # ============================================
@@ -206,3 +217,71 @@ FRONTEND_URL = 'http://localhost:5173'
 # 9. Copy the 16-character password (looks like: xxxx xxxx xxxx xxxx)
 # 10. Paste it in EMAIL_HOST_PASSWORD above (without spaces)
 # ============================================
+
+# ============================================
+# ORDER STATUS EVENTS (Server-Sent Events)
+# ============================================
+# Streams wake up immediately for changes made in the same process, and
+# poll the OrderStatusEvent table this often for changes made elsewhere
+ORDER_EVENTS_POLL_SECONDS = 15
+# EventSource clients connect with a signed ticket (POST
+# /api/orders/events/ticket/) that must be used within this many seconds
+ORDER_EVENTS_TICKET_SECONDS = 60
+
+# ============================================
+# PRODUCT AUTOCOMPLETE
+# ============================================
+# How often the in-memory name index reloads popularity (units sold)
+AUTOCOMPLETE_POPULARITY_SECONDS = 600
+
+# ============================================
+# METRICS (/metrics, Prometheus text format)
+# ============================================
+# Scrapers must send "Authorization: Bearer <METRICS_TOKEN>". Left empty,
+# /metrics answers 403 to everyone. Client addresses are not trusted: behind
+# a local reverse proxy every request would come from 127.0.0.1
+METRICS_TOKEN = ''
+# Gauges that aggregate whole tables (orders by status, active carts) are
+# cached for this long per process
+METRICS_DB_GAUGE_SECONDS = 60
+
+# ============================================
+# CONCURRENCY LIMITS (load shedding)
+# ============================================
+# In-flight requests shared by all limited route classes. Per-class
+# settings (initial/minimum/maximum limit, target_latency in seconds,
+# share of the total, wait for a slot) override the defaults in
+# viara_project/concurrency.py, e.g.
+# CONCURRENCY_LIMITS = {'catalog_reads': {'maximum': 256}}
+CONCURRENCY_TOTAL = 64
+CONCURRENCY_LIMITS = {}
+
+# ============================================
+# IDEMPOTENCY KEYS (safe retries of cart / checkout writes)
+# ============================================
+# How long a stored response is replayed for the same Idempotency-Key.
+# Clean up expired keys with `python manage.py purge_idempotency_keys`
+IDEMPOTENCY_KEY_TTL_HOURS = 24
+
+# ============================================
+# GUEST CARTS (signed client-side tokens)
+# ============================================
+# How long a guest cart token stays valid; it is merged into the
+# user's cart when sent to login / register
+GUEST_CART_MAX_AGE_DAYS = 30
+
+# ============================================
+# BESTSELLERS (/api/bestsellers/)
+# ============================================
+# How long a leaderboard answer is served from memory. Schedule
+# `python manage.py compact_bestsellers` daily to age out old sales
+BESTSELLERS_CACHE_SECONDS = 60
+
+# ============================================
+# CATALOG SNAPSHOT (static JSON under MEDIA_ROOT/catalog/)
+# ============================================
+# Build once with `python manage.py build_catalog_snapshot`; after that,
+# catalog changes mark it stale, and one `build_catalog_snapshot --watch`
+# process (run beside the web workers, not in them) rebuilds it when it
+# checks, every this many seconds
+CATALOG_SNAPSHOT_POLL_SECONDS = 30
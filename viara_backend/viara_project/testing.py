@@ -0,0 +1,65 @@
+from abc import ABCMeta, abstractmethod
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+
+class QueryBudgetTestCase(APITestCase, metaclass=ABCMeta):
+    """
+    Base class for per-endpoint query budget tests
+
+    assertQueryBudget() runs a request against SMALL rows of fixture
+    data, grows the data to LARGE rows and runs it again. The query
+    count must be the same both times (no N+1) and within the budget.
+
+    Subclasses must implement grow(count).
+    """
+    SMALL = 2
+    LARGE = 20
+
+    @abstractmethod
+    def grow(self, count):
+        """
+        Add `count` more rows of everything the endpoints under test read
+
+        Called twice per assertQueryBudget, with SMALL and then
+        LARGE - SMALL, each time before setup() and the measured
+        request. It runs unmeasured, so it may use any queries, and it
+        must add rows on every call rather than reset them, so that the
+        second request sees LARGE rows of each relation. Rows should be
+        visible to the request's user (e.g. orders of the logged-in
+        customer), or the N+1 check has nothing to catch.
+        """
+
+    def count_queries(self, request):
+        with CaptureQueriesContext(connection) as queries:
+            response = request()
+        self.assertLess(
+            response.status_code, 400,
+            f'{response.status_code}: {getattr(response, "data", response.content)}'
+        )
+        return len(queries)
+
+    def assertQueryBudget(self, budget, request, setup=None):
+        """
+        budget:  most queries the request may run
+        request: callable making the request, returns the response
+        setup:   optional callable run (unmeasured) before each request;
+                 its return value is passed to request
+        """
+        counts = []
+        for count in (self.SMALL, self.LARGE - self.SMALL):
+            self.grow(count)
+            if setup is None:
+                counts.append(self.count_queries(request))
+            else:
+                prepared = setup()
+                counts.append(self.count_queries(lambda: request(prepared)))
+
+        small, large = counts
+        self.assertEqual(
+            small, large,
+            f'Query count grows with rows: {small} with {self.SMALL}, {large} with {self.LARGE}'
+        )
+        self.assertLessEqual(large, budget, f'{large} queries, budget is {budget}')
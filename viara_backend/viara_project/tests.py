@@ -0,0 +1,125 @@
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.urls import resolve
+from rest_framework.test import APITestCase
+
+from . import metrics
+from .concurrency import AIMDLimiter, ConcurrencyLimitMiddleware
+
+
+class MetricsTests(APITestCase):
+    def setUp(self):
+        metrics._db_gauges.clear()
+
+    def scrape(self):
+        return self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-token')
+
+    @override_settings(METRICS_TOKEN='scrape-token')
+    def test_metrics(self):
+        self.client.get('/api/products/')
+        response = self.scrape()
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('http_requests_total{', body)
+        self.assertIn('view="ProductViewSet"', body)
+        self.assertIn('db_queries_per_request_bucket{', body)
+
+        # Local addresses (a reverse proxy) and staff sessions get no pass
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+
+    @override_settings(METRICS_TOKEN='')
+    def test_closed_without_token(self):
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer ').status_code, 403)
+
+    @override_settings(METRICS_TOKEN='scrape-token', METRICS_DB_GAUGE_SECONDS=60)
+    def test_table_gauges_are_cached(self):
+        self.scrape()
+        with self.assertNumQueries(0):
+            self.scrape()
+
+
+class AIMDLimiterTests(SimpleTestCase):
+    def limiter(self, inflight):
+        limiter = AIMDLimiter('checkout', initial=32, minimum=4, maximum=64, target_latency=1.0)
+        limiter.inflight = inflight
+        return limiter
+
+    def test_backs_off_once_per_latency_window(self):
+        limiter = self.limiter(32)
+        # A whole saturated batch started at 0 and came back slow at 2-3s
+        for index in range(32):
+            limiter.release(2.0 + index / 32, now=2.0 + index / 32)
+        self.assertAlmostEqual(limiter.limit, 32 * 0.9)
+
+        # Started after the decrease: the new limit is slow too
+        limiter.inflight = 1
+        limiter.release(1.5, now=4.0)
+        self.assertAlmostEqual(limiter.limit, 32 * 0.9 * 0.9)
+
+        # 200 slow requests running at once shrink it once more, not to the floor
+        limiter.inflight = 200
+        for index in range(200):
+            limiter.release(5.0, now=10.0 + index / 100)
+        self.assertAlmostEqual(limiter.limit, 32 * 0.9 ** 3)
+
+    def test_grows_while_saturated(self):
+        limiter = self.limiter(32)
+        for index in range(32):
+            limiter.inflight = 32
+            limiter.release(0.1, now=index)
+        self.assertGreater(limiter.limit, 32.9)
+        self.assertLess(limiter.limit, 33.1)
+
+        limiter.limit, limiter.inflight = 4, 1
+        limiter.release(2.0, now=100.0)
+        self.assertEqual(limiter.limit, 4)
+
+
+@override_settings(
+    CONCURRENCY_TOTAL=10,
+    CONCURRENCY_LIMITS={'catalog_reads': {'initial': 20}, 'checkout': {'wait': 1}},
+)
+class ConcurrencyLimitMiddlewareTests(APITestCase):
+    def start(self, middleware, path, method='get'):
+        """Run process_view for a request to path; None when it got a slot"""
+        request = getattr(RequestFactory(), method)(path)
+        return middleware.process_view(request, resolve(path).func, (), {})
+
+    @override_settings(CONCURRENCY_LIMITS={'catalog_reads': {'share': 0}})
+    def test_sheds_with_retry_after(self):
+        response = self.client.get('/api/products/')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(response.json(), {'error': 'Server is busy, please retry shortly'})
+
+        # Checkout is not held back by the catalog's share
+        self.client.force_authenticate(User.objects.create_user('customer'))
+        response = self.client.post('/api/orders/create_from_cart/', {'payment_method': 'cod'}, format='json')
+        self.assertEqual(response.status_code, 400)  # empty cart, but it got through
+
+    def test_checkout_keeps_the_headroom(self):
+        middleware = ConcurrencyLimitMiddleware(lambda request: HttpResponse())
+        # Catalog reads may only fill 70% of the 10 shared slots
+        for index in range(7):
+            self.assertIsNone(self.start(middleware, '/api/products/'))
+        self.assertEqual(self.start(middleware, '/api/products/').status_code, 503)
+        for index in range(3):
+            self.assertIsNone(self.start(middleware, '/api/orders/create_from_cart/', 'post'))
+
+        # With every slot taken, checkout waits for one instead of failing at once
+        results = []
+        waiting = threading.Thread(
+            target=lambda: results.append(self.start(middleware, '/api/orders/create_from_cart/', 'post'))
+        )
+        waiting.start()
+        time.sleep(0.1)
+        self.assertEqual(results, [])
+        middleware.limiter.release('catalog_reads', 0.01)
+        waiting.join()
+        self.assertEqual(results, [None])
+        self.assertEqual(middleware.limiter.snapshot()['checkout'][0], 4)
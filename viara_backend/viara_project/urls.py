@@ -3,11 +3,14 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from .metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('products.urls')),
     path('api/auth/', include('accounts.urls')),
     path('api/', include('orders.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
 
 # Serve media files during development